@@ -1,12 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from pydantic import ValidationError
+import asyncio
+import math
 import structlog
 import httpx
+from typing import Optional
 
-from .models import MedicalBookRequest, ExternalAPIResponse, HealthResponse
+from .models import (
+    MedicalBookRequest,
+    ExternalAPIResponse,
+    HealthResponse,
+    ReadinessResponse,
+    MedicalBookBatchRequest,
+    MedicalBookBatchResponse,
+    BatchItemResult,
+    JobCreateRequest,
+    JobResponse,
+)
 from .auth import get_current_user
-from .external_api import external_api_client
+from .cache import cached_registry_client, make_cache_key
 from .config import settings
+from .external_api import external_api_client
+from .governor import BATCH, QueueWaitExceeded, call_priority
+from .jobs import JobManager, JobStore
+from .metrics import JOB_QUEUE_DEPTH, READY, REGISTRY_PROBES, render_metrics
+from .readiness import ReadinessMonitor
+from .responses import ModelResponse
+from .resilience import CircuitOpenError
+from .streaming import (
+    NDJSON_MEDIA_TYPE,
+    NDJSONStreamingResponse,
+    iter_ndjson_lines,
+    map_bounded,
+)
 
 logger = structlog.get_logger()
 
@@ -15,10 +41,29 @@ router = APIRouter()
 
 @router.get("/healthz", response_model=HealthResponse)
 async def health_check():
-    """Health check endpoint."""
+    """Health check endpoint: the process is up and serving."""
     return HealthResponse(status="healthy")
 
 
+@router.get(
+    "/readyz",
+    response_model=ReadinessResponse,
+    responses={503: {"model": ReadinessResponse, "description": "Not ready"}}
+)
+async def readiness_check():
+    """
+    Readiness check endpoint.
+    
+    Answers from the state kept by the readiness monitor without calling
+    the registry, with ``503`` while this process should not get traffic.
+    """
+    report = readiness_monitor.report()
+    return ModelResponse(
+        report,
+        status_code=status.HTTP_200_OK if not report.reasons else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
+
 @router.post("/api/v1/medical-book/validate", response_model=ExternalAPIResponse)
 async def validate_medical_book(
     request: MedicalBookRequest,
@@ -29,13 +74,16 @@ async def validate_medical_book(
     
     This endpoint validates the provided ELMK number and SNILS,
     then queries the external registry for medical book information.
+    Results may be served from the registry cache; ``X-Cache`` and ``Age``
+    response headers tell how fresh the returned record is.
     
     Args:
         request: Medical book validation request
         current_user: Authenticated user (from Basic Auth)
         
     Returns:
-        ExternalAPIResponse: Medical book information from registry
+        ModelResponse: ``ExternalAPIResponse`` with medical book information
+            from registry and cache headers
         
     Raises:
         HTTPException: If validation fails or external API error
@@ -48,8 +96,8 @@ async def validate_medical_book(
     )
     
     try:
-        # Get medical book information from external API
-        result = await external_api_client.get_medical_book_info(
+        # Get medical book information from cache or external API
+        result = await cached_registry_client.lookup(
             elmk_number=request.elmk_number,
             snils=request.snils
         )
@@ -57,77 +105,381 @@ async def validate_medical_book(
         logger.info(
             "Medical book validation successful",
             elmk_number=request.elmk_number,
+            cache=result.cache_status,
             user=current_user
         )
         
-        return result
+        return ModelResponse(result.value, headers=result.headers)
         
-    except HTTPException:
-        # Re-raise HTTP exceptions from external API
-        raise
-    except httpx.HTTPStatusError as e:
+    except Exception as e:
+        raise registry_error_to_http(
+            e, elmk_number=request.elmk_number, user=current_user
+        )
+
+
+def registry_error_to_http(exc: Exception, **log_context) -> HTTPException:
+    """
+    Map an error raised during a registry lookup to an HTTPException.
+    
+    Args:
+        exc: Exception raised by the registry client or cache layer
+        **log_context: Fields added to the error log entry
+        
+    Returns:
+        HTTPException: 404/502/503/504 for registry errors, 500 otherwise;
+            503 with Retry-After while the registry circuit is open or
+            outbound registry requests are queued for too long
+    """
+    if isinstance(exc, HTTPException):
+        # HTTP exceptions from external API are passed through as is
+        return exc
+    if isinstance(exc, CircuitOpenError):
+        logger.warning("External API circuit open", retry_after=exc.retry_after, **log_context)
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="External API temporarily unavailable",
+            headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))}
+        )
+    if isinstance(exc, QueueWaitExceeded):
+        logger.warning("External API request queue full", waited=exc.waited, **log_context)
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="External API request queue is full",
+            headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))}
+        )
+    if isinstance(exc, httpx.HTTPStatusError):
         logger.error(
             "External API HTTP error",
-            error=str(e),
-            status_code=e.response.status_code,
-            elmk_number=request.elmk_number,
-            user=current_user
+            error=str(exc),
+            status_code=exc.response.status_code,
+            **log_context
         )
-        if e.response.status_code == 404:
-            raise HTTPException(
+        if exc.response.status_code == 404:
+            return HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Medical book not found in registry"
             )
-        elif e.response.status_code >= 500:
-            raise HTTPException(
-                status_code=status.HTTP_502_BAD_GATEWAY,
-                detail=f"External API error: {e.response.status_code}"
-            )
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_502_BAD_GATEWAY,
-                detail=f"External API error: {e.response.status_code}"
-            )
-    except httpx.TimeoutException as e:
-        logger.error(
-            "External API timeout",
-            error=str(e),
-            elmk_number=request.elmk_number,
-            user=current_user
+        return HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"External API error: {exc.response.status_code}"
         )
-        raise HTTPException(
+    if isinstance(exc, httpx.TimeoutException):
+        logger.error("External API timeout", error=str(exc), **log_context)
+        return HTTPException(
             status_code=status.HTTP_504_GATEWAY_TIMEOUT,
             detail="External API timeout"
         )
-    except httpx.ConnectError as e:
-        logger.error(
-            "External API connection error",
-            error=str(e),
-            elmk_number=request.elmk_number,
-            user=current_user
-        )
-        raise HTTPException(
+    if isinstance(exc, httpx.ConnectError):
+        logger.error("External API connection error", error=str(exc), **log_context)
+        return HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="External API unavailable"
         )
+    if isinstance(exc, httpx.RequestError):
+        logger.error("External API transport error", error=str(exc), **log_context)
+        return HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="External API error"
+        )
+    logger.error(
+        "Unexpected error during medical book validation",
+        error=str(exc),
+        **log_context
+    )
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail="Internal server error during validation"
+    )
+
+
+async def validate_item(
+    item: MedicalBookRequest, current_user: str, index: int = 0
+) -> BatchItemResult:
+    """
+    Look up a single item for bulk endpoints, capturing errors in the result.
+    
+    Registry calls are made at batch priority, behind single validations.
+    
+    Args:
+        item: Medical book validation request
+        current_user: Authenticated user (from Basic Auth)
+        index: Position of the item in the input
+        
+    Returns:
+        BatchItemResult: Registry record or mapped error for the item
+    """
+    try:
+        with call_priority(BATCH):
+            result = await cached_registry_client.lookup(
+                elmk_number=item.elmk_number,
+                snils=item.snils
+            )
     except Exception as e:
-        logger.error(
-            "Unexpected error during medical book validation",
-            error=str(e),
-            elmk_number=request.elmk_number,
+        error = registry_error_to_http(
+            e, elmk_number=item.elmk_number, user=current_user
+        )
+        return BatchItemResult(
+            index=index,
+            elmk_number=item.elmk_number,
+            snils=item.snils,
+            status_code=error.status_code,
+            error=error.detail
+        )
+    return BatchItemResult(
+        index=index,
+        elmk_number=item.elmk_number,
+        snils=item.snils,
+        status_code=status.HTTP_200_OK,
+        result=result.value,
+        cache=result.cache_status
+    )
+
+
+@router.post(
+    "/api/v1/medical-book/validate/batch",
+    response_model=MedicalBookBatchResponse
+)
+async def validate_medical_book_batch(
+    request: MedicalBookBatchRequest,
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Validate a batch of medical books in one request.
+    
+    Duplicate (ELMK number, SNILS) pairs are looked up once. Unique pairs
+    are queried concurrently, at most ``batch_concurrency`` at a time.
+    Each item gets its own status code with the same meaning as for the
+    single validation endpoint.
+    
+    Args:
+        request: Batch of medical book validation requests
+        current_user: Authenticated user (from Basic Auth)
+        
+    Returns:
+        ModelResponse: ``MedicalBookBatchResponse`` with per-item results
+            in input order
+    """
+    keys = [make_cache_key(item.elmk_number, item.snils) for item in request.items]
+    unique = {}
+    for key, item in zip(keys, request.items):
+        unique.setdefault(key, item)
+    
+    logger.info(
+        "Medical book batch validation request",
+        total=len(request.items),
+        unique=len(unique),
+        user=current_user
+    )
+    
+    semaphore = asyncio.Semaphore(settings.batch_concurrency)
+    
+    async def validate_one(item: MedicalBookRequest) -> BatchItemResult:
+        async with semaphore:
+            return await validate_item(item, current_user)
+    
+    outcomes = dict(zip(
+        unique.keys(),
+        await asyncio.gather(*[validate_one(item) for item in unique.values()])
+    ))
+    
+    results = [
+        outcomes[key].model_copy(update={"index": index})
+        for index, key in enumerate(keys)
+    ]
+    succeeded = sum(1 for item in results if item.status_code == status.HTTP_200_OK)
+    
+    logger.info(
+        "Medical book batch validation completed",
+        total=len(results),
+        succeeded=succeeded,
+        user=current_user
+    )
+    
+    return ModelResponse(MedicalBookBatchResponse(
+        total=len(results),
+        unique=len(unique),
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        results=results
+    ))
+
+
+@router.post(
+    "/api/v1/medical-book/validate/stream",
+    response_class=NDJSONStreamingResponse,
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}}
+)
+async def validate_medical_book_stream(
+    request: Request,
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Validate a stream of medical books sent as NDJSON.
+    
+    Each request body line is a ``MedicalBookRequest`` JSON object. Results
+    are streamed back as NDJSON ``BatchItemResult`` lines in completion
+    order, each carrying the 0-based ``index`` of its input line; blank
+    lines get no result but are counted. At most
+    ``stream_concurrency`` lookups run at once and the body is not read
+    further until one of them finishes, so memory use does not depend on
+    the size of the input.
+    
+    Args:
+        request: Incoming request with an NDJSON body
+        current_user: Authenticated user (from Basic Auth)
+        
+    Returns:
+        NDJSONStreamingResponse: NDJSON stream of per-line results
+    """
+    logger.info("Medical book stream validation request", user=current_user)
+    
+    async def validate_line(index: int, line: bytes) -> Optional[BatchItemResult]:
+        if not line.strip():
+            return None
+        try:
+            item = MedicalBookRequest.model_validate_json(line)
+        except ValidationError as e:
+            return BatchItemResult(
+                index=index,
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                error="; ".join(error["msg"] for error in e.errors())
+            )
+        return await validate_item(item, current_user, index=index)
+    
+    async def results():
+        count = 0
+        lines = iter_ndjson_lines(request.stream(), settings.stream_max_line_bytes)
+        async for result in map_bounded(lines, validate_line, settings.stream_concurrency):
+            if result is None:
+                continue
+            count += 1
+            yield result.model_dump_json().encode() + b"\n"
+        logger.info(
+            "Medical book stream validation completed",
+            total=count,
             user=current_user
         )
+    
+    return NDJSONStreamingResponse(results())
+
+
+@router.post(
+    "/api/v1/jobs",
+    response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def create_validation_job(
+    request: JobCreateRequest,
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Submit a roster for validation in the background.
+    
+    The items are stored and validated by the job workers with the same
+    per-item results as the batch endpoint. Poll ``GET /api/v1/jobs/{id}``
+    for progress and results, or pass ``webhook_url`` to be notified when
+    the job completes.
+    
+    Args:
+        request: Items to validate and an optional webhook URL
+        current_user: Authenticated user (from Basic Auth)
+        
+    Returns:
+        ModelResponse: ``JobResponse`` of the queued job with 202 status and
+            a ``Location`` header pointing at it
+        
+    Raises:
+        HTTPException: If the job is larger than ``jobs_max_items`` or the
+            webhook URL is not allowed
+    """
+    if len(request.items) > settings.jobs_max_items:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Internal server error during validation"
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Job too large. Limit: {settings.jobs_max_items} items"
         )
+    
+    webhook_url = str(request.webhook_url) if request.webhook_url is not None else None
+    if webhook_url is not None:
+        error = await job_manager.webhook_url_error(webhook_url)
+        if error is not None:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=error)
+    
+    job = await job_manager.submit(current_user, request.items, webhook_url)
+    return ModelResponse(
+        job.to_response(),
+        status_code=status.HTTP_202_ACCEPTED,
+        headers={"Location": f"/api/v1/jobs/{job.id}"}
+    )
+
+
+@router.get("/api/v1/jobs/{job_id}", response_model=JobResponse)
+async def get_validation_job(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Progress of a validation job and a page of its results.
+    
+    ``results`` holds the finished items with index ``offset`` to
+    ``offset + limit - 1``; ``next_offset`` is where the next page starts,
+    or null after the last one.
+    
+    Args:
+        job_id: Job identifier returned on submission
+        offset: Index of the first item of the page
+        limit: Number of items in the page
+        current_user: Authenticated user (from Basic Auth)
+        
+    Returns:
+        ModelResponse: ``JobResponse`` with progress counters and results
+        
+    Raises:
+        HTTPException: 404 if there is no such job for the current user
+    """
+    job = await job_manager.get(job_id)
+    if job is None or job.owner != current_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    results = await job_manager.results(job_id, offset, limit)
+    next_offset = offset + limit if offset + limit < job.total else None
+    return ModelResponse(job.to_response(results, offset=offset, next_offset=next_offset))
 
 
 @router.get("/metrics")
 async def get_metrics():
-    """Get application metrics (placeholder for Prometheus metrics)."""
-    # In a real implementation, this would return Prometheus metrics
-    return {
-        "status": "metrics endpoint",
-        "note": "Prometheus metrics would be implemented here"
-    }
\ No newline at end of file
+    """Prometheus metrics in text exposition format."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+# Background validation jobs, started and stopped by the application lifespan
+job_manager = JobManager(
+    JobStore(settings.jobs_db_path),
+    validate_item,
+    workers=settings.jobs_workers,
+    concurrency=settings.jobs_concurrency,
+    chunk_size=settings.jobs_chunk_size,
+    lease=settings.jobs_lease,
+    retention=settings.jobs_retention,
+    webhook_timeout=settings.jobs_webhook_timeout,
+    webhook_retries=settings.jobs_webhook_retries,
+    webhook_secret=settings.jobs_webhook_secret,
+    webhook_allowed_hosts=settings.jobs_webhook_allowed_hosts,
+    depth_gauge=JOB_QUEUE_DEPTH
+)
+
+# Registry reachability for /readyz, checked in the background once started
+readiness_monitor = ReadinessMonitor(
+    external_api_client,
+    interval=settings.readiness_probe_interval,
+    timeout=settings.readiness_probe_timeout,
+    warmup_connections=settings.readiness_warmup_connections,
+    max_queued=settings.readiness_max_queued,
+    probe_counter=REGISTRY_PROBES,
+    ready_gauge=READY
+)
@@ -1,44 +1,145 @@
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, Request, status, Depends
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from passlib.context import CryptContext
+from collections import OrderedDict
+import hashlib
+import hmac
 import secrets
-from typing import Optional
+import threading
+import time
+from typing import Callable, Optional, Tuple
 import structlog
 
 from .config import settings
 
 logger = structlog.get_logger()
 security = HTTPBasic()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+HASH_SCHEMES = ["bcrypt", "argon2"]
+
+_pwd_context = None
+
+
+def get_pwd_context():
+    """Password hashing context, built on first use.
+
+    Importing passlib and building the context is deferred so that cold
+    start does not pay for it when only plaintext credentials are configured.
+    """
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+
+        _pwd_context = CryptContext(schemes=HASH_SCHEMES, deprecated="auto")
+    return _pwd_context
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    try:
+        return get_pwd_context().verify(plain_password, hashed_password)
+    except (ValueError, TypeError):
+        logger.error("Unsupported or malformed password hash")
+        return False
 
 
 def get_password_hash(password: str) -> str:
     """Generate password hash."""
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+
+class VerifiedCredentialCache:
+    """Short-lived cache of Authorization headers that passed verification.
+
+    Entries are keyed by an HMAC of the header under a random per-process
+    key, so neither plaintext credentials nor unsalted digests of them are
+    kept in memory. Only successful verifications are cached.
+
+    ``get_current_user`` is a sync dependency run in the threadpool, so the
+    cache is used from several threads at once and guards its entries with
+    a lock.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._key = secrets.token_bytes(32)
+        self._entries: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _digest(self, authorization: str) -> bytes:
+        return hmac.new(self._key, authorization.encode(), hashlib.sha256).digest()
+
+    def get(self, authorization: str) -> Optional[str]:
+        """Return the username for a recently verified header, if any."""
+        digest = self._digest(authorization)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            username, expires_at = entry
+            if expires_at <= self._clock():
+                del self._entries[digest]
+                return None
+            return username
+
+    def set(self, authorization: str, username: str) -> None:
+        """Remember that the header was verified for username."""
+        digest = self._digest(authorization)
+        with self._lock:
+            self._entries[digest] = (username, self._clock() + self.ttl)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+credential_cache = VerifiedCredentialCache(
+    max_entries=settings.auth_cache_max_entries,
+    ttl=settings.auth_cache_ttl
+)
 
 
 def authenticate_user(credentials: HTTPBasicCredentials) -> bool:
-    """Authenticate user with Basic Auth."""
-    is_username_correct = secrets.compare_digest(
-        credentials.username, settings.auth_username
-    )
-    is_password_correct = secrets.compare_digest(
-        credentials.password, settings.auth_password
-    )
-    
-    if not (is_username_correct and is_password_correct):
+    """Authenticate user with Basic Auth.
+
+    Credentials are checked against hashed secrets of API clients from
+    ``auth_clients`` and against the plaintext ``auth_username``/
+    ``auth_password`` pair, if configured.
+    """
+    hashed_secret = settings.auth_clients.get(credentials.username)
+    if hashed_secret is not None:
+        is_authenticated = verify_password(credentials.password, hashed_secret)
+    elif settings.auth_username is not None and settings.auth_password is not None:
+        is_username_correct = secrets.compare_digest(
+            credentials.username.encode(), settings.auth_username.encode()
+        )
+        is_password_correct = secrets.compare_digest(
+            credentials.password.encode(), settings.auth_password.encode()
+        )
+        is_authenticated = is_username_correct and is_password_correct
+    else:
+        is_authenticated = False
+
+    if not is_authenticated:
         logger.warning(
             "Authentication failed",
             username=credentials.username,
             client_ip="unknown"  # Would be extracted from request in real implementation
         )
         return False
-    
+
     logger.info(
         "Authentication successful",
         username=credentials.username,
@@ -47,12 +148,29 @@ def authenticate_user(credentials: HTTPBasicCredentials) -> bool:
     return True
 
 
-def get_current_user(credentials: HTTPBasicCredentials = Depends(security)) -> str:
-    """Dependency for getting current authenticated user."""
+def get_current_user(
+    request: Request,
+    credentials: HTTPBasicCredentials = Depends(security)
+) -> str:
+    """Dependency for getting current authenticated user.
+
+    Recently verified Authorization headers are served from
+    ``credential_cache`` so that repeated calls do not re-run a slow
+    bcrypt/argon2 verification.
+    """
+    authorization = request.headers.get("authorization", "")
+    if settings.auth_cache_ttl > 0:
+        username = credential_cache.get(authorization)
+        if username is not None:
+            return username
+
     if not authenticate_user(credentials):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Basic"},
         )
-    return credentials.username
\ No newline at end of file
+
+    if settings.auth_cache_ttl > 0:
+        credential_cache.set(authorization, credentials.username)
+    return credentials.username
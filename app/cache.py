@@ -0,0 +1,484 @@
+import asyncio
+import sqlite3
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+import httpx
+import structlog
+from fastapi import HTTPException, status
+from prometheus_client import Gauge
+
+from .coalescing import SingleFlight
+from .config import settings
+from .disk_cache import DiskCache
+from .external_api import ExternalAPIClient, external_api_client
+from .governor import PREFETCH, QueueWaitExceeded, call_priority
+from .metrics import (
+    CACHE_ENTRIES,
+    CACHE_EVICTIONS,
+    CACHE_LOOKUPS,
+    CACHE_STALE_SERVED,
+    REFRESH_LAG,
+    REFRESH_QUEUE_DEPTH,
+)
+from .models import ExternalAPIResponse
+from .resilience import CircuitOpenError
+from .scheduler import RefreshScheduler
+
+logger = structlog.get_logger()
+
+CacheKey = Tuple[str, str]
+
+
+def make_cache_key(elmk_number: str, snils: str) -> CacheKey:
+    """Build a cache key from ELMK number and SNILS, ignoring formatting."""
+    return (
+        "".join(ch for ch in elmk_number if ch.isdigit()),
+        "".join(ch for ch in snils if ch.isdigit())
+    )
+
+
+@dataclass
+class CacheEntry:
+    """Cached registry result. ``value`` is None for a cached "not found"."""
+
+    value: Optional[ExternalAPIResponse]
+    stored_at: float
+    expires_at: float
+    # Kept past expiry until then, to be served stale
+    stale_until: float = 0.0
+
+    @property
+    def found(self) -> bool:
+        return self.value is not None
+
+
+@dataclass
+class LookupResult:
+    """Registry lookup result together with its cache status."""
+
+    value: ExternalAPIResponse
+    cache_status: str
+    age: float
+    warning: Optional[str] = None
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return cache_headers(self.cache_status, self.age, self.warning)
+
+
+# Warning header values (RFC 7234) for records served past their TTL
+STALE_WARNING = '110 - "Response is Stale"'
+REVALIDATION_FAILED_WARNING = '111 - "Revalidation Failed"'
+
+
+def cache_headers(cache_status: str, age: float, warning: Optional[str] = None) -> Dict[str, str]:
+    """Response headers describing where the result came from."""
+    headers = {"X-Cache": cache_status, "Age": str(int(age))}
+    if warning is not None:
+        headers["Warning"] = warning
+    return headers
+
+
+class RegistryCache:
+    """In-memory LRU cache of registry results with per-entry TTL.
+
+    Found records live for ``ttl`` seconds, "not found" results for the
+    shorter ``negative_ttl``. Found records are then kept for another
+    ``stale_ttl`` seconds, available only through ``get_stale()``. When
+    ``max_entries`` is reached the least recently used entry is evicted.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float,
+        negative_ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+        size_gauge: Optional[Gauge] = None,
+        stale_ttl: float = 0.0
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self._clock = clock
+        self._size_gauge = size_gauge
+        self._entries: "OrderedDict[CacheKey, CacheEntry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def age(self, entry: CacheEntry) -> float:
+        """Seconds since the entry was stored."""
+        return max(0.0, self._clock() - entry.stored_at)
+
+    def get(self, key: CacheKey) -> Optional[CacheEntry]:
+        """Return a fresh entry for key, or None on miss."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            CACHE_LOOKUPS.labels(result="miss").inc()
+            return None
+
+        now = self._clock()
+        if entry.expires_at <= now:
+            if entry.stale_until <= now:
+                del self._entries[key]
+                self._update_size()
+            self.misses += 1
+            CACHE_LOOKUPS.labels(result="miss").inc()
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        CACHE_LOOKUPS.labels(result="hit").inc()
+        return entry
+
+    def get_stale(self, key: CacheKey) -> Optional[CacheEntry]:
+        """Return an expired found entry still within ``stale_ttl``, or None.
+
+        Not counted as a hit or miss: it follows a ``get()`` that missed.
+        """
+        entry = self._entries.get(key)
+        if entry is None or not entry.found or entry.stale_until <= self._clock():
+            return None
+        return entry
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return entry.expires_at > self._clock()
+
+    def fresh_for(self, key: CacheKey) -> float:
+        """Seconds the found record for key stays fresh; 0 when there is none.
+
+        Not counted as a hit or miss.
+        """
+        entry = self._entries.get(key)
+        if entry is None or not entry.found:
+            return 0.0
+        return max(0.0, entry.expires_at - self._clock())
+
+    def retention(self, value: Optional[ExternalAPIResponse]) -> float:
+        """Seconds an entry for value is kept, including the stale window."""
+        if value is None:
+            return self.negative_ttl
+        return self.ttl + self.stale_ttl
+
+    def set(
+        self, key: CacheKey, value: Optional[ExternalAPIResponse], age: float = 0.0
+    ) -> CacheEntry:
+        """Store a found record or, with ``value=None``, a "not found" result.
+
+        ``age`` backdates the entry, for results that were stored elsewhere
+        earlier (e.g. loaded from the disk tier).
+        """
+        now = self._clock() - age
+        ttl = self.ttl if value is not None else self.negative_ttl
+        stale_ttl = self.stale_ttl if value is not None else 0.0
+        entry = CacheEntry(
+            value=value,
+            stored_at=now,
+            expires_at=now + ttl,
+            stale_until=now + ttl + stale_ttl
+        )
+
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+            CACHE_EVICTIONS.inc()
+        self._update_size()
+        return entry
+
+    def clear(self) -> None:
+        """Drop all entries and reset counters."""
+        self._entries.clear()
+        self._update_size()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _update_size(self) -> None:
+        if self._size_gauge is not None:
+            self._size_gauge.set(len(self._entries))
+
+    def stats(self) -> Dict[str, int]:
+        """Cache counters."""
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+def is_registry_failure(exc: BaseException) -> bool:
+    """Whether the registry could not give an answer, as opposed to answering "not found"."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    if isinstance(exc, HTTPException):
+        # Unparseable registry payload
+        return exc.status_code >= 500
+    return isinstance(exc, (httpx.RequestError, CircuitOpenError, QueueWaitExceeded))
+
+
+class CachedRegistryClient:
+    """Caching layer in front of ``ExternalAPIClient.get_medical_book_info``.
+
+    Cache misses for the same key that overlap in time are coalesced into a
+    single upstream call when a ``SingleFlight`` is given.
+
+    Found records that expired less than ``stale_while_revalidate`` seconds
+    ago are returned immediately while a background refresh runs, at most
+    one per key. When the registry fails or the breaker is open, records
+    that expired less than ``stale_if_error`` seconds ago are returned
+    instead of the error. Both are marked ``STALE`` with a ``Warning``.
+
+    With a ``disk`` tier, memory misses are looked up on disk before the
+    registry, and registry results are written to both tiers.
+
+    Found records are reported to ``scheduler``, when set, so that keys in
+    use are refreshed ahead of expiry and of their recertification dates.
+    """
+
+    def __init__(
+        self,
+        client: ExternalAPIClient,
+        cache: RegistryCache,
+        enabled: bool = True,
+        single_flight: Optional[SingleFlight] = None,
+        stale_while_revalidate: float = 0.0,
+        stale_if_error: float = 0.0,
+        disk: Optional[DiskCache] = None
+    ):
+        self.client = client
+        self.cache = cache
+        self.enabled = enabled
+        self.single_flight = single_flight
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale_if_error = stale_if_error
+        self.disk = disk
+        self.scheduler: Optional[RefreshScheduler] = None
+        self._refreshes: Dict[CacheKey, asyncio.Task] = {}
+
+    async def lookup(self, elmk_number: str, snils: str) -> LookupResult:
+        """
+        Get medical book information, serving from cache when possible.
+
+        Raises:
+            HTTPException: 404 if a cached "not found" result is still fresh
+            Exception: Anything raised by ``ExternalAPIClient`` on a miss
+                that cannot be answered with a stale record
+        """
+        key = make_cache_key(elmk_number, snils)
+        stale = None
+
+        if self.enabled:
+            entry = self.cache.get(key)
+            if entry is None and self.disk is not None:
+                entry = await self._load_from_disk(key)
+            if entry is not None:
+                age = self.cache.age(entry)
+                logger.debug("Registry cache hit", elmk_number=elmk_number, found=entry.found, age=age)
+                if not entry.found:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="Medical book not found in registry",
+                        headers=cache_headers("HIT", age)
+                    )
+                self._track(key, elmk_number, snils, entry.value, self.cache.ttl - age)
+                return LookupResult(value=entry.value, cache_status="HIT", age=age)
+
+            stale = self.cache.get_stale(key)
+            if stale is not None and self._expired_for(stale) < self.stale_while_revalidate:
+                self._schedule_refresh(key, elmk_number, snils)
+                self._track(key, elmk_number, snils, stale.value, self.cache.ttl)
+                CACHE_STALE_SERVED.labels(reason="revalidate").inc()
+                return LookupResult(
+                    value=stale.value,
+                    cache_status="STALE",
+                    age=self.cache.age(stale),
+                    warning=STALE_WARNING
+                )
+
+        try:
+            value = await self._fetch_coalesced(key, elmk_number, snils)
+        except Exception as e:
+            if (
+                stale is not None
+                and self._expired_for(stale) < self.stale_if_error
+                and is_registry_failure(e)
+            ):
+                logger.warning(
+                    "Serving stale registry record",
+                    elmk_number=elmk_number,
+                    error=str(e) or type(e).__name__,
+                    age=self.cache.age(stale)
+                )
+                CACHE_STALE_SERVED.labels(reason="error").inc()
+                return LookupResult(
+                    value=stale.value,
+                    cache_status="STALE",
+                    age=self.cache.age(stale),
+                    warning=REVALIDATION_FAILED_WARNING
+                )
+            raise
+
+        self._track(key, elmk_number, snils, value, self.cache.ttl)
+        return LookupResult(
+            value=value, cache_status="MISS" if self.enabled else "BYPASS", age=0.0
+        )
+
+    def _track(
+        self,
+        key: CacheKey,
+        elmk_number: str,
+        snils: str,
+        value: ExternalAPIResponse,
+        expires_in: float
+    ) -> None:
+        if self.enabled and self.scheduler is not None:
+            self.scheduler.track(key, elmk_number, snils, value, expires_in)
+
+    def fresh_for(self, elmk_number: str, snils: str) -> float:
+        """Seconds the cached record stays fresh in memory; 0 when there is none."""
+        if not self.enabled:
+            return 0.0
+        return self.cache.fresh_for(make_cache_key(elmk_number, snils))
+
+    async def refresh(self, elmk_number: str, snils: str) -> Optional[ExternalAPIResponse]:
+        """Re-fetch a record into the cache; None if the registry no longer has it."""
+        try:
+            with call_priority(PREFETCH):
+                return await self._fetch_coalesced(make_cache_key(elmk_number, snils), elmk_number, snils)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                return None
+            raise
+
+    async def _load_from_disk(self, key: CacheKey) -> Optional[CacheEntry]:
+        """Copy the disk entry for key into memory; return it if still fresh."""
+        try:
+            disk_entry = await self.disk.aget(key)
+        except (sqlite3.Error, ValueError) as e:
+            logger.error("Disk cache read failed", error=str(e))
+            return None
+        if disk_entry is None:
+            return None
+        entry = self.cache.set(key, disk_entry.value, age=disk_entry.age)
+        return entry if self.cache.is_fresh(entry) else None
+
+    async def _store(self, key: CacheKey, value: Optional[ExternalAPIResponse]) -> None:
+        """Store a registry result in memory and on disk."""
+        self.cache.set(key, value)
+        if self.disk is None:
+            return
+        try:
+            await self.disk.aset(key, value, self.cache.retention(value))
+        except sqlite3.Error as e:
+            logger.error("Disk cache write failed", error=str(e))
+
+    def _expired_for(self, entry: CacheEntry) -> float:
+        """Seconds since the entry expired."""
+        return self.cache.age(entry) - (entry.expires_at - entry.stored_at)
+
+    def _schedule_refresh(self, key: CacheKey, elmk_number: str, snils: str) -> None:
+        """Refresh an entry in the background unless a refresh for it is running."""
+        if key in self._refreshes:
+            return
+        task = asyncio.ensure_future(self._refresh(key, elmk_number, snils))
+        self._refreshes[key] = task
+        task.add_done_callback(lambda _: self._refreshes.pop(key, None))
+
+    async def _refresh(self, key: CacheKey, elmk_number: str, snils: str) -> None:
+        try:
+            with call_priority(PREFETCH):
+                await self._fetch_coalesced(key, elmk_number, snils)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(
+                "Background registry refresh failed",
+                elmk_number=elmk_number,
+                error=str(e) or type(e).__name__
+            )
+
+    async def close(self) -> None:
+        """Cancel background refreshes that are still running."""
+        tasks = list(self._refreshes.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _fetch_coalesced(self, key: CacheKey, elmk_number: str, snils: str) -> ExternalAPIResponse:
+        if self.single_flight is not None:
+            return await self.single_flight.do(key, lambda: self._fetch(key, elmk_number, snils))
+        return await self._fetch(key, elmk_number, snils)
+
+    async def _fetch(self, key: CacheKey, elmk_number: str, snils: str) -> ExternalAPIResponse:
+        """Query the registry and store the outcome in the cache."""
+        try:
+            value = await self.client.get_medical_book_info(elmk_number=elmk_number, snils=snils)
+        except httpx.HTTPStatusError as e:
+            if self.enabled and e.response.status_code == 404:
+                await self._store(key, None)
+            raise
+
+        if self.enabled:
+            await self._store(key, value)
+        return value
+
+
+# Global cache instances
+registry_cache = RegistryCache(
+    max_entries=settings.registry_cache_max_entries,
+    ttl=settings.registry_cache_ttl,
+    negative_ttl=settings.registry_cache_negative_ttl,
+    size_gauge=CACHE_ENTRIES,
+    stale_ttl=max(
+        settings.registry_cache_stale_while_revalidate,
+        settings.registry_cache_stale_if_error
+    )
+)
+registry_disk_cache = DiskCache(
+    settings.registry_disk_cache_path,
+    max_entries=settings.registry_disk_cache_max_entries
+) if settings.registry_cache_enabled and settings.registry_disk_cache_enabled else None
+registry_single_flight = SingleFlight()
+cached_registry_client = CachedRegistryClient(
+    external_api_client,
+    registry_cache,
+    enabled=settings.registry_cache_enabled,
+    single_flight=registry_single_flight if settings.registry_coalescing_enabled else None,
+    stale_while_revalidate=settings.registry_cache_stale_while_revalidate,
+    stale_if_error=settings.registry_cache_stale_if_error,
+    disk=registry_disk_cache
+)
+refresh_scheduler = RefreshScheduler(
+    cached_registry_client.refresh,
+    ttl=settings.registry_cache_ttl,
+    lead=settings.refresh_lead,
+    date_lead=settings.refresh_date_lead,
+    track_window=settings.refresh_track_window,
+    # Key and rate limits are for the whole service, split between worker processes
+    max_keys=max(1, settings.refresh_max_keys // max(1, settings.web_concurrency)),
+    rate=settings.refresh_rate / max(1, settings.web_concurrency),
+    offpeak_rate=settings.refresh_offpeak_rate / max(1, settings.web_concurrency),
+    offpeak_start_hour=settings.refresh_offpeak_start_hour,
+    offpeak_end_hour=settings.refresh_offpeak_end_hour,
+    offpeak_lookahead=settings.refresh_offpeak_lookahead,
+    depth_gauge=REFRESH_QUEUE_DEPTH,
+    lag_gauge=REFRESH_LAG,
+    fresh_for=cached_registry_client.fresh_for
+) if (
+    settings.registry_cache_enabled and settings.refresh_scheduler_enabled and settings.refresh_rate > 0
+) else None
+cached_registry_client.scheduler = refresh_scheduler
@@ -0,0 +1,62 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+import structlog
+
+from .metrics import COALESCED_CALLS
+
+logger = structlog.get_logger()
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one in-flight call.
+
+    The first caller for a key starts the call as a separate task; callers
+    arriving while it is running await the same task. Every waiter gets the
+    same result or the same exception. The task is shielded, so a waiter
+    that is cancelled (e.g. the client disconnected) does not cancel the
+    call for the others.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run ``fn()`` for key, or join the call already in flight."""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self.leaders += 1
+            COALESCED_CALLS.labels(role="leader").inc()
+        else:
+            self.coalesced += 1
+            COALESCED_CALLS.labels(role="follower").inc()
+            logger.debug("Joined in-flight call", key=key)
+
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Retrieve the exception so it is not reported as unhandled when
+        # every waiter has gone away before the call finished.
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        """Coalescing counters."""
+        return {
+            "in_flight": self.in_flight,
+            "leaders": self.leaders,
+            "coalesced": self.coalesced
+        }
@@ -1,14 +1,18 @@
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
     """Application settings with environment variable support."""
     
     # Basic Auth
-    auth_username: str = Field(..., env="AUTH_USERNAME")
-    auth_password: str = Field(..., env="AUTH_PASSWORD")
+    auth_username: Optional[str] = Field(default=None, env="AUTH_USERNAME")
+    auth_password: Optional[str] = Field(default=None, env="AUTH_PASSWORD")
+    # API clients with hashed secrets: JSON object {"username": "<bcrypt/argon2 hash>"}
+    auth_clients: Dict[str, str] = Field(default_factory=dict, env="AUTH_CLIENTS")
+    auth_cache_ttl: int = Field(default=60, env="AUTH_CACHE_TTL")
+    auth_cache_max_entries: int = Field(default=1024, env="AUTH_CACHE_MAX_ENTRIES")
     
     # External API
     external_api_url: str = Field(
@@ -16,18 +20,209 @@ class Settings(BaseSettings):
         env="EXTERNAL_API_URL"
     )
     external_api_timeout: int = Field(default=30, env="EXTERNAL_API_TIMEOUT")
+    external_api_connect_timeout: float = Field(
+        default=5.0, env="EXTERNAL_API_CONNECT_TIMEOUT"
+    )
+    external_api_pool_timeout: float = Field(
+        default=5.0, env="EXTERNAL_API_POOL_TIMEOUT"
+    )
+    external_api_max_connections: int = Field(
+        default=200, env="EXTERNAL_API_MAX_CONNECTIONS"
+    )
+    external_api_max_keepalive_connections: int = Field(
+        default=50, env="EXTERNAL_API_MAX_KEEPALIVE_CONNECTIONS"
+    )
+    external_api_keepalive_expiry: float = Field(
+        default=30.0, env="EXTERNAL_API_KEEPALIVE_EXPIRY"
+    )
+    external_api_http2: bool = Field(default=True, env="EXTERNAL_API_HTTP2")
+    external_api_verify_ssl: bool = Field(
+        default=False, env="EXTERNAL_API_VERIFY_SSL"
+    )
+    
+    # Registry circuit breaker
+    registry_breaker_enabled: bool = Field(default=True, env="REGISTRY_BREAKER_ENABLED")
+    registry_breaker_failure_ratio: float = Field(
+        default=0.5, env="REGISTRY_BREAKER_FAILURE_RATIO"
+    )
+    registry_breaker_min_requests: int = Field(
+        default=20, env="REGISTRY_BREAKER_MIN_REQUESTS"
+    )
+    registry_breaker_window: float = Field(default=30.0, env="REGISTRY_BREAKER_WINDOW")
+    registry_breaker_open_seconds: float = Field(
+        default=30.0, env="REGISTRY_BREAKER_OPEN_SECONDS"
+    )
+    registry_breaker_half_open_probes: int = Field(
+        default=3, env="REGISTRY_BREAKER_HALF_OPEN_PROBES"
+    )
+    
+    # Outbound governor: caps on registry calls from this process
+    registry_governor_enabled: bool = Field(default=True, env="REGISTRY_GOVERNOR_ENABLED")
+    registry_max_concurrency: int = Field(default=50, env="REGISTRY_MAX_CONCURRENCY")
+    # Requests per second, 0 for no limit
+    registry_rate_limit: float = Field(default=50.0, env="REGISTRY_RATE_LIMIT")
+    registry_rate_burst: int = Field(default=50, env="REGISTRY_RATE_BURST")
+    registry_max_queue_wait: float = Field(default=5.0, env="REGISTRY_MAX_QUEUE_WAIT")
+    
+    # Adaptive registry read timeout: multiplier x latency percentile,
+    # kept between the minimum and external_api_timeout
+    registry_adaptive_timeout_enabled: bool = Field(
+        default=True, env="REGISTRY_ADAPTIVE_TIMEOUT_ENABLED"
+    )
+    registry_adaptive_timeout_percentile: float = Field(
+        default=99.0, env="REGISTRY_ADAPTIVE_TIMEOUT_PERCENTILE"
+    )
+    registry_adaptive_timeout_multiplier: float = Field(
+        default=3.0, env="REGISTRY_ADAPTIVE_TIMEOUT_MULTIPLIER"
+    )
+    registry_adaptive_timeout_min: float = Field(
+        default=2.0, env="REGISTRY_ADAPTIVE_TIMEOUT_MIN"
+    )
+    registry_adaptive_timeout_min_samples: int = Field(
+        default=50, env="REGISTRY_ADAPTIVE_TIMEOUT_MIN_SAMPLES"
+    )
+    
+    # Registry retries and hedging, bounded by a deadline per lookup
+    registry_request_deadline: float = Field(
+        default=30.0, env="REGISTRY_REQUEST_DEADLINE"
+    )
+    registry_retries: int = Field(default=2, env="REGISTRY_RETRIES")
+    registry_retry_backoff_base: float = Field(
+        default=0.1, env="REGISTRY_RETRY_BACKOFF_BASE"
+    )
+    registry_retry_backoff_max: float = Field(
+        default=2.0, env="REGISTRY_RETRY_BACKOFF_MAX"
+    )
+    registry_hedge_enabled: bool = Field(default=False, env="REGISTRY_HEDGE_ENABLED")
+    registry_hedge_percentile: float = Field(
+        default=95.0, env="REGISTRY_HEDGE_PERCENTILE"
+    )
+    registry_hedge_min_delay: float = Field(
+        default=0.05, env="REGISTRY_HEDGE_MIN_DELAY"
+    )
+    registry_hedge_min_samples: int = Field(
+        default=50, env="REGISTRY_HEDGE_MIN_SAMPLES"
+    )
+    
+    # Registry response cache
+    registry_cache_enabled: bool = Field(default=True, env="REGISTRY_CACHE_ENABLED")
+    registry_cache_ttl: int = Field(default=3600, env="REGISTRY_CACHE_TTL")
+    registry_cache_negative_ttl: int = Field(
+        default=300, env="REGISTRY_CACHE_NEGATIVE_TTL"
+    )
+    registry_cache_max_entries: int = Field(
+        default=10000, env="REGISTRY_CACHE_MAX_ENTRIES"
+    )
+    # Seconds past TTL a found record may still be served: immediately with
+    # a background refresh, or only when the registry fails
+    registry_cache_stale_while_revalidate: int = Field(
+        default=600, env="REGISTRY_CACHE_STALE_WHILE_REVALIDATE"
+    )
+    registry_cache_stale_if_error: int = Field(
+        default=86400, env="REGISTRY_CACHE_STALE_IF_ERROR"
+    )
+    # Persistent SQLite tier shared by workers and kept across restarts
+    registry_disk_cache_enabled: bool = Field(
+        default=False, env="REGISTRY_DISK_CACHE_ENABLED"
+    )
+    registry_disk_cache_path: str = Field(
+        default="data/registry_cache.sqlite3", env="REGISTRY_DISK_CACHE_PATH"
+    )
+    registry_disk_cache_max_entries: int = Field(
+        default=1000000, env="REGISTRY_DISK_CACHE_MAX_ENTRIES"
+    )
+    registry_coalescing_enabled: bool = Field(
+        default=True, env="REGISTRY_COALESCING_ENABLED"
+    )
+
+    # Proactive refresh of recently requested records
+    refresh_scheduler_enabled: bool = Field(default=True, env="REFRESH_SCHEDULER_ENABLED")
+    refresh_lead: float = Field(default=300.0, env="REFRESH_LEAD")
+    refresh_date_lead: float = Field(default=21600.0, env="REFRESH_DATE_LEAD")
+    refresh_track_window: float = Field(default=86400.0, env="REFRESH_TRACK_WINDOW")
+    refresh_max_keys: int = Field(default=3000, env="REFRESH_MAX_KEYS")
+    refresh_rate: float = Field(default=1.0, env="REFRESH_RATE")
+    refresh_offpeak_rate: float = Field(default=5.0, env="REFRESH_OFFPEAK_RATE")
+    refresh_offpeak_start_hour: int = Field(default=1, env="REFRESH_OFFPEAK_START_HOUR")
+    refresh_offpeak_end_hour: int = Field(default=6, env="REFRESH_OFFPEAK_END_HOUR")
+    refresh_offpeak_lookahead: float = Field(default=43200.0, env="REFRESH_OFFPEAK_LOOKAHEAD")
+    
+    # Batch and streaming validation
+    batch_max_items: int = Field(default=5000, env="BATCH_MAX_ITEMS")
+    batch_concurrency: int = Field(default=20, env="BATCH_CONCURRENCY")
+    batch_max_body_bytes: int = Field(default=1048576, env="BATCH_MAX_BODY_BYTES")
+    stream_concurrency: int = Field(default=20, env="STREAM_CONCURRENCY")
+    stream_max_line_bytes: int = Field(default=4096, env="STREAM_MAX_LINE_BYTES")
+    
+    # Asynchronous validation jobs, persisted in SQLite
+    jobs_db_path: str = Field(default="data/jobs.sqlite3", env="JOBS_DB_PATH")
+    jobs_max_items: int = Field(default=100000, env="JOBS_MAX_ITEMS")
+    jobs_workers: int = Field(default=2, env="JOBS_WORKERS")
+    jobs_concurrency: int = Field(default=20, env="JOBS_CONCURRENCY")
+    jobs_chunk_size: int = Field(default=100, env="JOBS_CHUNK_SIZE")
+    # Seconds a process keeps a job before others may resume it
+    jobs_lease: float = Field(default=300.0, env="JOBS_LEASE")
+    jobs_retention: float = Field(default=604800.0, env="JOBS_RETENTION")
+    jobs_webhook_timeout: float = Field(default=10.0, env="JOBS_WEBHOOK_TIMEOUT")
+    jobs_webhook_retries: int = Field(default=3, env="JOBS_WEBHOOK_RETRIES")
+    # Signs webhook bodies with HMAC-SHA256 in X-Signature when set
+    jobs_webhook_secret: Optional[str] = Field(default=None, env="JOBS_WEBHOOK_SECRET")
+    # JSON list of webhook hosts; when empty, any host with public addresses only
+    jobs_webhook_allowed_hosts: List[str] = Field(default_factory=list, env="JOBS_WEBHOOK_ALLOWED_HOSTS")
     
     # Rate limiting
     rate_limit_requests: int = Field(default=100, env="RATE_LIMIT_REQUESTS")
     rate_limit_window: int = Field(default=3600, env="RATE_LIMIT_WINDOW")
+    rate_limit_algorithm: str = Field(
+        default="sliding_window", env="RATE_LIMIT_ALGORITHM"
+    )
+    rate_limit_cleanup_interval: int = Field(
+        default=60, env="RATE_LIMIT_CLEANUP_INTERVAL"
+    )
+    rate_limit_backend: str = Field(default="memory", env="RATE_LIMIT_BACKEND")
+    rate_limit_mmap_path: str = Field(
+        default="/dev/shm/elmk_rate_limit", env="RATE_LIMIT_MMAP_PATH"
+    )
+    rate_limit_mmap_slots: int = Field(default=65536, env="RATE_LIMIT_MMAP_SLOTS")
+    rate_limit_redis_url: str = Field(
+        default="redis://localhost:6379/0", env="RATE_LIMIT_REDIS_URL"
+    )
+    rate_limit_redis_prefix: str = Field(
+        default="elmk:rl:", env="RATE_LIMIT_REDIS_PREFIX"
+    )
+    
+    # Admission control: 503 for new requests while the process is overloaded
+    admission_control_enabled: bool = Field(default=True, env="ADMISSION_CONTROL_ENABLED")
+    admission_max_loop_lag: float = Field(default=0.5, env="ADMISSION_MAX_LOOP_LAG")
+    # Requests in flight per process, 0 for no limit
+    admission_max_in_flight: int = Field(default=1000, env="ADMISSION_MAX_IN_FLIGHT")
+    admission_retry_after: int = Field(default=1, env="ADMISSION_RETRY_AFTER")
+    loop_monitor_interval: float = Field(default=0.1, env="LOOP_MONITOR_INTERVAL")
+    
+    # Readiness: background registry probe and connection warmup for /readyz
+    readiness_probe_enabled: bool = Field(default=True, env="READINESS_PROBE_ENABLED")
+    readiness_probe_interval: float = Field(default=10.0, env="READINESS_PROBE_INTERVAL")
+    readiness_probe_timeout: float = Field(default=2.0, env="READINESS_PROBE_TIMEOUT")
+    readiness_warmup_connections: int = Field(default=4, env="READINESS_WARMUP_CONNECTIONS")
+    # Registry requests waiting for an outbound slot before the process
+    # reports not ready, 0 to ignore the queue
+    readiness_max_queued: int = Field(default=100, env="READINESS_MAX_QUEUED")
     
     # Logging
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
     log_format: str = Field(default="json", env="LOG_FORMAT")
+    # Lines waiting for the background writer; more are dropped
+    log_queue_size: int = Field(default=10000, env="LOG_QUEUE_SIZE")
+    log_batch_size: int = Field(default=512, env="LOG_BATCH_SIZE")
+    log_flush_interval: float = Field(default=0.05, env="LOG_FLUSH_INTERVAL")
+    # Share of events kept per level: JSON object {"info": 0.1, "debug": 0.01}
+    log_sample_rates: Dict[str, float] = Field(default_factory=dict, env="LOG_SAMPLE_RATES")
     
     # Server
     host: str = Field(default="0.0.0.0", env="HOST")
     port: int = Field(default=8000, env="PORT")
+    # Worker processes serving the app; outbound registry limits are split between them
+    web_concurrency: int = Field(default=1, env="WEB_CONCURRENCY")
     debug: bool = Field(default=False, env="DEBUG")
     
     # Security
@@ -0,0 +1,177 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+import structlog
+
+from .metrics import DISK_CACHE_LOOKUPS
+from .models import ExternalAPIResponse
+
+logger = structlog.get_logger()
+
+CacheKey = Tuple[str, str]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS registry_cache (
+    elmk_number TEXT NOT NULL,
+    snils TEXT NOT NULL,
+    value TEXT,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (elmk_number, snils)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS registry_cache_stored_at ON registry_cache (stored_at);
+CREATE INDEX IF NOT EXISTS registry_cache_expires_at ON registry_cache (expires_at);
+"""
+
+
+@dataclass
+class DiskEntry:
+    """Registry result read from disk. ``value`` is None for "not found"."""
+
+    value: Optional[ExternalAPIResponse]
+    age: float
+
+
+class DiskCache:
+    """Registry results in SQLite, surviving restarts and shared by workers.
+
+    The database runs in WAL mode, so readers in any process never block
+    on a writer and writers wait for each other up to ``busy_timeout``.
+    Entries are kept until ``expires_at``, which callers set to cover the
+    stale windows as well; freshness is decided by the in-memory tier from
+    the entry age. Times are wall-clock so they stay valid across restarts.
+
+    Every ``evict_every`` writes, expired rows are purged and, above
+    ``max_entries``, the oldest rows are dropped. Eviction is by store time
+    rather than last access so that reads stay read-only.
+
+    Blocking SQLite calls run on a small dedicated thread pool with one
+    connection per thread; use the ``a*`` coroutines from the event loop.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 1_000_000,
+        evict_every: int = 1000,
+        threads: int = 4,
+        busy_timeout: float = 5.0,
+        clock: Callable[[], float] = time.time
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self.busy_timeout = busy_timeout
+        self._clock = clock
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="disk-cache")
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # A connection must not be inherited by worker processes forked
+        # after import, so the schema is set up on one that is closed here
+        conn = sqlite3.connect(path, timeout=busy_timeout)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout,
+                isolation_level=None,
+                check_same_thread=False
+            )
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def get(self, key: CacheKey) -> Optional[DiskEntry]:
+        """Return the entry for key unless it is missing or past ``expires_at``."""
+        now = self._clock()
+        row = self._connection().execute(
+            "SELECT value, stored_at FROM registry_cache"
+            " WHERE elmk_number = ? AND snils = ? AND expires_at > ?",
+            (key[0], key[1], now)
+        ).fetchone()
+        if row is None:
+            DISK_CACHE_LOOKUPS.labels(result="miss").inc()
+            return None
+
+        value, stored_at = row
+        DISK_CACHE_LOOKUPS.labels(result="hit").inc()
+        return DiskEntry(
+            value=ExternalAPIResponse.model_validate_json(value) if value is not None else None,
+            age=max(0.0, now - stored_at)
+        )
+
+    def set(self, key: CacheKey, value: Optional[ExternalAPIResponse], retain: float) -> None:
+        """Store a found record or, with ``value=None``, a "not found" result for ``retain`` seconds."""
+        now = self._clock()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO registry_cache"
+            " (elmk_number, snils, value, stored_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+            (key[0], key[1], value.model_dump_json() if value is not None else None, now, now + retain)
+        )
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self.evict_every == 0
+        if evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """Purge expired rows and trim to ``max_entries``; returns rows removed."""
+        conn = self._connection()
+        removed = conn.execute(
+            "DELETE FROM registry_cache WHERE expires_at <= ?", (self._clock(),)
+        ).rowcount
+        excess = conn.execute("SELECT COUNT(*) FROM registry_cache").fetchone()[0] - self.max_entries
+        if excess > 0:
+            removed += conn.execute(
+                "DELETE FROM registry_cache WHERE (elmk_number, snils) IN"
+                " (SELECT elmk_number, snils FROM registry_cache ORDER BY stored_at LIMIT ?)",
+                (excess,)
+            ).rowcount
+        if removed:
+            logger.debug("Disk cache evicted entries", removed=removed, path=self.path)
+        return removed
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM registry_cache").fetchone()[0]
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM registry_cache")
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def aget(self, key: CacheKey) -> Optional[DiskEntry]:
+        return await self._run(self.get, key)
+
+    async def aset(self, key: CacheKey, value: Optional[ExternalAPIResponse], retain: float) -> None:
+        await self._run(self.set, key, value, retain)
+
+    def close(self) -> None:
+        """Stop the thread pool and close all connections."""
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
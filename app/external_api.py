@@ -1,132 +1,409 @@
+import asyncio
 import httpx
+# httpx imports its transport package when the first client is built;
+# importing it here lets a preloaded gunicorn master load it once for all
+# workers instead of each worker paying for it during startup
+import httpcore  # noqa: F401
 import structlog
-import ssl
-import requests
-import urllib3
-import subprocess
-import json
+import time
 from typing import Optional
 from fastapi import HTTPException, status
+from prometheus_client import Gauge
 
 from .config import settings
+from .metrics import (
+    REGISTRY_BREAKER_STATE,
+    REGISTRY_HEDGES,
+    REGISTRY_IN_FLIGHT,
+    REGISTRY_LATENCY,
+    REGISTRY_QUEUE_DEPTH,
+    REGISTRY_RETRIES,
+    REGISTRY_TIMEOUT,
+)
+from .governor import OutboundGovernor
 from .models import ExternalAPIResponse
-
-# Disable SSL warnings
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from .resilience import (
+    CLOSED,
+    CircuitBreaker,
+    DeadlineExceeded,
+    LatencyTracker,
+    adaptive_timeout,
+    backoff_delay,
+)
 
 logger = structlog.get_logger()
 
 
+def _http2_available() -> bool:
+    """Check whether the optional h2 package required for HTTP/2 is installed."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def format_elmk_number(elmk_number: str) -> str:
+    """Format ELMK number with dashes (convert 860102797025 to 86-01-027970-25)."""
+    return f"{elmk_number[:2]}-{elmk_number[2:4]}-{elmk_number[4:10]}-{elmk_number[10:]}"
+
+
 class ExternalAPIClient:
-    """Client for external medical book registry API."""
-    
-    def __init__(self):
-        self.base_url = settings.external_api_url
-        self.timeout = settings.external_api_timeout
-    
+    """Client for external medical book registry API.
+
+    Wraps a single long-lived ``httpx.AsyncClient`` so that registry lookups
+    share pooled keep-alive connections instead of paying a TLS handshake
+    per request. The pool is opened by ``start()`` and released by
+    ``close()``, both called from the application lifespan.
+
+    With a ``breaker`` the client fails fast with ``CircuitOpenError`` while
+    the registry is failing. The read timeout adapts to observed latency
+    (see ``read_timeout()``), so a degraded registry does not hold requests
+    for the full ``external_api_timeout``.
+
+    With a ``governor`` every attempt, retries and hedges included, first
+    waits for an outbound slot at the caller's ``registry_priority``.
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        timeout: Optional[float] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        timeout_gauge: Optional[Gauge] = None,
+        governor: Optional[OutboundGovernor] = None
+    ):
+        self.base_url = base_url or settings.external_api_url
+        self.timeout = timeout or settings.external_api_timeout
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self.http2 = settings.external_api_http2 and _http2_available()
+        self.breaker = breaker
+        self.latency = LatencyTracker()
+        self._timeout_gauge = timeout_gauge
+        self.governor = governor
+        # Monotonic time of the last registry response below 500
+        self.last_success: Optional[float] = None
+
+    def _build_client(self) -> httpx.AsyncClient:
+        """Create the pooled HTTP client from settings."""
+        if settings.external_api_http2 and not self.http2:
+            logger.warning("HTTP/2 requested but h2 is not installed, using HTTP/1.1")
+
+        return httpx.AsyncClient(
+            http2=self.http2,
+            verify=settings.external_api_verify_ssl,
+            timeout=httpx.Timeout(
+                self.timeout,
+                connect=settings.external_api_connect_timeout,
+                read=self.timeout,
+                pool=settings.external_api_pool_timeout
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.external_api_max_connections,
+                max_keepalive_connections=settings.external_api_max_keepalive_connections,
+                keepalive_expiry=settings.external_api_keepalive_expiry
+            ),
+            transport=self._transport,
+            headers={"Accept": "application/json"}
+        )
+
+    async def start(self) -> None:
+        """Open the connection pool."""
+        if self._client is None:
+            self._client = self._build_client()
+            logger.info(
+                "External API client started",
+                url=self.base_url,
+                http2=self.http2
+            )
+
+    async def close(self) -> None:
+        """Close the connection pool."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logger.info("External API client closed")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Pooled HTTP client, created on first use if ``start()`` was not called."""
+        if self._client is None:
+            self._client = self._build_client()
+        return self._client
+
+    def read_timeout(self) -> float:
+        """Read timeout for the next request, derived from recent latency."""
+        if not settings.registry_adaptive_timeout_enabled:
+            return self.timeout
+        return adaptive_timeout(
+            self.latency,
+            ceiling=self.timeout,
+            percentile=settings.registry_adaptive_timeout_percentile,
+            multiplier=settings.registry_adaptive_timeout_multiplier,
+            floor=settings.registry_adaptive_timeout_min,
+            min_samples=settings.registry_adaptive_timeout_min_samples
+        )
+
+    def hedge_delay(self) -> Optional[float]:
+        """Delay before a hedged second attempt, None when hedging is off."""
+        if not settings.registry_hedge_enabled:
+            return None
+        if len(self.latency) < settings.registry_hedge_min_samples:
+            return None
+        if self.breaker is not None and self.breaker.state != CLOSED:
+            # Probes of a recovering registry are not duplicated
+            return None
+        return max(
+            settings.registry_hedge_min_delay,
+            self.latency.percentile(settings.registry_hedge_percentile)
+        )
+
     async def get_medical_book_info(
         self, elmk_number: str, snils: str
     ) -> ExternalAPIResponse:
         """
         Get medical book information from external API.
-        
+
+        Connection errors and 5xx responses are retried with jittered
+        exponential backoff, and a slow attempt may be hedged by a second
+        one (see ``hedge_delay()``). All attempts share the
+        ``registry_request_deadline`` budget.
+
         Args:
             elmk_number: Medical book number (12 digits)
             snils: SNILS number (11 digits)
-            
+
         Returns:
             ExternalAPIResponse: Medical book information
-            
+
         Raises:
-            HTTPException: If external API request fails
+            httpx.HTTPStatusError: If registry responds with an error status
+            httpx.TimeoutException: If registry does not respond in time,
+                ``DeadlineExceeded`` if the request deadline ran out
+            httpx.ConnectError: If registry is unreachable
+            HTTPException: If registry response cannot be parsed
+            CircuitOpenError: If the circuit breaker is open
+            QueueWaitExceeded: If no outbound slot freed up in time
         """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.registry_request_deadline
+        attempt = 0
+
+        while True:
+            remaining = deadline - loop.time()
+            read_timeout = min(self.read_timeout(), remaining)
+            if self._timeout_gauge is not None:
+                self._timeout_gauge.set(read_timeout)
+            try:
+                return await asyncio.wait_for(
+                    self._hedged(elmk_number, snils, read_timeout), timeout=remaining
+                )
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(
+                    f"Registry request deadline of {settings.registry_request_deadline}s exceeded"
+                ) from None
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.HTTPStatusError) as exc:
+                if not _is_retryable(exc) or attempt >= settings.registry_retries:
+                    raise
+                delay = backoff_delay(
+                    attempt,
+                    settings.registry_retry_backoff_base,
+                    settings.registry_retry_backoff_max
+                )
+                if loop.time() + delay >= deadline:
+                    raise
+                attempt += 1
+                reason = "http_5xx" if isinstance(exc, httpx.HTTPStatusError) else "connect_error"
+                REGISTRY_RETRIES.labels(reason=reason).inc()
+                logger.warning(
+                    "Retrying external API request",
+                    elmk_number=elmk_number,
+                    attempt=attempt,
+                    reason=reason,
+                    delay=delay
+                )
+                await asyncio.sleep(delay)
+
+    async def _hedged(
+        self, elmk_number: str, snils: str, read_timeout: float
+    ) -> ExternalAPIResponse:
+        """One attempt, raced against a second one if it is slower than the hedge delay."""
+        hedge_delay = self.hedge_delay()
+        if hedge_delay is None:
+            return await self._attempt(elmk_number, snils, read_timeout)
+
+        primary = asyncio.ensure_future(self._attempt(elmk_number, snils, read_timeout))
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_delay)
+            if not done:
+                REGISTRY_HEDGES.labels(result="launched").inc()
+                logger.info("Hedging external API request", elmk_number=elmk_number, delay=hedge_delay)
+                pending.add(asyncio.ensure_future(self._attempt(elmk_number, snils, read_timeout)))
+
+            error: Optional[BaseException] = None
+            while True:
+                for task in done:
+                    exc = task.exception()
+                    if exc is None:
+                        if task is not primary:
+                            REGISTRY_HEDGES.labels(result="won").inc()
+                        return task.result()
+                    if not _is_retryable(exc) or not pending:
+                        raise exc
+                    # Wait for the other attempt before giving up
+                    error = exc
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _attempt(
+        self, elmk_number: str, snils: str, read_timeout: float
+    ) -> ExternalAPIResponse:
+        """Single registry request, holding an outbound slot when governed."""
+        if self.governor is None:
+            return await self._request(elmk_number, snils, read_timeout)
+        async with self.governor.slot():
+            return await self._request(elmk_number, snils, read_timeout)
+
+    async def _request(
+        self, elmk_number: str, snils: str, read_timeout: float
+    ) -> ExternalAPIResponse:
+        """Single registry request with breaker accounting and metrics."""
+        generation = self.breaker.before_call() if self.breaker is not None else 0
+
         params = {
-            "elmk_number": elmk_number,
+            "elmk_number": format_elmk_number(elmk_number),
             "snils": snils
         }
-        
+
         logger.info(
             "Requesting external API",
             elmk_number=elmk_number,
             snils=snils,
             url=self.base_url
         )
-        
+
+        request_timeout = httpx.Timeout(
+            read_timeout,
+            connect=settings.external_api_connect_timeout,
+            pool=settings.external_api_pool_timeout
+        )
+
+        outcome = "error"
+        # Outcome for the breaker, None when the call ended without one
+        failed: Optional[bool] = True
+        started = time.perf_counter()
         try:
-            # Format ELMK number with dashes (convert 860102797025 to 86-01-027970-25)
-            formatted_elmk = f"{elmk_number[:2]}-{elmk_number[2:4]}-{elmk_number[4:10]}-{elmk_number[10:]}"
-            
-            # Use curl with SSL verification disabled
-            url = f"{self.base_url}?elmk_number={formatted_elmk}&snils={snils}"
-            result = subprocess.run(
-                ["curl", "-k", "-s", url],
-                capture_output=True,
-                text=True,
-                timeout=self.timeout
-            )
-            
+            with REGISTRY_IN_FLIGHT.track_inprogress():
+                response = await self.client.get(
+                    self.base_url, params=params, timeout=request_timeout
+                )
+            elapsed = time.perf_counter() - started
+
             logger.info(
                 "External API response received",
-                return_code=result.returncode,
+                status_code=response.status_code,
+                http_version=response.http_version,
                 elmk_number=elmk_number
             )
-            
-            if result.returncode == 0:
-                try:
-                    data = json.loads(result.stdout)
-                    return ExternalAPIResponse(**data)
-                except json.JSONDecodeError:
-                    logger.error(
-                        "Invalid JSON response",
-                        response_text=result.stdout[:200],
-                        elmk_number=elmk_number
-                    )
-                    raise HTTPException(
-                        status_code=status.HTTP_502_BAD_GATEWAY,
-                        detail="Invalid response from external API"
-                    )
-            else:
+
+            failed = response.status_code >= 500
+            if not failed:
+                self.latency.observe(elapsed)
+                self.last_success = time.monotonic()
+            if response.status_code == 404:
+                outcome = "not_found"
+            elif response.is_error:
+                outcome = "http_error"
+            response.raise_for_status()
+
+            try:
+                result = ExternalAPIResponse.model_validate_json(response.content)
+            except ValueError:
+                outcome = "bad_json"
+                failed = True
                 logger.error(
-                    "External API error",
-                    return_code=result.returncode,
-                    error_text=result.stderr[:200],
+                    "Invalid JSON response",
+                    response_text=response.text[:200],
                     elmk_number=elmk_number
                 )
                 raise HTTPException(
                     status_code=status.HTTP_502_BAD_GATEWAY,
-                    detail=f"External API error: {result.returncode}"
+                    detail="Invalid response from external API"
                 )
-                    
-        except subprocess.TimeoutExpired:
-            logger.error(
-                "External API timeout",
-                timeout=self.timeout,
-                elmk_number=elmk_number
-            )
-            raise HTTPException(
-                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                detail="External API timeout"
-            )
-        except FileNotFoundError:
-            logger.error(
-                "curl not found in system",
-                elmk_number=elmk_number
-            )
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="External API unavailable - curl not found"
-            )
-        except Exception as e:
-            logger.error(
-                "Unexpected error during external API call",
-                error=str(e),
-                elmk_number=elmk_number
-            )
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Internal server error"
-            )
+            outcome = "ok"
+            return result
+        except httpx.TimeoutException:
+            outcome = "timeout"
+            raise
+        except httpx.ConnectError:
+            outcome = "connect_error"
+            raise
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            failed = None
+            raise
+        finally:
+            REGISTRY_LATENCY.labels(outcome=outcome).observe(time.perf_counter() - started)
+            if self.breaker is not None:
+                if failed is None:
+                    self.breaker.release(generation)
+                else:
+                    self.breaker.record(generation, failed)
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    """Whether a failed attempt may be repeated: the request never reached the registry or got a 5xx."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    return isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout))
+
+
+def create_registry_breaker(state_gauge: Optional[Gauge] = None) -> Optional[CircuitBreaker]:
+    """Circuit breaker for registry calls from settings, None when disabled."""
+    if not settings.registry_breaker_enabled:
+        return None
+    return CircuitBreaker(
+        "registry",
+        failure_ratio=settings.registry_breaker_failure_ratio,
+        min_requests=settings.registry_breaker_min_requests,
+        window=settings.registry_breaker_window,
+        open_seconds=settings.registry_breaker_open_seconds,
+        half_open_probes=settings.registry_breaker_half_open_probes,
+        state_gauge=state_gauge
+    )
+
+
+def create_registry_governor(depth_gauge: Optional[Gauge] = None) -> Optional[OutboundGovernor]:
+    """
+    Outbound governor for registry calls from settings, None when disabled.
+
+    The configured limits are for the whole service, so each of the
+    ``web_concurrency`` worker processes gets an equal share.
+    """
+    if not settings.registry_governor_enabled:
+        return None
+    workers = max(1, settings.web_concurrency)
+    return OutboundGovernor(
+        max_concurrency=max(1, settings.registry_max_concurrency // workers),
+        rate=settings.registry_rate_limit / workers,
+        burst=max(1, settings.registry_rate_burst // workers),
+        max_queue_wait=settings.registry_max_queue_wait,
+        depth_gauge=depth_gauge
+    )
 
 
 # Global client instance
-external_api_client = ExternalAPIClient()
\ No newline at end of file
+external_api_client = ExternalAPIClient(
+    breaker=create_registry_breaker(state_gauge=REGISTRY_BREAKER_STATE),
+    timeout_gauge=REGISTRY_TIMEOUT,
+    governor=create_registry_governor(depth_gauge=REGISTRY_QUEUE_DEPTH)
+)
@@ -0,0 +1,166 @@
+import asyncio
+import heapq
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Callable, Iterator, List, Optional, Tuple
+
+import structlog
+from prometheus_client import Gauge
+
+from .metrics import REGISTRY_QUEUE_WAIT, REGISTRY_SHED
+from .rate_limit import State, TokenBucket
+
+logger = structlog.get_logger()
+
+# Priorities, lower is served first
+INTERACTIVE = 0
+BATCH = 1
+PREFETCH = 2
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch", PREFETCH: "prefetch"}
+
+# Priority of registry calls made from the current task; bulk endpoints and
+# background refreshes lower it, tasks they spawn inherit it
+registry_priority: ContextVar[int] = ContextVar("registry_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def call_priority(priority: int) -> Iterator[None]:
+    """Make registry calls from the block, and tasks started in it, at ``priority``."""
+    token = registry_priority.set(priority)
+    try:
+        yield
+    finally:
+        registry_priority.reset(token)
+
+
+class QueueWaitExceeded(Exception):
+    """Raised when a call waited longer than allowed for an outbound slot."""
+
+    def __init__(self, waited: float, retry_after: float):
+        super().__init__(f"Registry request queue wait of {waited:.3f}s exceeded")
+        self.waited = waited
+        self.retry_after = retry_after
+
+
+class OutboundGovernor:
+    """Caps concurrency and request rate of calls to an upstream.
+
+    At most ``max_concurrency`` calls hold a slot at a time and new slots
+    are handed out at no more than ``rate`` per second, with bursts up to
+    ``burst`` (``rate=0`` disables the rate limit). Callers that cannot get
+    a slot right away queue by priority, then arrival order, so interactive
+    requests overtake batch and prefetch traffic. A caller that waits more
+    than ``max_queue_wait`` seconds gives up with ``QueueWaitExceeded``.
+
+    Limits are per process.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        rate: float = 0.0,
+        burst: int = 1,
+        max_queue_wait: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+        depth_gauge: Optional[Gauge] = None
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue_wait = max_queue_wait
+        self._bucket = TokenBucket(burst, burst / rate) if rate > 0 else None
+        self._bucket_state: Optional[State] = None
+        self._clock = clock
+        self._depth_gauge = depth_gauge
+        # (priority, sequence, future); futures of callers that gave up are done
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.in_flight = 0
+        self.queued = 0
+
+    def _take_token(self) -> float:
+        """Take a rate token; seconds until one is available if there is none."""
+        if self._bucket is None:
+            return 0.0
+        self._bucket_state, decision = self._bucket.step(self._bucket_state, self._clock())
+        return decision.retry_after
+
+    def _update_depth(self) -> None:
+        if self._depth_gauge is not None:
+            self._depth_gauge.set(self.queued)
+
+    def _dispatch(self) -> None:
+        """Hand free slots to queued callers in priority order."""
+        while self._waiters and self.in_flight < self.max_concurrency:
+            future = self._waiters[0][2]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            delay = self._take_token()
+            if delay > 0:
+                self._wake_in(delay)
+                return
+            heapq.heappop(self._waiters)
+            self.in_flight += 1
+            future.set_result(None)
+
+    def _wake_in(self, delay: float) -> None:
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    async def acquire(self, priority: int = INTERACTIVE) -> None:
+        """Wait for a slot; every successful call must be matched by ``release()``."""
+        started = self._clock()
+        label = PRIORITY_NAMES.get(priority, str(priority))
+        if not self._waiters and self.in_flight < self.max_concurrency and self._take_token() <= 0:
+            self.in_flight += 1
+            REGISTRY_QUEUE_WAIT.labels(priority=label).observe(0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._sequence += 1
+        heapq.heappush(self._waiters, (priority, self._sequence, future))
+        self.queued += 1
+        self._update_depth()
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.max_queue_wait)
+        except asyncio.TimeoutError:
+            if not future.done():
+                future.cancel()
+                REGISTRY_SHED.labels(priority=label).inc()
+                waited = self._clock() - started
+                logger.warning("Registry request shed", priority=label, waited=waited, queued=self.queued)
+                raise QueueWaitExceeded(waited, retry_after=self.max_queue_wait) from None
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                future.cancel()
+            raise
+        finally:
+            self.queued -= 1
+            self._update_depth()
+        REGISTRY_QUEUE_WAIT.labels(priority=label).observe(self._clock() - started)
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[int] = None) -> AsyncIterator[None]:
+        """Hold a slot for the block, at ``registry_priority`` unless given."""
+        await self.acquire(registry_priority.get() if priority is None else priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def reset(self) -> None:
+        """Forget rate tokens used so far."""
+        self._bucket_state = None
@@ -0,0 +1,591 @@
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Collection, Dict, List, Optional, Set, Tuple
+
+import httpx
+import structlog
+from prometheus_client import Gauge
+
+from .metrics import JOB_ITEMS, JOB_WEBHOOKS
+from .models import BatchItemResult, JobResponse, MedicalBookRequest
+from .resilience import backoff_delay
+
+logger = structlog.get_logger()
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+
+# Webhook delivery states
+PENDING = "pending"
+DELIVERED = "delivered"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    succeeded INTEGER NOT NULL DEFAULT 0,
+    webhook_url TEXT,
+    webhook_status TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    lease_until REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_lease_until ON jobs (lease_until);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    elmk_number TEXT NOT NULL,
+    snils TEXT NOT NULL,
+    result TEXT,
+    PRIMARY KEY (job_id, idx)
+) WITHOUT ROWID;
+"""
+
+JOB_COLUMNS = (
+    "id, owner, status, total, completed, succeeded, webhook_url, webhook_status, created_at, finished_at"
+)
+
+
+@dataclass
+class Job:
+    id: str
+    owner: str
+    status: str
+    total: int
+    completed: int
+    succeeded: int
+    webhook_url: Optional[str]
+    webhook_status: Optional[str]
+    created_at: float
+    finished_at: Optional[float]
+
+    def to_response(
+        self,
+        results: Optional[List[BatchItemResult]] = None,
+        offset: int = 0,
+        next_offset: Optional[int] = None
+    ) -> JobResponse:
+        return JobResponse(
+            job_id=self.id,
+            status=self.status,
+            total=self.total,
+            completed=self.completed,
+            succeeded=self.succeeded,
+            failed=self.completed - self.succeeded,
+            created_at=datetime.fromtimestamp(self.created_at, timezone.utc),
+            finished_at=(
+                datetime.fromtimestamp(self.finished_at, timezone.utc)
+                if self.finished_at is not None else None
+            ),
+            webhook_status=self.webhook_status,
+            offset=offset,
+            next_offset=next_offset,
+            results=results or []
+        )
+
+
+class JobStore:
+    """Validation jobs and their per-item results in SQLite.
+
+    A job is owned by the process holding its lease: ``lease_until`` is
+    pushed forward as results are saved, and a process picks up jobs whose
+    lease ran out (see ``claim_expired``), so jobs of a crashed process are
+    resumed by whichever process looks next. Items keep their result once
+    saved and only items without one are looked up again.
+
+    Calls are blocking and run on a single dedicated thread; use ``call()``
+    from the event loop.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 5.0, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._clock = clock
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def open(self) -> None:
+        if self._conn is not None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store")
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.open()
+        return self._conn
+
+    async def call(self, fn, *args):
+        """Run a store method on the store thread."""
+        if self._executor is None:
+            self.open()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def create(
+        self,
+        owner: str,
+        items: List[MedicalBookRequest],
+        webhook_url: Optional[str],
+        lease: float
+    ) -> Job:
+        now = self._clock()
+        job = Job(uuid.uuid4().hex, owner, QUEUED, len(items), 0, 0, webhook_url, None, now, None)
+        conn = self.conn
+        conn.execute("BEGIN")
+        try:
+            conn.execute(
+                "INSERT INTO jobs (id, owner, status, total, webhook_url, created_at, lease_until)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job.id, owner, QUEUED, job.total, webhook_url, now, now + lease)
+            )
+            conn.executemany(
+                "INSERT INTO job_items (job_id, idx, elmk_number, snils) VALUES (?, ?, ?, ?)",
+                ((job.id, index, item.elmk_number, item.snils) for index, item in enumerate(items))
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self.conn.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job(*row) if row is not None else None
+
+    def pending(self, job_id: str) -> List[Tuple[int, str, str]]:
+        """(index, ELMK number, SNILS) of items without a result, in input order."""
+        return self.conn.execute(
+            "SELECT idx, elmk_number, snils FROM job_items"
+            " WHERE job_id = ? AND result IS NULL ORDER BY idx",
+            (job_id,)
+        ).fetchall()
+
+    def save_results(self, job_id: str, results: List[BatchItemResult], lease: float) -> None:
+        """Store item results, update progress and extend the lease, in one transaction."""
+        succeeded = sum(1 for result in results if result.status_code == 200)
+        conn = self.conn
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "UPDATE job_items SET result = ? WHERE job_id = ? AND idx = ?",
+                ((result.model_dump_json(), job_id, result.index) for result in results)
+            )
+            conn.execute(
+                "UPDATE jobs SET status = ?, completed = completed + ?, succeeded = succeeded + ?,"
+                " lease_until = ? WHERE id = ?",
+                (RUNNING, len(results), succeeded, self._clock() + lease, job_id)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def finish(self, job_id: str) -> Job:
+        self.conn.execute(
+            "UPDATE jobs SET status = ?, finished_at = ?,"
+            " webhook_status = CASE WHEN webhook_url IS NULL THEN NULL ELSE ? END"
+            " WHERE id = ?",
+            (COMPLETED, self._clock(), PENDING, job_id)
+        )
+        return self.get(job_id)
+
+    def set_webhook_status(self, job_id: str, webhook_status: str) -> None:
+        self.conn.execute("UPDATE jobs SET webhook_status = ? WHERE id = ?", (webhook_status, job_id))
+
+    def extend_leases(self, job_ids: List[str], lease: float) -> None:
+        until = self._clock() + lease
+        self.conn.executemany(
+            "UPDATE jobs SET lease_until = ? WHERE id = ?", ((until, job_id) for job_id in job_ids)
+        )
+
+    def release(self, job_ids: List[str]) -> None:
+        """Give up leases so that the next process to start resumes the jobs at once."""
+        self.conn.executemany("UPDATE jobs SET lease_until = 0 WHERE id = ?", ((job_id,) for job_id in job_ids))
+
+    def claim_expired(self, lease: float) -> List[str]:
+        """Take over jobs with unfinished work whose lease ran out, oldest first."""
+        now = self._clock()
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            job_ids = [row[0] for row in conn.execute(
+                "SELECT id FROM jobs WHERE lease_until < ?"
+                " AND (status != ? OR webhook_status = ?) ORDER BY created_at",
+                (now, COMPLETED, PENDING)
+            )]
+            conn.executemany(
+                "UPDATE jobs SET lease_until = ? WHERE id = ?",
+                ((now + lease, job_id) for job_id in job_ids)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return job_ids
+
+    def results(self, job_id: str, offset: int, limit: int) -> List[BatchItemResult]:
+        """Finished results of items ``offset`` to ``offset + limit - 1``."""
+        rows = self.conn.execute(
+            "SELECT result FROM job_items WHERE job_id = ? AND idx >= ? AND idx < ?"
+            " AND result IS NOT NULL ORDER BY idx",
+            (job_id, offset, offset + limit)
+        ).fetchall()
+        return [BatchItemResult.model_validate_json(row[0]) for row in rows]
+
+    def purge(self, finished_before: float) -> int:
+        """Delete jobs finished before the given time; returns jobs removed."""
+        conn = self.conn
+        conn.execute("BEGIN")
+        try:
+            conn.execute(
+                "DELETE FROM job_items WHERE job_id IN"
+                " (SELECT id FROM jobs WHERE status = ? AND finished_at < ?)",
+                (COMPLETED, finished_before)
+            )
+            removed = conn.execute(
+                "DELETE FROM jobs WHERE status = ? AND finished_at < ?", (COMPLETED, finished_before)
+            ).rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return removed
+
+
+class WebhookRejected(Exception):
+    """The webhook URL no longer passes the address check."""
+
+
+def webhook_signature(secret: str, body: bytes) -> str:
+    """Value of the ``X-Signature`` webhook header: HMAC-SHA256 of the body."""
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+Resolver = Callable[[str], Awaitable[List[str]]]
+
+
+async def resolve_host(host: str) -> List[str]:
+    """Addresses of host from the system resolver."""
+    infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+    return [info[4][0] for info in infos]
+
+
+async def webhook_address(
+    url: str,
+    allowed_hosts: Collection[str] = (),
+    resolve: Resolver = resolve_host
+) -> Tuple[Optional[str], Optional[str]]:
+    """Address to send a webhook for ``url`` to, and why jobs may not notify it.
+
+    With ``allowed_hosts`` the host must be one of them and is resolved as
+    usual when sending (address None). Otherwise every address the host
+    resolves to must be public, so a job cannot make the service call
+    loopback, link-local (cloud metadata) or private networks; the first
+    one is returned, for the webhook to be sent to that checked address.
+    """
+    host = httpx.URL(url).host
+    if allowed_hosts:
+        if host not in {allowed.lower() for allowed in allowed_hosts}:
+            return None, f"Webhook host {host} is not allowed"
+        return None, None
+    try:
+        addresses = [ipaddress.ip_address(host)]
+    except ValueError:
+        try:
+            addresses = [ipaddress.ip_address(address) for address in await resolve(host)]
+        except (OSError, ValueError):
+            addresses = []
+        if not addresses:
+            return None, f"Webhook host {host} cannot be resolved"
+    if not all(address.is_global for address in addresses):
+        return None, f"Webhook host {host} is not a public address"
+    return str(addresses[0]), None
+
+
+class JobManager:
+    """Runs validation jobs in the background on a pool of workers.
+
+    Submitted jobs are queued and picked up by ``workers`` tasks, one job
+    per worker at a time. Items of a job are validated by ``validate``,
+    ``concurrency`` at a time, and saved ``chunk_size`` at a time, so a
+    restart loses at most the chunk in progress. When a job finishes and
+    has a webhook URL, its summary is POSTed there, retried with backoff up
+    to ``webhook_retries`` times. The URL is checked with
+    ``webhook_address()`` at submit and again before every attempt, and
+    the request goes to the address that passed the check, so a host
+    cannot be rebound to an internal address in between. Redirects are
+    not followed.
+
+    On start, and every ``lease / 2`` seconds after, jobs left unfinished
+    by a stopped or crashed process are claimed and resumed. A clean stop
+    releases the jobs of this process, so they resume as soon as the
+    service is back.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        validate: Callable[[MedicalBookRequest, str, int], Awaitable[BatchItemResult]],
+        workers: int = 2,
+        concurrency: int = 20,
+        chunk_size: int = 100,
+        lease: float = 300.0,
+        retention: float = 7 * 86400.0,
+        webhook_timeout: float = 10.0,
+        webhook_retries: int = 3,
+        webhook_backoff_base: float = 1.0,
+        webhook_backoff_max: float = 30.0,
+        webhook_secret: Optional[str] = None,
+        webhook_transport: Optional[httpx.AsyncBaseTransport] = None,
+        webhook_allowed_hosts: Collection[str] = (),
+        webhook_resolve: Resolver = resolve_host,
+        depth_gauge: Optional[Gauge] = None
+    ):
+        self.store = store
+        self._validate = validate
+        self.workers = workers
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        self.lease = lease
+        self.retention = retention
+        self.webhook_timeout = webhook_timeout
+        self.webhook_retries = webhook_retries
+        self.webhook_backoff_base = webhook_backoff_base
+        self.webhook_backoff_max = webhook_backoff_max
+        self.webhook_secret = webhook_secret
+        self._webhook_transport = webhook_transport
+        self.webhook_allowed_hosts = webhook_allowed_hosts
+        self._webhook_resolve = webhook_resolve
+        self._depth_gauge = depth_gauge
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Jobs queued or running in this process
+        self._known: Set[str] = set()
+        self._webhook_client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def webhook_client(self) -> httpx.AsyncClient:
+        """HTTP client for webhooks, created on first delivery.
+
+        Building it loads the CA bundle, which most workers never need.
+        """
+        if self._webhook_client is None:
+            self._webhook_client = httpx.AsyncClient(
+                timeout=self.webhook_timeout, transport=self._webhook_transport, follow_redirects=False
+            )
+        return self._webhook_client
+
+    def _update_depth(self) -> None:
+        if self._depth_gauge is not None and self._queue is not None:
+            self._depth_gauge.set(self._queue.qsize())
+
+    def _enqueue(self, job_id: str) -> None:
+        if job_id not in self._known:
+            self._known.add(job_id)
+            self._queue.put_nowait(job_id)
+            self._update_depth()
+
+    async def submit(
+        self, owner: str, items: List[MedicalBookRequest], webhook_url: Optional[str] = None
+    ) -> Job:
+        """Store a new job and queue it for the workers."""
+        job = await self.store.call(self.store.create, owner, items, webhook_url, self.lease)
+        self._enqueue(job.id)
+        logger.info("Validation job submitted", job_id=job.id, total=job.total, user=owner)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await self.store.call(self.store.get, job_id)
+
+    async def results(self, job_id: str, offset: int, limit: int) -> List[BatchItemResult]:
+        return await self.store.call(self.store.results, job_id, offset, limit)
+
+    async def _validate_chunk(
+        self, owner: str, items: List[Tuple[int, str, str]]
+    ) -> List[BatchItemResult]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def validate_one(index: int, elmk_number: str, snils: str) -> BatchItemResult:
+            # Stored numbers were validated on submit
+            item = MedicalBookRequest.model_construct(elmk_number=elmk_number, snils=snils)
+            async with semaphore:
+                result = await self._validate(item, owner, index)
+            JOB_ITEMS.labels(result="ok" if result.status_code == 200 else "error").inc()
+            return result
+
+        return await asyncio.gather(*(validate_one(*item) for item in items))
+
+    async def run_job(self, job_id: str) -> None:
+        """Validate the items of a job that have no result yet, then report completion."""
+        job = await self.get(job_id)
+        if job is None:
+            return
+        if job.status != COMPLETED:
+            pending = await self.store.call(self.store.pending, job_id)
+            if pending:
+                logger.info(
+                    "Validation job started",
+                    job_id=job_id,
+                    pending=len(pending),
+                    total=job.total
+                )
+            for start in range(0, len(pending), self.chunk_size):
+                results = await self._validate_chunk(job.owner, pending[start:start + self.chunk_size])
+                await self.store.call(self.store.save_results, job_id, results, self.lease)
+            job = await self.store.call(self.store.finish, job_id)
+            logger.info(
+                "Validation job completed",
+                job_id=job_id,
+                total=job.total,
+                succeeded=job.succeeded
+            )
+        if job.webhook_status == PENDING:
+            await self.deliver_webhook(job)
+
+    async def webhook_url_error(self, url: str) -> Optional[str]:
+        """Why jobs may not notify ``url``; None when they may."""
+        _, error = await webhook_address(url, self.webhook_allowed_hosts, self._webhook_resolve)
+        return error
+
+    async def _post_webhook(self, url: str, body: bytes, headers: Dict[str, str]) -> httpx.Response:
+        """POST to url at the address that passed the check, keeping its Host and SNI."""
+        address, error = await webhook_address(url, self.webhook_allowed_hosts, self._webhook_resolve)
+        if error is not None:
+            raise WebhookRejected(error)
+        if address is None:
+            return await self.webhook_client.post(url, content=body, headers=headers)
+        original = httpx.URL(url)
+        return await self.webhook_client.post(
+            original.copy_with(host=address),
+            content=body,
+            headers={**headers, "Host": original.netloc.decode("ascii")},
+            extensions={"sni_hostname": original.host}
+        )
+
+    async def deliver_webhook(self, job: Job) -> bool:
+        """POST the job summary to its webhook URL; returns whether it was accepted."""
+        body = job.to_response().model_dump_json(exclude={"offset", "next_offset", "results"}).encode()
+        headers = {"Content-Type": "application/json", "X-Job-Id": job.id}
+        if self.webhook_secret:
+            headers["X-Signature"] = webhook_signature(self.webhook_secret, body)
+
+        for attempt in range(self.webhook_retries + 1):
+            if attempt:
+                await asyncio.sleep(backoff_delay(
+                    attempt - 1, self.webhook_backoff_base, self.webhook_backoff_max
+                ))
+                await self.store.call(self.store.extend_leases, [job.id], self.lease)
+            try:
+                response = await self._post_webhook(job.webhook_url, body, headers)
+            except (httpx.HTTPError, WebhookRejected) as e:
+                error = str(e) or type(e).__name__
+            else:
+                if response.is_success:
+                    await self.store.call(self.store.set_webhook_status, job.id, DELIVERED)
+                    JOB_WEBHOOKS.labels(result="delivered").inc()
+                    return True
+                error = f"HTTP {response.status_code}"
+            logger.warning("Job webhook delivery failed", job_id=job.id, attempt=attempt, error=error)
+
+        await self.store.call(self.store.set_webhook_status, job.id, FAILED)
+        JOB_WEBHOOKS.labels(result="failed").inc()
+        return False
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            self._update_depth()
+            try:
+                await self.run_job(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Validation job failed", job_id=job_id, error=str(e) or type(e).__name__)
+            # A cancelled job stays known, so that stop() releases it
+            self._known.discard(job_id)
+
+    async def _reclaim(self) -> None:
+        while True:
+            try:
+                # Keep jobs waiting in the queue from being taken over
+                await self.store.call(self.store.extend_leases, list(self._known), self.lease)
+                for job_id in await self.store.call(self.store.claim_expired, self.lease):
+                    logger.info("Resuming validation job", job_id=job_id)
+                    self._enqueue(job_id)
+            except Exception as e:
+                logger.error("Validation job reclaim failed", error=str(e))
+            await asyncio.sleep(self.lease / 2)
+
+    async def start(self) -> None:
+        """Open the store, resume unfinished jobs and start the workers."""
+        if self._tasks:
+            return
+        self.store.open()
+        removed = await self.store.call(self.store.purge, time.time() - self.retention)
+        if removed:
+            logger.info("Purged old validation jobs", removed=removed)
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.ensure_future(self._reclaim()))
+
+    async def stop(self) -> None:
+        """Stop the workers and release the jobs they had not finished."""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+        unfinished = list(self._known)
+        self._known.clear()
+        if self._queue is not None:
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._update_depth()
+        if unfinished:
+            await self.store.call(self.store.release, unfinished)
+            logger.info("Validation jobs left for resume", jobs=len(unfinished))
+
+        if self._webhook_client is not None:
+            await self._webhook_client.aclose()
+            self._webhook_client = None
+        self.store.close()
@@ -0,0 +1,202 @@
+import logging
+import random
+import sys
+import threading
+from collections import deque
+from typing import BinaryIO, Callable, Deque, Dict, List, Optional, Union
+
+import structlog
+from prometheus_client import Counter
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+Line = Union[bytes, str]
+
+
+class QueueLogWriter:
+    """Writes rendered log lines to a stream from a background thread.
+
+    Request handlers only append the line to an in-memory queue; every
+    ``flush_interval`` seconds the writer thread takes up to ``max_batch``
+    lines at a time and writes them with a single call, so the event loop
+    never blocks on stdout. When ``max_queue`` lines are already waiting
+    new ones are dropped and counted rather than buffered without bound.
+
+    Until ``start()`` is called, and after ``stop()``, lines are written
+    inline. ``stream`` defaults to whatever ``sys.stdout`` is at write time.
+    """
+
+    def __init__(
+        self,
+        stream: Optional[BinaryIO] = None,
+        max_queue: int = 10000,
+        max_batch: int = 512,
+        flush_interval: float = 0.05,
+        dropped_counter: Optional[Counter] = None
+    ):
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._stream = stream
+        self._dropped_counter = dropped_counter
+        self._queue: Deque[Line] = deque()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def _drop(self, reason: str, count: int = 1) -> None:
+        self.dropped += count
+        if self._dropped_counter is not None:
+            self._dropped_counter.labels(reason=reason).inc(count)
+
+    def enqueue(self, line: Line) -> None:
+        if self._thread is None:
+            self._write([line])
+        elif len(self._queue) >= self.max_queue:
+            self._drop("queue_full")
+        else:
+            self._queue.append(line)
+
+    def _write(self, lines: List[Line]) -> None:
+        stream = self._stream
+        if stream is None:
+            stream = getattr(sys.stdout, "buffer", sys.stdout)
+        data = b"".join(
+            (line if isinstance(line, bytes) else line.encode()) + b"\n" for line in lines
+        )
+        try:
+            stream.write(data)
+            stream.flush()
+        except (OSError, ValueError):
+            # Closed or broken stream; there is nowhere left to report it
+            self._drop("write_error", len(lines))
+
+    def flush(self) -> None:
+        """Write out everything queued so far."""
+        queue = self._queue
+        while queue:
+            batch = []
+            try:
+                while len(batch) < self.max_batch:
+                    batch.append(queue.popleft())
+            except IndexError:
+                pass
+            self._write(batch)
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def start(self) -> None:
+        """Start the writer thread."""
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Write out queued lines and stop the writer thread."""
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+
+class QueueLogger:
+    """structlog logger handing rendered events to a ``QueueLogWriter``."""
+
+    def __init__(self, writer: QueueLogWriter, name: Optional[str] = None):
+        self.name = name
+        self._writer = writer
+
+    def msg(self, message: Line) -> None:
+        self._writer.enqueue(message)
+
+    log = debug = info = warn = warning = error = critical = exception = fatal = msg
+
+
+class QueueLoggerFactory:
+    """Creates ``QueueLogger``s named after the calling module, like the stdlib factory."""
+
+    def __init__(self, writer: QueueLogWriter):
+        self._writer = writer
+        self._names = structlog.stdlib.LoggerFactory(ignore_frame_names=[__name__])
+
+    def __call__(self, *args) -> QueueLogger:
+        return QueueLogger(self._writer, self._names(*args).name)
+
+
+class LevelSampler:
+    """structlog processor keeping only a share of events per level.
+
+    ``rates`` maps a level name to the fraction of its events to keep;
+    levels not listed are always kept. Put it first in the chain so that
+    dropped events cost nothing more.
+    """
+
+    def __init__(
+        self,
+        rates: Dict[str, float],
+        dropped_counter: Optional[Counter] = None,
+        random: Callable[[], float] = random.random
+    ):
+        self.rates = {level.lower(): rate for level, rate in rates.items()}
+        self._dropped = dropped_counter.labels(reason="sampled") if dropped_counter is not None else None
+        self._random = random
+
+    def __call__(self, logger, method_name: str, event_dict: dict) -> dict:
+        rate = self.rates.get(method_name)
+        if rate is not None and self._random() >= rate:
+            if self._dropped is not None:
+                self._dropped.inc()
+            raise structlog.DropEvent
+        return event_dict
+
+
+def configure_logging(
+    writer: QueueLogWriter,
+    level: str = "INFO",
+    log_format: str = "json",
+    sample_rates: Optional[Dict[str, float]] = None,
+    dropped_counter: Optional[Counter] = None
+) -> None:
+    """
+    Route structlog events through ``writer``.
+
+    Events below ``level`` are discarded by the bound logger before any
+    processing. ``log_format`` is "json" for one JSON object per line or
+    "console" for human-readable output.
+    """
+    processors = []
+    if sample_rates:
+        processors.append(LevelSampler(sample_rates, dropped_counter))
+    processors += [
+        structlog.stdlib.add_logger_name,
+        structlog.processors.add_log_level,
+        structlog.processors.TimeStamper(fmt="iso"),
+        structlog.processors.StackInfoRenderer(),
+        structlog.processors.format_exc_info,
+        structlog.processors.UnicodeDecoder(),
+    ]
+    if log_format == "console":
+        processors.append(structlog.dev.ConsoleRenderer(colors=False))
+    elif orjson is not None:
+        processors.append(structlog.processors.JSONRenderer(serializer=orjson.dumps))
+    else:
+        processors.append(structlog.processors.JSONRenderer())
+
+    structlog.configure(
+        processors=processors,
+        context_class=dict,
+        logger_factory=QueueLoggerFactory(writer),
+        wrapper_class=structlog.make_filtering_bound_logger(logging.getLevelName(level.upper())),
+        cache_logger_on_first_use=True,
+    )
@@ -0,0 +1,62 @@
+import asyncio
+from typing import Optional
+
+import structlog
+from prometheus_client import Gauge, Histogram
+
+logger = structlog.get_logger()
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop runs a task that asked to wake up.
+
+    Every ``interval`` seconds a background task sleeps and compares when it
+    woke up with when it asked to. The difference is time the loop spent on
+    other callbacks, i.e. how long any ready request waits for the CPU.
+
+    ``lag`` follows new samples up at once and halves every interval on the
+    way down, so one slow callback is not forgotten before the next check
+    while recovery is still seen within a second or so.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.1,
+        lag_gauge: Optional[Gauge] = None,
+        sample_histogram: Optional[Histogram] = None
+    ):
+        self.interval = interval
+        self.lag = 0.0
+        self._lag_gauge = lag_gauge
+        self._sample_histogram = sample_histogram
+        self._task: Optional[asyncio.Task] = None
+
+    def observe(self, sample: float) -> None:
+        self.lag = max(sample, self.lag / 2)
+        if self._lag_gauge is not None:
+            self._lag_gauge.set(self.lag)
+        if self._sample_histogram is not None:
+            self._sample_histogram.observe(sample)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.observe(max(0.0, loop.time() - started - self.interval))
+
+    def start(self) -> None:
+        """Start measuring on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+            logger.info("Event loop monitor started", interval=self.interval)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.lag = 0.0
@@ -5,39 +5,93 @@ from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 
 from .config import settings
-from .api import router
-from .middleware import LoggingMiddleware, RateLimitMiddleware, ErrorHandlingMiddleware
+from .api import job_manager, readiness_monitor, router
+from .cache import cached_registry_client, refresh_scheduler, registry_disk_cache
+from .external_api import external_api_client
+from .log_pipeline import QueueLogWriter, configure_logging
+from .loop_monitor import LoopLagMonitor
+from .metrics import EVENT_LOOP_LAG, EVENT_LOOP_LAG_SAMPLES, LOG_EVENTS_DROPPED, mark_process_dead
+from .middleware import (
+    AdmissionControlMiddleware,
+    BodySizeLimitMiddleware,
+    ErrorHandlingMiddleware,
+    LoggingMiddleware,
+    RateLimitMiddleware,
+)
+from .rate_limit import create_rate_limit_backend
+from .responses import default_response_class
+from .server import fragmented_state
+
+
+# Rate limit state, shared between workers unless the memory backend is used
+rate_limit_backend = create_rate_limit_backend(
+    settings.rate_limit_backend,
+    settings.rate_limit_algorithm,
+    settings.rate_limit_requests,
+    settings.rate_limit_window,
+    cleanup_interval=settings.rate_limit_cleanup_interval,
+    mmap_path=settings.rate_limit_mmap_path,
+    mmap_slots=settings.rate_limit_mmap_slots,
+    redis_url=settings.rate_limit_redis_url,
+    redis_prefix=settings.rate_limit_redis_prefix
+)
+
+loop_monitor = LoopLagMonitor(
+    interval=settings.loop_monitor_interval,
+    lag_gauge=EVENT_LOOP_LAG,
+    sample_histogram=EVENT_LOOP_LAG_SAMPLES
+)
+
+# Log lines are written to stdout from a background thread once the app starts
+log_writer = QueueLogWriter(
+    max_queue=settings.log_queue_size,
+    max_batch=settings.log_batch_size,
+    flush_interval=settings.log_flush_interval,
+    dropped_counter=LOG_EVENTS_DROPPED
+)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager."""
     # Startup
-    structlog.configure(
-        processors=[
-            structlog.stdlib.filter_by_level,
-            structlog.stdlib.add_logger_name,
-            structlog.stdlib.add_log_level,
-            structlog.stdlib.PositionalArgumentsFormatter(),
-            structlog.processors.TimeStamper(fmt="iso"),
-            structlog.processors.StackInfoRenderer(),
-            structlog.processors.format_exc_info,
-            structlog.processors.UnicodeDecoder(),
-            structlog.processors.JSONRenderer()
-        ],
-        context_class=dict,
-        logger_factory=structlog.stdlib.LoggerFactory(),
-        wrapper_class=structlog.stdlib.BoundLogger,
-        cache_logger_on_first_use=True,
+    log_writer.start()
+    configure_logging(
+        log_writer,
+        level=settings.log_level,
+        log_format=settings.log_format,
+        sample_rates=settings.log_sample_rates,
+        dropped_counter=LOG_EVENTS_DROPPED
     )
     
     logger = structlog.get_logger()
     logger.info("Application starting up")
+    for problem in fragmented_state(settings):
+        logger.warning("Worker state is not shared", workers=settings.web_concurrency, problem=problem)
+    loop_monitor.start()
+    await external_api_client.start()
+    if settings.readiness_probe_enabled:
+        readiness_monitor.start()
+    if refresh_scheduler is not None:
+        refresh_scheduler.start()
+    await job_manager.start()
     
     yield
     
     # Shutdown
     logger.info("Application shutting down")
+    await job_manager.stop()
+    await readiness_monitor.stop()
+    if refresh_scheduler is not None:
+        await refresh_scheduler.stop()
+    await cached_registry_client.close()
+    if registry_disk_cache is not None:
+        registry_disk_cache.close()
+    await external_api_client.close()
+    await rate_limit_backend.close()
+    await loop_monitor.stop()
+    mark_process_dead()
+    log_writer.stop()
 
 
 # Create FastAPI application
@@ -47,6 +101,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=default_response_class(),
     lifespan=lifespan
 )
 
@@ -60,12 +115,20 @@ app.add_middleware(
 )
 
 # Add custom middleware
-app.add_middleware(ErrorHandlingMiddleware)
 app.add_middleware(
-    RateLimitMiddleware,
-    max_requests=settings.rate_limit_requests,
-    window_seconds=settings.rate_limit_window
+    BodySizeLimitMiddleware,
+    limits={"/api/v1/medical-book/validate/batch": settings.batch_max_body_bytes}
 )
+app.add_middleware(ErrorHandlingMiddleware)
+app.add_middleware(RateLimitMiddleware, backend=rate_limit_backend)
+if settings.admission_control_enabled:
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        monitor=loop_monitor,
+        max_loop_lag=settings.admission_max_loop_lag,
+        max_in_flight=settings.admission_max_in_flight,
+        retry_after=settings.admission_retry_after
+    )
 app.add_middleware(LoggingMiddleware)
 
 # Include API router
@@ -0,0 +1,220 @@
+import os
+from typing import Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Latency buckets (seconds) covering cache hits up to a full registry timeout
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+# HTTP server
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route and status code",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being processed",
+    multiprocess_mode="livesum"
+)
+RATE_LIMIT_REJECTIONS = Counter(
+    "rate_limit_rejections_total",
+    "Requests rejected by the inbound rate limiter"
+)
+EVENT_LOOP_LAG = Gauge(
+    "event_loop_lag_seconds",
+    "Smoothed event loop scheduling delay",
+    multiprocess_mode="livemax"
+)
+EVENT_LOOP_LAG_SAMPLES = Histogram(
+    "event_loop_lag_sample_seconds",
+    "Measured event loop scheduling delays",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections_total",
+    "Requests rejected by admission control, by reason",
+    ["reason"]
+)
+LOG_EVENTS_DROPPED = Counter(
+    "log_events_dropped_total",
+    "Log events not written, by reason",
+    ["reason"]
+)
+
+# External registry
+REGISTRY_LATENCY = Histogram(
+    "registry_request_duration_seconds",
+    "External registry request latency by outcome",
+    ["outcome"],
+    buckets=LATENCY_BUCKETS
+)
+REGISTRY_IN_FLIGHT = Gauge(
+    "registry_requests_in_flight",
+    "External registry requests currently in flight",
+    multiprocess_mode="livesum"
+)
+REGISTRY_RETRIES = Counter(
+    "registry_retries_total",
+    "Registry request attempts repeated after a retryable failure",
+    ["reason"]
+)
+REGISTRY_HEDGES = Counter(
+    "registry_hedged_requests_total",
+    "Hedged registry attempts: launched, and won against the original",
+    ["result"]
+)
+REGISTRY_BREAKER_STATE = Gauge(
+    "registry_circuit_state",
+    "Registry circuit breaker state: 0 closed, 1 half-open, 2 open",
+    multiprocess_mode="livemax"
+)
+REGISTRY_BREAKER_TRANSITIONS = Counter(
+    "registry_circuit_transitions_total",
+    "Registry circuit breaker transitions by the state entered",
+    ["state"]
+)
+REGISTRY_BREAKER_REJECTIONS = Counter(
+    "registry_circuit_rejections_total",
+    "Registry calls failed fast because the circuit was open"
+)
+REGISTRY_PROBES = Counter(
+    "registry_probes_total",
+    "Background registry reachability checks by result",
+    ["result"]
+)
+READY = Gauge(
+    "service_ready",
+    "Whether the process reports ready on /readyz: 1 ready, 0 not ready",
+    multiprocess_mode="livemin"
+)
+REGISTRY_TIMEOUT = Gauge(
+    "registry_timeout_seconds",
+    "Current adaptive read timeout of registry requests",
+    multiprocess_mode="livemax"
+)
+
+# Outbound governor
+QUEUE_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REGISTRY_QUEUE_WAIT = Histogram(
+    "registry_queue_wait_seconds",
+    "Time registry requests waited for an outbound slot, by priority",
+    ["priority"],
+    buckets=QUEUE_WAIT_BUCKETS
+)
+REGISTRY_QUEUE_DEPTH = Gauge(
+    "registry_queue_depth",
+    "Registry requests waiting for an outbound slot",
+    multiprocess_mode="livesum"
+)
+REGISTRY_SHED = Counter(
+    "registry_requests_shed_total",
+    "Registry requests dropped after waiting too long for an outbound slot, by priority",
+    ["priority"]
+)
+
+# Registry cache and coalescing
+CACHE_LOOKUPS = Counter(
+    "registry_cache_lookups_total",
+    "Registry cache lookups by result",
+    ["result"]
+)
+CACHE_EVICTIONS = Counter(
+    "registry_cache_evictions_total",
+    "Registry cache entries evicted to stay within size limit"
+)
+DISK_CACHE_LOOKUPS = Counter(
+    "registry_disk_cache_lookups_total",
+    "Registry disk cache lookups by result",
+    ["result"]
+)
+CACHE_STALE_SERVED = Counter(
+    "registry_cache_stale_served_total",
+    "Expired registry records served stale, by reason",
+    ["reason"]
+)
+CACHE_ENTRIES = Gauge(
+    "registry_cache_entries",
+    "Entries in the registry cache",
+    multiprocess_mode="livesum"
+)
+REFRESH_QUEUE_DEPTH = Gauge(
+    "registry_refresh_queue_depth",
+    "Keys tracked by the background refresh scheduler",
+    multiprocess_mode="livesum"
+)
+REFRESH_LAG = Gauge(
+    "registry_refresh_lag_seconds",
+    "How late the last scheduled refresh started after it was due",
+    multiprocess_mode="livemax"
+)
+REFRESHES = Counter(
+    "registry_refreshes_total",
+    "Scheduled background refreshes by result",
+    ["result"]
+)
+COALESCED_CALLS = Counter(
+    "registry_coalesced_total",
+    "Registry lookups by whether they started a call or joined one in flight",
+    ["role"]
+)
+
+
+# Validation jobs
+JOB_QUEUE_DEPTH = Gauge(
+    "validation_jobs_queued",
+    "Validation jobs waiting for a worker",
+    multiprocess_mode="livesum"
+)
+JOB_ITEMS = Counter(
+    "validation_job_items_total",
+    "Validation job items processed, by result",
+    ["result"]
+)
+JOB_WEBHOOKS = Counter(
+    "validation_job_webhooks_total",
+    "Job completion webhooks by delivery result",
+    ["result"]
+)
+
+
+def multiprocess_enabled() -> bool:
+    """Whether metrics are shared between worker processes via files."""
+    return "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Render metrics in Prometheus text format.
+
+    In multiprocess mode (``PROMETHEUS_MULTIPROC_DIR`` set) metrics of all
+    worker processes are aggregated, otherwise only this process is reported.
+
+    Returns:
+        Tuple of exposition body and its content type
+    """
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    """Drop live gauges of this process from multiprocess aggregation."""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(os.getpid())
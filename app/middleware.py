@@ -1,137 +1,319 @@
 import time
+from typing import Collection, Mapping, Optional
+
 import structlog
-from fastapi import Request, Response
+from fastapi import HTTPException
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from collections import defaultdict
-import asyncio
-from typing import Dict, Tuple
-import time
+from starlette.datastructures import URL, Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from .config import settings
+from .loop_monitor import LoopLagMonitor
+from .metrics import ADMISSION_REJECTIONS, RATE_LIMIT_REJECTIONS, REQUEST_LATENCY, REQUESTS_IN_FLIGHT
+from .rate_limit import MemoryRateLimitBackend, RateLimitBackend
 
 logger = structlog.get_logger()
 
+# Health checks and metrics, polled by orchestrators and monitoring
+HEALTH_PATHS = ("/healthz", "/readyz", "/metrics")
 
-class RateLimiter:
-    """Simple in-memory rate limiter."""
-    
-    def __init__(self, max_requests: int, window_seconds: int):
-        self.max_requests = max_requests
-        self.window_seconds = window_seconds
-        self.requests: Dict[str, list] = defaultdict(list)
-    
-    def is_allowed(self, client_id: str) -> bool:
-        """Check if request is allowed for client."""
-        now = time.time()
-        client_requests = self.requests[client_id]
-        
-        # Remove old requests outside window
-        client_requests[:] = [req_time for req_time in client_requests 
-                            if now - req_time < self.window_seconds]
-        
-        if len(client_requests) >= self.max_requests:
-            return False
-        
-        client_requests.append(now)
-        return True
+# The middleware below is plain ASGI rather than BaseHTTPMiddleware: that one
+# runs every layer in a separate task and re-wraps the response stream, which
+# costs throughput and interferes with streaming responses.
+
+
+def client_host(scope: Scope) -> str:
+    """Client IP of the connection, "unknown" when the server does not report it."""
+    client = scope.get("client")
+    return client[0] if client else "unknown"
 
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    """Middleware for request/response logging."""
+def route_label(scope: Scope) -> str:
+    """Route template for metrics labels, keeping label cardinality bounded."""
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+class LoggingMiddleware:
+    """Middleware for request/response logging and request metrics."""
     
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Extract client IP
-        client_ip = request.client.host if request.client else "unknown"
+        start_time = time.time()
+        method = scope["method"]
+        url = str(URL(scope=scope))
+        client_ip = client_host(scope)
+        status_code = 500
         
         # Log request
         logger.info(
             "Request started",
-            method=request.method,
-            url=str(request.url),
+            method=method,
+            url=url,
             client_ip=client_ip,
-            user_agent=request.headers.get("user-agent", "unknown")
+            user_agent=Headers(scope=scope).get("user-agent", "unknown")
         )
         
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        REQUESTS_IN_FLIGHT.inc()
         try:
-            response = await call_next(request)
-            
-            # Log response
-            process_time = time.time() - start_time
-            logger.info(
-                "Request completed",
-                method=request.method,
-                url=str(request.url),
-                status_code=response.status_code,
-                process_time=process_time,
-                client_ip=client_ip
-            )
-            
-            return response
-            
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
             process_time = time.time() - start_time
             logger.error(
                 "Request failed",
-                method=request.method,
-                url=str(request.url),
+                method=method,
+                url=url,
                 error=str(e),
                 process_time=process_time,
                 client_ip=client_ip
             )
             raise
+        else:
+            # Log response
+            process_time = time.time() - start_time
+            logger.info(
+                "Request completed",
+                method=method,
+                url=url,
+                status_code=status_code,
+                process_time=process_time,
+                client_ip=client_ip
+            )
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            REQUEST_LATENCY.labels(
+                method=method,
+                route=route_label(scope),
+                status=str(status_code)
+            ).observe(time.time() - start_time)
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Middleware for rate limiting."""
+class AdmissionControlMiddleware:
+    """Middleware rejecting new requests with 503 while the process is overloaded.
+    
+    A request is turned away when the event loop lag reported by
+    ``monitor`` is above ``max_loop_lag`` seconds, or when ``max_in_flight``
+    requests are already being processed (0 for no limit). Requests to
+    ``exempt_paths`` are always let through so that health checks and
+    metrics keep working under load.
+    """
+    
+    def __init__(
+        self,
+        app: ASGIApp,
+        monitor: LoopLagMonitor,
+        max_loop_lag: float = 0.5,
+        max_in_flight: int = 0,
+        retry_after: int = 1,
+        exempt_paths: Collection[str] = HEALTH_PATHS
+    ):
+        self.app = app
+        self.monitor = monitor
+        self.max_loop_lag = max_loop_lag
+        self.max_in_flight = max_in_flight
+        self.retry_after = retry_after
+        self.exempt_paths = frozenset(exempt_paths)
+        self.in_flight = 0
     
-    def __init__(self, app, max_requests: int, window_seconds: int):
-        super().__init__(app)
-        self.rate_limiter = RateLimiter(max_requests, window_seconds)
+    def rejection_reason(self) -> Optional[str]:
+        if self.monitor.lag > self.max_loop_lag:
+            return "loop_lag"
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return "in_flight"
+        return None
     
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+        
+        reason = self.rejection_reason()
+        if reason is not None:
+            ADMISSION_REJECTIONS.labels(reason=reason).inc()
+            logger.warning(
+                "Request rejected by admission control",
+                reason=reason,
+                loop_lag=self.monitor.lag,
+                in_flight=self.in_flight
+            )
+            response = JSONResponse(
+                status_code=503,
+                content={
+                    "error": "Service overloaded",
+                    "detail": "Server is overloaded, retry later"
+                },
+                headers={"Retry-After": str(self.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+        
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+
+class RateLimitMiddleware:
+    """Middleware for rate limiting.
+    
+    Uses the given backend, or process-local state built from
+    ``max_requests``/``window_seconds``/``algorithm`` when none is given.
+    Requests to ``exempt_paths`` are neither counted nor limited, so that
+    frequent probes from one orchestrator address are never turned away.
+    """
+    
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_requests: int = 100,
+        window_seconds: int = 3600,
+        algorithm: str = "sliding_window",
+        cleanup_interval: float = 60.0,
+        backend: Optional[RateLimitBackend] = None,
+        exempt_paths: Collection[str] = HEALTH_PATHS
+    ):
+        self.app = app
+        self.exempt_paths = frozenset(exempt_paths)
+        self.rate_limiter = backend or MemoryRateLimitBackend(
+            algorithm,
+            max_requests,
+            window_seconds,
+            cleanup_interval=cleanup_interval
+        )
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+        
         # Extract client identifier (IP for now, could be user ID in auth context)
-        client_id = request.client.host if request.client else "unknown"
+        client_id = client_host(scope)
+        
+        decision = await self.rate_limiter.hit(client_id)
+        headers = decision.headers(self.rate_limiter.window_seconds)
         
-        if not self.rate_limiter.is_allowed(client_id):
+        if not decision.allowed:
+            RATE_LIMIT_REJECTIONS.inc()
             logger.warning(
                 "Rate limit exceeded",
                 client_id=client_id,
                 max_requests=self.rate_limiter.max_requests,
                 window_seconds=self.rate_limiter.window_seconds
             )
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=429,
                 content={
                     "error": "Rate limit exceeded",
                     "detail": f"Too many requests. Limit: {self.rate_limiter.max_requests} per {self.rate_limiter.window_seconds} seconds"
-                }
+                },
+                headers=headers
             )
+            await response(scope, receive, send)
+            return
+        
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).update(headers)
+            await send(message)
         
-        return await call_next(request)
+        await self.app(scope, receive, send_wrapper)
 
 
-class ErrorHandlingMiddleware(BaseHTTPMiddleware):
+class BodySizeLimitMiddleware:
+    """Middleware rejecting request bodies over a per-path size with 413.
+    
+    ``limits`` maps request paths to their largest allowed body in bytes
+    (0 for no limit). A larger ``Content-Length`` is refused before the
+    body is read; a body without one is counted as it arrives and reading
+    stops as soon as it goes over the limit.
+    """
+    
+    def __init__(self, app: ASGIApp, limits: Mapping[str, int]):
+        self.app = app
+        self.limits = dict(limits)
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if not limit:
+            await self.app(scope, receive, send)
+            return
+        
+        detail = f"Request body too large. Limit: {limit} bytes"
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse(
+                status_code=413,
+                content={"error": "Request body too large", "detail": detail}
+            )
+            await response(scope, receive, send)
+            return
+        
+        received = 0
+        
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Re-raised by FastAPI while it reads the body
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
+
+class ErrorHandlingMiddleware:
     """Middleware for global error handling."""
     
-    async def dispatch(self, request: Request, call_next):
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        response_started = False
+        
+        async def send_wrapper(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+        
         try:
-            return await call_next(request)
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
             logger.error(
                 "Unhandled exception",
                 error=str(e),
-                method=request.method,
-                url=str(request.url),
-                client_ip=request.client.host if request.client else "unknown"
+                method=scope["method"],
+                url=str(URL(scope=scope)),
+                client_ip=client_host(scope)
             )
             
-            return JSONResponse(
+            # Too late for an error response once the headers are sent
+            if response_started:
+                raise
+            
+            response = JSONResponse(
                 status_code=500,
                 content={
                     "error": "Internal server error",
                     "detail": "An unexpected error occurred"
                 }
-            )
\ No newline at end of file
+            )
+            await response(scope, receive, send)
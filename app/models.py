@@ -1,28 +1,73 @@
-from pydantic import BaseModel, Field, field_validator
-from typing import List, Optional
+from pydantic import AfterValidator, BaseModel, Field, HttpUrl
+from typing import Annotated, List, Optional
 from datetime import datetime, timezone
-import re
+from operator import mul
+
+from .config import settings
+
+# Separators allowed in formatted input: "176-489-221 16", "86-01-027970-25"
+_SEPARATORS = str.maketrans("", "", "- ")
+
+# SNILS numbers up to 001-001-998 were issued before the check digits were introduced
+SNILS_CHECKSUM_FROM = "001001998"
+_SNILS_WEIGHTS = (9, 8, 7, 6, 5, 4, 3, 2, 1)
+# Weighted sum of the ASCII codes of "0" (48), subtracted to get digit values
+_SNILS_ZERO_SUM = ord("0") * sum(_SNILS_WEIGHTS)
+
+
+def normalize_digits(value: str, length: int) -> Optional[str]:
+    """Digits of value with separators removed, None unless exactly ``length`` ASCII digits."""
+    if len(value) != length or not (value.isascii() and value.isdigit()):
+        value = value.translate(_SEPARATORS)
+        if len(value) != length or not (value.isascii() and value.isdigit()):
+            return None
+    return value
+
+
+def snils_check_digits(number: str) -> int:
+    """Check digits of the 9-digit SNILS number: weighted sum mod 101, with 100 as 0."""
+    total = sum(map(mul, number.encode(), _SNILS_WEIGHTS)) - _SNILS_ZERO_SUM
+    return total % 101 % 100
+
+
+def validate_elmk_number(value: str) -> str:
+    digits = normalize_digits(value, 12)
+    if digits is None:
+        raise ValueError('ELMK number must be exactly 12 digits')
+    # RR-OO-NNNNNN-YY: region, office, serial, year
+    if digits[:2] == "00":
+        raise ValueError('ELMK number has an invalid region code')
+    if digits[4:10] == "000000":
+        raise ValueError('ELMK number has an invalid serial number')
+    return digits
+
+
+def validate_snils(value: str) -> str:
+    digits = normalize_digits(value, 11)
+    if digits is None:
+        raise ValueError('SNILS must be exactly 11 digits')
+    number = digits[:9]
+    if number > SNILS_CHECKSUM_FROM and snils_check_digits(number) != int(digits[9:]):
+        raise ValueError('SNILS check digits do not match')
+    return digits
+
+
+# Plain after-validators are called by pydantic-core directly, which is
+# cheaper than classmethod field validators on this hot path
+ElmkNumber = Annotated[str, AfterValidator(validate_elmk_number)]
+Snils = Annotated[str, AfterValidator(validate_snils)]
 
 
 class MedicalBookRequest(BaseModel):
-    """Request model for medical book validation."""
-    
-    elmk_number: str = Field(..., description="Уникальный идентификатор электронной личной медицинской книжки")
-    snils: str = Field(..., description="Номер СНИЛС")
+    """Request model for medical book validation.
     
-    @field_validator('elmk_number')
-    @classmethod
-    def validate_elmk_number(cls, v):
-        if not re.match(r'^\d{12}$', v):
-            raise ValueError('ELMK number must be exactly 12 digits')
-        return v
+    Both numbers may be given with dashes and spaces and are stored as bare
+    digits. Numbers that cannot exist (bad SNILS check digits, zero ELMK
+    region or serial) are rejected here, without a registry lookup.
+    """
     
-    @field_validator('snils')
-    @classmethod
-    def validate_snils(cls, v):
-        if not re.match(r'^\d{11}$', v):
-            raise ValueError('SNILS must be exactly 11 digits')
-        return v
+    elmk_number: ElmkNumber = Field(..., description="Уникальный идентификатор электронной личной медицинской книжки")
+    snils: Snils = Field(..., description="Номер СНИЛС")
 
 
 class ExternalAPIResponse(BaseModel):
@@ -43,6 +88,67 @@ class ExternalAPIResponse(BaseModel):
     created_fullname: str
 
 
+class MedicalBookBatchRequest(BaseModel):
+    """Request model for batch medical book validation.
+    
+    The item limit is checked while the list is validated, so an oversized
+    batch is rejected without validating all of its items.
+    """
+    
+    items: List[MedicalBookRequest] = Field(
+        ...,
+        min_length=1,
+        max_length=settings.batch_max_items,
+        description="Список проверяемых медицинских книжек"
+    )
+
+
+class BatchItemResult(BaseModel):
+    """Validation outcome for a single batch item."""
+    
+    index: int = 0
+    elmk_number: Optional[str] = None
+    snils: Optional[str] = None
+    status_code: int
+    result: Optional[ExternalAPIResponse] = None
+    error: Optional[str] = None
+    cache: Optional[str] = None
+
+
+class MedicalBookBatchResponse(BaseModel):
+    """Response model for batch medical book validation."""
+    
+    total: int
+    unique: int
+    succeeded: int
+    failed: int
+    results: List[BatchItemResult]
+
+
+class JobCreateRequest(BaseModel):
+    """Request model for an asynchronous validation job."""
+    
+    items: List[MedicalBookRequest] = Field(..., min_length=1, description="Список проверяемых медицинских книжек")
+    webhook_url: Optional[HttpUrl] = Field(None, description="URL для уведомления о завершении задания")
+
+
+class JobResponse(BaseModel):
+    """Progress of a validation job with a page of its results."""
+    
+    job_id: str
+    status: str
+    total: int
+    completed: int
+    succeeded: int
+    failed: int
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    webhook_status: Optional[str] = None
+    offset: int = 0
+    next_offset: Optional[int] = None
+    results: List[BatchItemResult] = []
+
+
 class ErrorResponse(BaseModel):
     """Error response model."""
     
@@ -56,4 +162,19 @@ class HealthResponse(BaseModel):
     
     status: str
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-    version: str = "1.0.0"
\ No newline at end of file
+    version: str = "1.0.0"
+
+
+class ReadinessResponse(BaseModel):
+    """Readiness check response model."""
+    
+    status: str
+    # Why the process is not ready; empty when it is
+    reasons: List[str] = Field(default_factory=list)
+    registry_reachable: Optional[bool] = None
+    registry_error: Optional[str] = None
+    registry_checked_ago: Optional[float] = Field(None, description="Сколько секунд назад проверялась доступность реестра")
+    circuit_state: Optional[str] = None
+    registry_in_flight: Optional[int] = None
+    registry_queued: Optional[int] = None
+    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
\ No newline at end of file
@@ -0,0 +1,535 @@
+import asyncio
+import errno
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+import structlog
+
+logger = structlog.get_logger()
+
+State = Tuple[float, ...]
+
+
+@dataclass
+class RateLimitDecision:
+    """Outcome of a rate limit check for one request."""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float
+    retry_after: float = 0.0
+
+    def headers(self, window_seconds: int) -> Dict[str, str]:
+        """Standard ``RateLimit-*`` headers, plus ``Retry-After`` when denied."""
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(math.ceil(self.reset_after)),
+            "RateLimit-Policy": f"{self.limit};w={window_seconds}"
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class TokenBucket:
+    """Token bucket holding ``max_requests`` tokens, refilled evenly over the window.
+
+    State per client is ``(tokens, updated_at)``.
+    """
+
+    name = "token_bucket"
+
+    def __init__(self, max_requests: int, window_seconds: int):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.rate = max_requests / window_seconds
+
+    def step(self, state: Optional[State], now: float) -> Tuple[State, RateLimitDecision]:
+        """Record a request at ``now``; return the new state and the decision."""
+        capacity = self.max_requests
+        if state is None:
+            tokens = float(capacity)
+        else:
+            tokens = min(capacity, state[0] + (now - state[1]) * self.rate)
+
+        allowed = tokens >= 1.0
+        if allowed:
+            tokens -= 1.0
+
+        return (tokens, now), RateLimitDecision(
+            allowed=allowed,
+            limit=capacity,
+            remaining=int(tokens),
+            reset_after=(capacity - tokens) / self.rate,
+            retry_after=0.0 if allowed else (1.0 - tokens) / self.rate
+        )
+
+    def is_idle(self, state: State, now: float) -> bool:
+        """Whether state is indistinguishable from a new client (bucket full)."""
+        return state[0] + (now - state[1]) * self.rate >= self.max_requests
+
+    def last_seen(self, state: State) -> float:
+        return state[1]
+
+
+class SlidingWindowCounter:
+    """Sliding window approximated from the current and previous fixed windows.
+
+    The previous window's count is weighted by how much of it still overlaps
+    the sliding window. State per client is
+    ``(window_index, current_count, previous_count)``.
+    """
+
+    name = "sliding_window"
+
+    def __init__(self, max_requests: int, window_seconds: int):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+
+    def step(self, state: Optional[State], now: float) -> Tuple[State, RateLimitDecision]:
+        """Record a request at ``now``; return the new state and the decision."""
+        limit = self.max_requests
+        window = self.window_seconds
+        index = int(now // window)
+        elapsed = now - index * window
+
+        if state is None or state[0] < index - 1:
+            current, previous = 0, 0
+        elif state[0] == index - 1:
+            current, previous = 0, int(state[1])
+        else:
+            current, previous = int(state[1]), int(state[2])
+
+        estimated = previous * (1.0 - elapsed / window) + current
+        allowed = estimated + 1 <= limit
+        if allowed:
+            current += 1
+            estimated += 1
+
+        return (index, current, previous), RateLimitDecision(
+            allowed=allowed,
+            limit=limit,
+            remaining=max(0, int(limit - estimated)),
+            reset_after=window - elapsed,
+            retry_after=0.0 if allowed else self._retry_after(current, previous, elapsed)
+        )
+
+    def _retry_after(self, current: int, previous: int, elapsed: float) -> float:
+        """Seconds until the estimated count drops enough to admit one request."""
+        window = self.window_seconds
+        budget = self.max_requests - 1
+        if current > budget and current:
+            # Wait for the next window, where the current count becomes the
+            # weighted previous count.
+            return (window - elapsed) + window * (1.0 - max(budget, 0) / current)
+        if not previous:
+            return window - elapsed
+        return window * (1.0 - (budget - current) / previous) - elapsed
+
+    def is_idle(self, state: State, now: float) -> bool:
+        """Whether state is indistinguishable from a new client (no recent windows)."""
+        return state[0] < int(now // self.window_seconds) - 1
+
+    def last_seen(self, state: State) -> float:
+        return state[0] * self.window_seconds
+
+
+RATE_LIMIT_ALGORITHMS = {
+    TokenBucket.name: TokenBucket,
+    SlidingWindowCounter.name: SlidingWindowCounter,
+}
+
+
+def create_algorithm(algorithm: str, max_requests: int, window_seconds: int):
+    """Create a rate limiting algorithm by name."""
+    try:
+        algorithm_class = RATE_LIMIT_ALGORITHMS[algorithm]
+    except KeyError:
+        raise ValueError(
+            f"Unknown rate limit algorithm: {algorithm}. "
+            f"Expected one of: {', '.join(RATE_LIMIT_ALGORITHMS)}"
+        )
+    return algorithm_class(max_requests, window_seconds)
+
+
+class RateLimiter:
+    """In-process per-client rate limiter.
+
+    Keeps a small fixed-size state per client, so a check is O(1)
+    regardless of the limit. Clients that have been idle long enough for
+    their state to be indistinguishable from a new client are evicted every
+    ``cleanup_interval`` seconds.
+    """
+
+    algorithm_class = SlidingWindowCounter
+
+    def __init__(
+        self,
+        max_requests: int,
+        window_seconds: int,
+        cleanup_interval: float = 60.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.algorithm = self.algorithm_class(max_requests, window_seconds)
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.cleanup_interval = cleanup_interval
+        self.state: Dict[str, State] = {}
+        self._clock = clock
+        self._next_cleanup = clock() + cleanup_interval
+
+    def __len__(self) -> int:
+        return len(self.state)
+
+    def hit(self, client_id: str) -> RateLimitDecision:
+        """Record a request for client and decide whether it is allowed."""
+        now = self._clock()
+        if now >= self._next_cleanup:
+            self.evict_idle(now)
+        self.state[client_id], decision = self.algorithm.step(self.state.get(client_id), now)
+        return decision
+
+    def is_allowed(self, client_id: str) -> bool:
+        """Check if request is allowed for client."""
+        return self.hit(client_id).allowed
+
+    def evict_idle(self, now: float) -> int:
+        """Drop state of idle clients. Returns number of evicted clients."""
+        idle = [key for key, value in self.state.items() if self.algorithm.is_idle(value, now)]
+        for key in idle:
+            del self.state[key]
+        self._next_cleanup = now + self.cleanup_interval
+        return len(idle)
+
+
+class TokenBucketRateLimiter(RateLimiter):
+    """In-process token bucket rate limiter."""
+
+    algorithm_class = TokenBucket
+
+
+class SlidingWindowCounterRateLimiter(RateLimiter):
+    """In-process sliding window counter rate limiter."""
+
+    algorithm_class = SlidingWindowCounter
+
+
+def create_rate_limiter(
+    algorithm: str, max_requests: int, window_seconds: int, **kwargs
+) -> RateLimiter:
+    """Create an in-process rate limiter by algorithm name."""
+    limiter_classes = {
+        TokenBucket.name: TokenBucketRateLimiter,
+        SlidingWindowCounter.name: SlidingWindowCounterRateLimiter,
+    }
+    if algorithm not in limiter_classes:
+        create_algorithm(algorithm, max_requests, window_seconds)
+    return limiter_classes[algorithm](max_requests, window_seconds, **kwargs)
+
+
+class RateLimitBackend(ABC):
+    """Storage backend for rate limit state, possibly shared between processes."""
+
+    def __init__(self, algorithm: str, max_requests: int, window_seconds: int):
+        self.algorithm = create_algorithm(algorithm, max_requests, window_seconds)
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+
+    @abstractmethod
+    async def hit(self, client_id: str) -> RateLimitDecision:
+        """Record a request for client and decide whether it is allowed."""
+
+    async def close(self) -> None:
+        """Release backend resources."""
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Process-local state. Each worker process enforces its own limit."""
+
+    def __init__(self, algorithm: str, max_requests: int, window_seconds: int, cleanup_interval: float = 60.0):
+        super().__init__(algorithm, max_requests, window_seconds)
+        self.limiter = create_rate_limiter(
+            algorithm, max_requests, window_seconds, cleanup_interval=cleanup_interval
+        )
+
+    async def hit(self, client_id: str) -> RateLimitDecision:
+        return self.limiter.hit(client_id)
+
+
+class MmapRateLimitBackend(RateLimitBackend):
+    """State in a memory-mapped file shared by worker processes on one host.
+
+    The file is a fixed-size open-addressing hash table. A client key maps
+    to a group of ``PROBE`` adjacent slots; each slot holds a 64-bit key
+    hash and up to three floats of algorithm state. The group is locked
+    with a byte-range ``lockf`` for the read-modify-write, so workers only
+    contend when they hit the same group. When all slots of a group are in
+    use by other clients, the least recently seen one is reused, which can
+    only make the limit more permissive for that client.
+
+    A group lock is held only to read and rewrite that group's
+    ``PROBE`` slots (256 bytes) of the mapping, a few microseconds with no
+    system calls in between; in the worst case a page fault on the mapping
+    adds a read of one page from the file. ``hit()`` never blocks the event
+    loop on the lock: while another worker holds the group it retries after
+    ``LOCK_RETRY_DELAY`` seconds, doubling up to ``LOCK_RETRY_MAX_DELAY``.
+
+    Put the file on tmpfs (e.g. ``/dev/shm``) to keep it off disk.
+    """
+
+    MAGIC = b"ELMKRL01"
+    HEADER = struct.Struct("<8sQ16s")
+    SLOT = struct.Struct("<Qddd")
+    PROBE = 8
+    LOCK_RETRY_DELAY = 0.0005
+    LOCK_RETRY_MAX_DELAY = 0.01
+
+    def __init__(self, algorithm: str, max_requests: int, window_seconds: int, path: str, slots: int = 65536):
+        super().__init__(algorithm, max_requests, window_seconds)
+        self.path = path
+        self.groups = max(1, slots // self.PROBE)
+        self._group_size = self.PROBE * self.SLOT.size
+        self._size = self.HEADER.size + self.groups * self._group_size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._initialize()
+        self._map = mmap.mmap(self._fd, self._size)
+
+    def _initialize(self) -> None:
+        """Create or reset the table unless it already has the expected layout."""
+        header = self.HEADER.pack(self.MAGIC, self.groups, self.algorithm.name.encode()[:16])
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size == self._size and os.pread(self._fd, len(header), 0) == header:
+                return
+            os.ftruncate(self._fd, 0)
+            os.ftruncate(self._fd, self._size)
+            os.pwrite(self._fd, header, 0)
+            logger.info("Rate limit table initialized", path=self.path, groups=self.groups)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def key_hash(client_id: str) -> int:
+        """Stable 64-bit hash of a client key (never 0, which marks a free slot)."""
+        digest = hashlib.blake2b(client_id.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little") or 1
+
+    async def hit(self, client_id: str) -> RateLimitDecision:
+        delay = self.LOCK_RETRY_DELAY
+        while True:
+            decision = self.hit_at(client_id, time.time(), blocking=False)
+            if decision is not None:
+                return decision
+            await asyncio.sleep(delay)
+            delay = min(2 * delay, self.LOCK_RETRY_MAX_DELAY)
+
+    def hit_at(self, client_id: str, now: float, blocking: bool = True) -> Optional[RateLimitDecision]:
+        """Record a request at ``now`` (wall clock shared by all processes).
+
+        With ``blocking=False`` returns None instead of waiting when another
+        process holds the group lock.
+        """
+        tag = self.key_hash(client_id)
+        group_offset = self.HEADER.size + (tag % self.groups) * self._group_size
+
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.lockf(self._fd, flags, self._group_size, group_offset)
+        except OSError as e:
+            if blocking or e.errno not in (errno.EACCES, errno.EAGAIN):
+                raise
+            return None
+        try:
+            slot_offset, state = self._find_slot(tag, group_offset, now)
+            new_state, decision = self.algorithm.step(state, now)
+            padded = tuple(new_state) + (0.0,) * (3 - len(new_state))
+            self.SLOT.pack_into(self._map, slot_offset, tag, *padded)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, self._group_size, group_offset)
+        return decision
+
+    def _find_slot(self, tag: int, group_offset: int, now: float) -> Tuple[int, Optional[State]]:
+        """Slot for tag in its group: its own, a free or idle one, or the stalest."""
+        reusable = None
+        stalest, stalest_seen = group_offset, math.inf
+        for i in range(self.PROBE):
+            offset = group_offset + i * self.SLOT.size
+            slot_tag, *state = self.SLOT.unpack_from(self._map, offset)
+            if slot_tag == tag:
+                return offset, tuple(state)
+            if reusable is None:
+                if slot_tag == 0 or self.algorithm.is_idle(tuple(state), now):
+                    reusable = offset
+                else:
+                    seen = self.algorithm.last_seen(tuple(state))
+                    if seen < stalest_seen:
+                        stalest, stalest_seen = offset, seen
+        return (reusable if reusable is not None else stalest), None
+
+    async def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+
+_REDIS_TOKEN_BUCKET = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local capacity = tonumber(ARGV[1])
+local window_ms = tonumber(ARGV[2])
+local rate = capacity / window_ms
+
+local state = redis.call('HMGET', KEYS[1], 't', 'u')
+local tokens = tonumber(state[1])
+if tokens == nil then
+    tokens = capacity
+else
+    tokens = math.min(capacity, tokens + (now - tonumber(state[2])) * rate)
+end
+
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 'u', now)
+redis.call('PEXPIRE', KEYS[1], window_ms)
+
+local retry_ms = 0
+if allowed == 0 then
+    retry_ms = math.ceil((1 - tokens) / rate)
+end
+return {allowed, math.floor(tokens), math.ceil((capacity - tokens) / rate), retry_ms}
+"""
+
+_REDIS_SLIDING_WINDOW = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local limit = tonumber(ARGV[1])
+local window_ms = tonumber(ARGV[2])
+local index = math.floor(now / window_ms)
+local elapsed = now - index * window_ms
+
+local state = redis.call('HMGET', KEYS[1], 'i', 'c', 'p')
+local stored = tonumber(state[1])
+local current, previous = 0, 0
+if stored == index - 1 then
+    previous = tonumber(state[2])
+elseif stored == index then
+    current, previous = tonumber(state[2]), tonumber(state[3])
+end
+
+local estimated = previous * (1 - elapsed / window_ms) + current
+local allowed = 0
+if estimated + 1 <= limit then
+    current = current + 1
+    estimated = estimated + 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'i', index, 'c', current, 'p', previous)
+redis.call('PEXPIRE', KEYS[1], 2 * window_ms)
+
+local retry_ms = 0
+if allowed == 0 then
+    local budget = limit - 1
+    if current > budget and current > 0 then
+        retry_ms = (window_ms - elapsed) + window_ms * (1 - math.max(budget, 0) / current)
+    elseif previous > 0 then
+        retry_ms = window_ms * (1 - (budget - current) / previous) - elapsed
+    else
+        retry_ms = window_ms - elapsed
+    end
+end
+return {allowed, math.max(0, math.floor(limit - estimated)), window_ms - elapsed, math.ceil(retry_ms)}
+"""
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """State in Redis, shared by all replicas.
+
+    Each check is a single ``EVALSHA`` of a server-side script that reads,
+    updates and expires the client's state atomically, using the Redis
+    server clock. Idle keys expire on their own. If Redis is unreachable
+    requests are allowed, so an outage of the limiter does not take the
+    service down.
+    """
+
+    SCRIPTS = {
+        TokenBucket.name: _REDIS_TOKEN_BUCKET,
+        SlidingWindowCounter.name: _REDIS_SLIDING_WINDOW,
+    }
+
+    def __init__(
+        self,
+        algorithm: str,
+        max_requests: int,
+        window_seconds: int,
+        url: str = "redis://localhost:6379/0",
+        prefix: str = "elmk:rl:",
+        client=None
+    ):
+        super().__init__(algorithm, max_requests, window_seconds)
+        if client is None:
+            import redis.asyncio
+
+            client = redis.asyncio.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(self.SCRIPTS[self.algorithm.name])
+
+    async def hit(self, client_id: str) -> RateLimitDecision:
+        try:
+            allowed, remaining, reset_ms, retry_ms = await self._script(
+                keys=[self.prefix + client_id],
+                args=[self.max_requests, self.window_seconds * 1000]
+            )
+        except Exception as e:
+            logger.error("Rate limit backend unavailable", error=str(e), client_id=client_id)
+            return RateLimitDecision(
+                allowed=True,
+                limit=self.max_requests,
+                remaining=self.max_requests,
+                reset_after=0.0
+            )
+        return RateLimitDecision(
+            allowed=bool(allowed),
+            limit=self.max_requests,
+            remaining=int(remaining),
+            reset_after=int(reset_ms) / 1000,
+            retry_after=int(retry_ms) / 1000
+        )
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+def create_rate_limit_backend(
+    backend: str,
+    algorithm: str,
+    max_requests: int,
+    window_seconds: int,
+    cleanup_interval: float = 60.0,
+    mmap_path: str = "/dev/shm/elmk_rate_limit",
+    mmap_slots: int = 65536,
+    redis_url: str = "redis://localhost:6379/0",
+    redis_prefix: str = "elmk:rl:"
+) -> RateLimitBackend:
+    """Create a rate limit backend by name (``memory``, ``mmap`` or ``redis``)."""
+    if backend == "memory":
+        return MemoryRateLimitBackend(algorithm, max_requests, window_seconds, cleanup_interval)
+    if backend == "mmap":
+        return MmapRateLimitBackend(algorithm, max_requests, window_seconds, mmap_path, mmap_slots)
+    if backend == "redis":
+        return RedisRateLimitBackend(algorithm, max_requests, window_seconds, redis_url, redis_prefix)
+    raise ValueError(
+        f"Unknown rate limit backend: {backend}. Expected one of: memory, mmap, redis"
+    )
@@ -0,0 +1,184 @@
+import asyncio
+import time
+from typing import Callable, List, Optional
+
+import httpx
+import structlog
+from prometheus_client import Counter, Gauge
+
+from .external_api import ExternalAPIClient
+from .models import ReadinessResponse
+from .resilience import OPEN
+
+logger = structlog.get_logger()
+
+READY = "ready"
+NOT_READY = "not_ready"
+
+# Reasons reported while not ready
+WARMING_UP = "warming_up"
+REGISTRY_UNREACHABLE = "registry_unreachable"
+CIRCUIT_OPEN = "circuit_open"
+POOL_SATURATED = "pool_saturated"
+
+
+class ReadinessMonitor:
+    """Decides whether this process should receive traffic.
+
+    The process is ready when the registry answered recently, the registry
+    circuit breaker is not open and no more than ``max_queued`` registry
+    requests wait for an outbound slot (``max_queued=0`` ignores the queue).
+
+    Registry reachability is checked by a background task every ``interval``
+    seconds with a ``HEAD`` request over the registry client's pool; any
+    answer below 500 counts. ``report()`` only reads the last result, so
+    ``/readyz`` can be polled as often as the orchestrator likes. A check is
+    skipped when a real registry call succeeded within the last interval,
+    so under traffic probing adds no upstream load.
+
+    The task first opens up to ``warmup_connections`` pooled connections
+    with concurrent probes (over HTTP/2 they share one), so the first
+    requests do not pay for TLS handshakes, and reports ``warming_up``
+    until that is done. Without the task (``start()`` not called) the
+    registry is not checked at all.
+    """
+
+    def __init__(
+        self,
+        client: ExternalAPIClient,
+        interval: float = 10.0,
+        timeout: float = 2.0,
+        warmup_connections: int = 4,
+        max_queued: int = 100,
+        clock: Callable[[], float] = time.monotonic,
+        probe_counter: Optional[Counter] = None,
+        ready_gauge: Optional[Gauge] = None
+    ):
+        self.client = client
+        self.interval = interval
+        self.timeout = timeout
+        self.warmup_connections = warmup_connections
+        self.max_queued = max_queued
+        self._clock = clock
+        self._probe_counter = probe_counter
+        self._ready_gauge = ready_gauge
+        self._task: Optional[asyncio.Task] = None
+        # None until the first check has finished
+        self.reachable: Optional[bool] = None
+        self.error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+
+    def _count(self, result: str) -> None:
+        if self._probe_counter is not None:
+            self._probe_counter.labels(result=result).inc()
+
+    def _record(self, reachable: bool, error: Optional[str] = None) -> None:
+        if reachable != self.reachable:
+            if reachable:
+                logger.info("Registry reachable", url=self.client.base_url)
+            else:
+                logger.warning("Registry unreachable", url=self.client.base_url, error=error)
+        self.reachable = reachable
+        self.error = error
+        self.checked_at = self._clock()
+
+    async def _head(self) -> Optional[str]:
+        """One probe request; the error, None when the registry answered."""
+        try:
+            response = await self.client.client.head(self.client.base_url, timeout=self.timeout)
+        except httpx.HTTPError as e:
+            return str(e) or type(e).__name__
+        if response.status_code >= 500:
+            return f"HTTP {response.status_code}"
+        return None
+
+    async def warmup(self) -> None:
+        """Open pooled registry connections ahead of the first requests."""
+        count = max(1, self.warmup_connections)
+        started = self._clock()
+        errors = await asyncio.gather(*(self._head() for _ in range(count)))
+        failures = [error for error in errors if error is not None]
+        self._count("failed" if len(failures) == count else "ok")
+        self._record(len(failures) < count, failures[0] if len(failures) == count else None)
+        logger.info(
+            "Registry connections warmed up",
+            answered=count - len(failures),
+            elapsed=round(self._clock() - started, 3)
+        )
+
+    async def probe(self) -> None:
+        """Check the registry unless a real call succeeded within the last interval."""
+        last_success = self.client.last_success
+        if last_success is not None and self._clock() - last_success < self.interval:
+            self._count("skipped")
+            self._record(True)
+            return
+        error = await self._head()
+        self._count("ok" if error is None else "failed")
+        self._record(error is None, error)
+
+    async def _run(self) -> None:
+        check = self.warmup
+        while True:
+            try:
+                await check()
+            except Exception as e:
+                # Counts as a failed check, so the process neither stays in
+                # warmup nor keeps reporting the last good result
+                error = str(e) or type(e).__name__
+                logger.error("Registry readiness check failed", error=error)
+                self._record(False, error)
+            try:
+                self.report()
+            except Exception as e:
+                logger.error("Readiness report failed", error=str(e))
+            check = self.probe
+            await asyncio.sleep(self.interval)
+
+    def report(self) -> ReadinessResponse:
+        """Readiness from the last check and the current breaker and queue state."""
+        reasons: List[str] = []
+        if self._task is not None:
+            if self.reachable is None:
+                reasons.append(WARMING_UP)
+            elif not self.reachable:
+                reasons.append(REGISTRY_UNREACHABLE)
+        breaker = self.client.breaker
+        if breaker is not None and breaker.state == OPEN:
+            reasons.append(CIRCUIT_OPEN)
+        governor = self.client.governor
+        if governor is not None and self.max_queued and governor.queued >= self.max_queued:
+            reasons.append(POOL_SATURATED)
+
+        if self._ready_gauge is not None:
+            self._ready_gauge.set(0 if reasons else 1)
+        return ReadinessResponse(
+            status=NOT_READY if reasons else READY,
+            reasons=reasons,
+            registry_reachable=self.reachable,
+            registry_error=self.error,
+            registry_checked_ago=(
+                round(self._clock() - self.checked_at, 3) if self.checked_at is not None else None
+            ),
+            circuit_state=breaker.state if breaker is not None else None,
+            registry_in_flight=governor.in_flight if governor is not None else None,
+            registry_queued=governor.queued if governor is not None else None
+        )
+
+    def start(self) -> None:
+        """Warm up the registry pool and start checking it on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+            logger.info("Readiness monitor started", interval=self.interval)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.reachable = None
+        self.error = None
+        self.checked_at = None
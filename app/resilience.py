@@ -0,0 +1,271 @@
+import math
+import random
+import time
+from collections import deque
+from typing import Callable, Deque, List, Optional
+
+import httpx
+import structlog
+from prometheus_client import Gauge
+
+from .metrics import REGISTRY_BREAKER_REJECTIONS, REGISTRY_BREAKER_TRANSITIONS
+
+logger = structlog.get_logger()
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+# Gauge values of breaker states
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the circuit is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(httpx.TimeoutException):
+    """The request deadline ran out across attempts."""
+
+
+class CircuitBreaker:
+    """Circuit breaker driven by the failure ratio over a rolling window.
+
+    While closed, outcomes are counted in one-second buckets over the last
+    ``window`` seconds. Once at least ``min_requests`` calls were made and
+    the share of failures reaches ``failure_ratio``, the circuit opens and
+    calls fail fast with ``CircuitOpenError`` for ``open_seconds``. After
+    that it half-opens: up to ``half_open_probes`` calls are let through at
+    a time, and the circuit closes once that many have succeeded in a row.
+    Any failed probe opens it again.
+
+    Every call allowed by ``before_call()`` must be finished with
+    ``record()``, or ``release()`` if it was abandoned without an outcome,
+    passing the generation ``before_call()`` returned. The generation
+    changes with every state change, so a slow call admitted while closed
+    cannot count as a half-open probe, nor a late probe as a closed call;
+    such results are ignored.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_ratio: float = 0.5,
+        min_requests: int = 20,
+        window: float = 30.0,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 3,
+        clock: Callable[[], float] = time.monotonic,
+        state_gauge: Optional[Gauge] = None
+    ):
+        self.name = name
+        self.failure_ratio = failure_ratio
+        self.min_requests = min_requests
+        self.window = window
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+        self.state = CLOSED
+        self.opened_at = 0.0
+        # [second, calls, failures] per second of the rolling window
+        self._buckets: Deque[List[int]] = deque()
+        self._calls = 0
+        self._failures = 0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.generation = 0
+        self._state_gauge = state_gauge
+        self._update_gauge()
+
+    def _update_gauge(self) -> None:
+        if self._state_gauge is not None:
+            self._state_gauge.set(STATE_VALUES[self.state])
+
+    def _transition(self, state: str, **log_context) -> None:
+        previous, self.state = self.state, state
+        self.generation += 1
+        self._update_gauge()
+        REGISTRY_BREAKER_TRANSITIONS.labels(state=state).inc()
+        log = logger.warning if state == OPEN else logger.info
+        log(
+            "Circuit breaker state changed",
+            breaker=self.name,
+            previous_state=previous,
+            state=state,
+            **log_context
+        )
+
+    def _reset_window(self) -> None:
+        self._buckets.clear()
+        self._calls = 0
+        self._failures = 0
+
+    def _trim(self, now: float) -> None:
+        horizon = math.floor(now - self.window)
+        while self._buckets and self._buckets[0][0] <= horizon:
+            _, calls, failures = self._buckets.popleft()
+            self._calls -= calls
+            self._failures -= failures
+
+    def retry_after(self) -> float:
+        """Seconds until the open circuit lets a probe through."""
+        return max(0.0, self.opened_at + self.open_seconds - self._clock())
+
+    def before_call(self) -> int:
+        """Admit a call and return its generation, or raise ``CircuitOpenError``."""
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                REGISTRY_BREAKER_REJECTIONS.inc()
+                raise CircuitOpenError(self.name, self.retry_after())
+            self._probe_successes = 0
+            self._transition(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_probes:
+                REGISTRY_BREAKER_REJECTIONS.inc()
+                raise CircuitOpenError(self.name, 1.0)
+            self._probes_in_flight += 1
+        return self.generation
+
+    def record(self, generation: int, failed: bool) -> None:
+        """Record the outcome of a call admitted in ``generation``."""
+        if generation != self.generation:
+            # Admitted before the last state change
+            return
+        if self.state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if failed:
+                self._open(reason="probe failed")
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self._reset_window()
+                    self._transition(CLOSED)
+            return
+
+        now = self._clock()
+        self._trim(now)
+        second = math.floor(now)
+        if not self._buckets or self._buckets[-1][0] != second:
+            self._buckets.append([second, 0, 0])
+        bucket = self._buckets[-1]
+        bucket[1] += 1
+        self._calls += 1
+        if failed:
+            bucket[2] += 1
+            self._failures += 1
+            if (
+                self._calls >= self.min_requests
+                and self._failures >= self.failure_ratio * self._calls
+            ):
+                self._open(
+                    reason="failure ratio exceeded",
+                    calls=self._calls,
+                    failures=self._failures
+                )
+
+    def release(self, generation: int) -> None:
+        """Finish an admitted call that ended without an outcome (e.g. cancelled)."""
+        if generation == self.generation and self.state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def _open(self, **log_context) -> None:
+        self.opened_at = self._clock()
+        self._probes_in_flight = 0
+        self._reset_window()
+        self._transition(OPEN, open_seconds=self.open_seconds, **log_context)
+
+    def reset(self) -> None:
+        """Close the circuit and forget recorded outcomes."""
+        self.state = CLOSED
+        self.generation += 1
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._reset_window()
+        self._update_gauge()
+
+    def stats(self) -> dict:
+        """Breaker state and counters of the current window."""
+        return {
+            "state": self.state,
+            "calls": self._calls,
+            "failures": self._failures
+        }
+
+
+class LatencyTracker:
+    """Recent upstream latencies with cached percentiles.
+
+    Keeps the last ``max_samples`` observations; percentiles are recomputed
+    at most every ``recompute_every`` observations so that reading them on
+    every call stays cheap.
+    """
+
+    def __init__(self, max_samples: int = 1000, recompute_every: int = 50):
+        self._samples: Deque[float] = deque(maxlen=max_samples)
+        self._recompute_every = recompute_every
+        self._since_recompute = 0
+        self._sorted: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self._since_recompute += 1
+        if self._since_recompute >= self._recompute_every or not self._sorted:
+            self._sorted = sorted(self._samples)
+            self._since_recompute = 0
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency at percentile q (0-100), None before the first observation."""
+        if not self._sorted:
+            return None
+        index = min(len(self._sorted) - 1, max(0, math.ceil(q / 100 * len(self._sorted)) - 1))
+        return self._sorted[index]
+
+    def clear(self) -> None:
+        self._samples.clear()
+        self._sorted = []
+        self._since_recompute = 0
+
+
+def adaptive_timeout(
+    tracker: LatencyTracker,
+    ceiling: float,
+    percentile: float,
+    multiplier: float,
+    floor: float,
+    min_samples: int
+) -> float:
+    """
+    Timeout derived from observed latency.
+
+    Returns ``multiplier`` times the latency at ``percentile``, kept between
+    ``floor`` and ``ceiling``; ``ceiling`` until ``min_samples`` latencies
+    were observed.
+    """
+    if len(tracker) < min_samples:
+        return ceiling
+    return min(ceiling, max(floor, tracker.percentile(percentile) * multiplier))
+
+
+def backoff_delay(
+    attempt: int,
+    base: float,
+    cap: float,
+    rng: Callable[[], float] = random.random
+) -> float:
+    """
+    Delay before retry number ``attempt`` (0-based), with full jitter.
+
+    Uniformly random between 0 and ``base * 2 ** attempt`` capped at ``cap``,
+    so that clients retrying after a shared failure spread out instead of
+    hitting the upstream in lockstep.
+    """
+    return rng() * min(cap, base * (2 ** attempt))
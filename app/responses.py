@@ -0,0 +1,40 @@
+from typing import Any, Type
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from starlette.responses import Response
+
+
+def _orjson_available() -> bool:
+    """Check whether the optional orjson package is installed."""
+    try:
+        import orjson  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def default_response_class() -> Type[JSONResponse]:
+    """``ORJSONResponse`` when orjson is installed, stdlib ``JSONResponse`` otherwise."""
+    if _orjson_available():
+        from fastapi.responses import ORJSONResponse
+        return ORJSONResponse
+    return JSONResponse
+
+
+class ModelResponse(Response):
+    """JSON response for a pydantic model the handler already holds.
+
+    FastAPI validates a returned model against ``response_model`` again and
+    turns it into a dict before encoding it. Models built from registry data
+    are valid by construction, so this response serializes them straight to
+    bytes with pydantic-core. Keep ``response_model`` on the route for the
+    OpenAPI schema.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.__pydantic_serializer__.to_json(content)
+        return super().render(content)
@@ -0,0 +1,337 @@
+import asyncio
+import heapq
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import structlog
+from prometheus_client import Gauge
+
+from .metrics import REFRESHES
+from .models import ExternalAPIResponse
+from .rate_limit import State, TokenBucket
+
+logger = structlog.get_logger()
+
+CacheKey = Tuple[str, str]
+
+# Refresh reasons
+EXPIRY = "expiry"
+DATE = "date"
+
+
+def record_change_dates(record: ExternalAPIResponse) -> List[float]:
+    """Local midnights of the dates on which the record is likely to change."""
+    timestamps = []
+    for value in (record.recertification_dt, record.med_opinions_dt):
+        try:
+            day = date.fromisoformat(value[:10])
+        except (TypeError, ValueError):
+            continue
+        timestamps.append(datetime(day.year, day.month, day.day).timestamp())
+    return timestamps
+
+
+def in_hours(timestamp: float, start_hour: int, end_hour: int) -> bool:
+    """Whether the local hour of timestamp is in [start_hour, end_hour), wrapping midnight."""
+    hour = datetime.fromtimestamp(timestamp).hour
+    if start_hour <= end_hour:
+        return start_hour <= hour < end_hour
+    return hour >= start_hour or hour < end_hour
+
+
+@dataclass
+class TrackedKey:
+    elmk_number: str
+    snils: str
+    last_seen: float
+    due: float
+    reason: str
+    # When the cached record was last fetched for this key
+    refreshed_at: float
+
+
+class RefreshScheduler:
+    """Background refresh of registry records for recently requested keys.
+
+    Every key looked up within ``track_window`` seconds is tracked. It is
+    refreshed ``lead`` seconds before its cache entry expires, so hot keys
+    stay warm, and ``date_lead`` seconds before its recertification or
+    medical opinion date, when the record is likely to change. After a
+    refresh a key is only scheduled again if it was looked up since the
+    previous one, so a key requested once is refreshed at most once. When
+    ``fresh_for`` shows that the cached record was fetched again in the
+    meantime (e.g. by a lookup after it expired), an expiry refresh is
+    postponed instead of calling the registry. During
+    off-peak hours date-driven refreshes due within ``offpeak_lookahead``
+    seconds are pulled forward, so that work is done at night rather than
+    at the start of the working day.
+
+    Refreshes are paced by a token bucket at ``rate`` per second, or
+    ``offpeak_rate`` during off-peak hours (``offpeak_rate <= 0`` keeps
+    ``rate`` off-peak too). ``rate`` must be positive; to turn refreshes
+    off, do not create the scheduler. Keys not seen for
+    ``track_window`` seconds are dropped when they come due. Times are
+    wall-clock, since the dates are calendar dates.
+
+    Keeping ``max_keys`` keys warm takes up to ``required_rate`` refreshes
+    per second; ``start()`` warns when that is above ``rate``.
+    """
+
+    def __init__(
+        self,
+        refresh: Callable[[str, str], Awaitable[Optional[ExternalAPIResponse]]],
+        ttl: float,
+        lead: float = 300.0,
+        date_lead: float = 21600.0,
+        track_window: float = 86400.0,
+        max_keys: int = 10000,
+        rate: float = 1.0,
+        offpeak_rate: float = 5.0,
+        offpeak_start_hour: int = 1,
+        offpeak_end_hour: int = 6,
+        offpeak_lookahead: float = 43200.0,
+        poll_interval: float = 1.0,
+        clock: Callable[[], float] = time.time,
+        depth_gauge: Optional[Gauge] = None,
+        lag_gauge: Optional[Gauge] = None,
+        fresh_for: Optional[Callable[[str, str], float]] = None
+    ):
+        self._refresh = refresh
+        self.ttl = ttl
+        self.lead = lead
+        self.date_lead = date_lead
+        self.track_window = track_window
+        self.max_keys = max_keys
+        self.offpeak_start_hour = offpeak_start_hour
+        self.offpeak_end_hour = offpeak_end_hour
+        self.offpeak_lookahead = offpeak_lookahead
+        self.poll_interval = poll_interval
+        self._clock = clock
+        self._depth_gauge = depth_gauge
+        self._lag_gauge = lag_gauge
+        self._fresh_for = fresh_for
+        self.rate = rate
+        if rate <= 0:
+            raise ValueError("Refresh rate must be positive")
+        self._buckets = {False: TokenBucket(1, 1 / rate)}
+        if offpeak_rate > 0:
+            self._buckets[True] = TokenBucket(1, 1 / offpeak_rate)
+        self._bucket_state: Dict[bool, Optional[State]] = {False: None, True: None}
+        self._keys: "OrderedDict[CacheKey, TrackedKey]" = OrderedDict()
+        # (due, sequence, key) per reason; entries whose due no longer
+        # matches the key are skipped
+        self._heaps: Dict[str, List[Tuple[float, int, CacheKey]]] = {EXPIRY: [], DATE: []}
+        self._sequence = 0
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @property
+    def required_rate(self) -> float:
+        """Refreshes per second needed to keep ``max_keys`` keys warm."""
+        return self.max_keys / max(1.0, self.ttl - self.lead)
+
+    def _update_depth(self) -> None:
+        if self._depth_gauge is not None:
+            self._depth_gauge.set(len(self._keys))
+
+    def _update_lag(self, lag: float) -> None:
+        if self._lag_gauge is not None:
+            self._lag_gauge.set(lag)
+
+    def next_due(self, record: Optional[ExternalAPIResponse], expires_in: float) -> Tuple[float, str]:
+        """When and why the key should be refreshed next."""
+        now = self._clock()
+        due, reason = now + max(0.0, expires_in - self.lead), EXPIRY
+        if record is not None:
+            for change_at in record_change_dates(record):
+                date_due = change_at - self.date_lead
+                if now < date_due < due:
+                    due, reason = date_due, DATE
+        return due, reason
+
+    def track(
+        self,
+        key: CacheKey,
+        elmk_number: str,
+        snils: str,
+        record: Optional[ExternalAPIResponse],
+        expires_in: float
+    ) -> None:
+        """Note a lookup of key; schedule it if it is not scheduled yet."""
+        now = self._clock()
+        tracked = self._keys.get(key)
+        if tracked is not None:
+            tracked.last_seen = now
+            self._keys.move_to_end(key)
+            return
+
+        tracked = TrackedKey(elmk_number, snils, now, 0.0, EXPIRY, now)
+        tracked.due, tracked.reason = self.next_due(record, expires_in)
+        self._keys[key] = tracked
+        self._push(key, tracked)
+        while len(self._keys) > self.max_keys:
+            self._keys.popitem(last=False)
+        self._update_depth()
+
+    def _push(self, key: CacheKey, tracked: TrackedKey) -> None:
+        self._sequence += 1
+        heapq.heappush(self._heaps[tracked.reason], (tracked.due, self._sequence, key))
+        self._wakeup.set()
+
+    def _peek(self, reason: str) -> Optional[Tuple[float, CacheKey]]:
+        """Earliest (due, key) for reason, dropping heap entries that are out of date."""
+        heap = self._heaps[reason]
+        while heap:
+            due, _, key = heap[0]
+            tracked = self._keys.get(key)
+            if tracked is not None and tracked.due == due and tracked.reason == reason:
+                return due, key
+            heapq.heappop(heap)
+        return None
+
+    def offpeak(self, now: float) -> bool:
+        return in_hours(now, self.offpeak_start_hour, self.offpeak_end_hour)
+
+    def pop_due(self) -> Optional[Tuple[CacheKey, TrackedKey]]:
+        """Take the next key to refresh now, if any."""
+        while True:
+            now = self._clock()
+            horizons = {
+                EXPIRY: now,
+                DATE: now + self.offpeak_lookahead if self.offpeak(now) else now
+            }
+            candidates = []
+            for reason, horizon in horizons.items():
+                head = self._peek(reason)
+                if head is not None and head[0] <= horizon:
+                    candidates.append((head[0], reason))
+            if not candidates:
+                self._update_lag(0.0)
+                return None
+
+            due, reason = min(candidates)
+            _, _, key = heapq.heappop(self._heaps[reason])
+            tracked = self._keys[key]
+            self._update_lag(max(0.0, now - due))
+            if now - tracked.last_seen <= self.track_window:
+                return key, tracked
+            # Not requested lately, stop keeping it warm
+            del self._keys[key]
+            self._update_depth()
+
+    def _acquire_delay(self) -> float:
+        """Take a token for the current period; seconds to wait if there is none."""
+        offpeak = True in self._buckets and self.offpeak(self._clock())
+        state, decision = self._buckets[offpeak].step(self._bucket_state[offpeak], time.monotonic())
+        self._bucket_state[offpeak] = state
+        return decision.retry_after
+
+    async def run_once(self) -> bool:
+        """Refresh one due key. Returns False when nothing was due."""
+        item = self.pop_due()
+        if item is None:
+            return False
+        key, tracked = item
+
+        if tracked.reason == EXPIRY and self._fresh_for is not None:
+            fresh_for = self._fresh_for(tracked.elmk_number, tracked.snils)
+            if fresh_for > self.lead:
+                # Fetched again since it was scheduled, nothing to refresh yet
+                REFRESHES.labels(result="fresh").inc()
+                tracked.due = self._clock() + fresh_for - self.lead
+                self._push(key, tracked)
+                return True
+
+        delay = self._acquire_delay()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self._acquire_delay()
+
+        try:
+            record = await self._refresh(tracked.elmk_number, tracked.snils)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            REFRESHES.labels(result="error").inc()
+            logger.warning(
+                "Scheduled registry refresh failed",
+                elmk_number=tracked.elmk_number,
+                reason=tracked.reason,
+                error=str(e) or type(e).__name__
+            )
+            # Try again once the registry had time to recover
+            tracked.due, tracked.reason = self._clock() + self.lead, EXPIRY
+            self._push(key, tracked)
+            return True
+
+        if record is None:
+            # No longer in the registry, nothing to keep warm
+            REFRESHES.labels(result="not_found").inc()
+            self._keys.pop(key, None)
+            self._update_depth()
+            return True
+
+        REFRESHES.labels(result="ok").inc()
+        if key not in self._keys:
+            return True
+        if tracked.last_seen <= tracked.refreshed_at:
+            # Not requested since the last refresh, let it expire
+            del self._keys[key]
+            self._update_depth()
+            return True
+        tracked.refreshed_at = self._clock()
+        tracked.due, tracked.reason = self.next_due(record, self.ttl)
+        self._push(key, tracked)
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if await self.run_once():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Refresh scheduler error", error=str(e))
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """Start the background loop on the running event loop."""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+            logger.info("Refresh scheduler started", tracked=len(self._keys))
+            if self.required_rate > self.rate:
+                logger.warning(
+                    "Refresh rate is too low to keep all tracked keys warm",
+                    max_keys=self.max_keys,
+                    required_rate=round(self.required_rate, 3),
+                    rate=self.rate
+                )
+
+    async def stop(self) -> None:
+        """Stop the background loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Refresh scheduler stopped")
+
+    def clear(self) -> None:
+        self._keys.clear()
+        for heap in self._heaps.values():
+            heap.clear()
+        self._update_depth()
@@ -0,0 +1,69 @@
+import math
+import os
+from typing import TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:
+    # Settings are read from the environment on import, which the gunicorn
+    # config importing this module adjusts first
+    from .config import Settings
+
+CGROUP_V2_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+CGROUP_V1_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_V1_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit(
+    cpu_max: str = CGROUP_V2_CPU_MAX,
+    v1_quota: str = CGROUP_V1_QUOTA,
+    v1_period: str = CGROUP_V1_PERIOD
+) -> Optional[float]:
+    """CPUs allowed by the container CPU quota, None when there is no quota."""
+    value = _read(cpu_max)
+    if value is not None:
+        quota, _, period = value.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+    quota, period = _read(v1_quota), _read(v1_period)
+    if quota is not None and period is not None and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def available_cpus(**cgroup_paths) -> int:
+    """CPUs this process may use: affinity mask, capped by the cgroup quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit(**cgroup_paths)
+    if limit is not None:
+        cpus = min(cpus, max(1, math.ceil(limit)))
+    return max(1, cpus)
+
+
+def default_workers() -> int:
+    """One worker per usable CPU: each worker runs its own event loop on one core."""
+    return available_cpus()
+
+
+def fragmented_state(settings: "Settings") -> List[str]:
+    """Process-local state that multiple workers would each keep their own copy of."""
+    if settings.web_concurrency <= 1:
+        return []
+    problems = []
+    if settings.rate_limit_backend == "memory":
+        problems.append("rate limits are enforced per worker, set RATE_LIMIT_BACKEND=mmap or redis")
+    if settings.registry_cache_enabled and not settings.registry_disk_cache_enabled:
+        problems.append("registry cache is per worker, set REGISTRY_DISK_CACHE_ENABLED=true to share it")
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        problems.append("/metrics reports one worker only, set PROMETHEUS_MULTIPROC_DIR")
+    return problems
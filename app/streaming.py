@@ -0,0 +1,111 @@
+import asyncio
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Optional, Set, TypeVar
+
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """Streaming response whose body iterator keeps reading the request body.
+
+    ``StreamingResponse`` consumes ``receive()`` in the background to watch
+    for client disconnects, which steals request body chunks from an
+    iterator that reads the body while responding. This response only
+    sends; a disconnect surfaces as ``ClientDisconnect`` from
+    ``request.stream()`` instead.
+    """
+
+    media_type = NDJSON_MEDIA_TYPE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+
+        if self.background is not None:
+            await self.background()
+
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterable[bytes], max_line_bytes: int
+) -> AsyncIterator[bytes]:
+    """
+    Split a byte stream into NDJSON lines.
+
+    Blank lines are yielded too, so the position of a line is its 0-based
+    line number in the input; callers skip them. Lines longer than ``max_line_bytes`` are cut at the limit and the rest of
+    the line is discarded, so a missing newline cannot grow the buffer
+    without bound. The truncated line is still yielded and fails parsing
+    downstream, which keeps input line numbering intact.
+    """
+    buffer = b""
+    skipping = False
+
+    async for chunk in chunks:
+        lines = (buffer + chunk).split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            if skipping:
+                skipping = False
+                continue
+            yield line
+
+        if len(buffer) > max_line_bytes:
+            if not skipping:
+                yield buffer[:max_line_bytes]
+                skipping = True
+            buffer = b""
+
+    if buffer and not skipping:
+        yield buffer
+
+
+async def map_bounded(
+    items: AsyncIterable[T],
+    fn: Callable[[int, T], Awaitable[R]],
+    concurrency: int
+) -> AsyncIterator[R]:
+    """
+    Apply ``fn(index, item)`` concurrently and yield results as they complete.
+
+    No more than ``concurrency`` calls are in flight, and the next item is
+    not pulled from ``items`` until a slot is free. Reading the next item
+    and the calls in flight are awaited together, so a result is yielded
+    as soon as it is ready even while ``items`` is slow to produce more.
+    Pending calls are cancelled if the consumer stops iterating early.
+    """
+    iterator: Optional[AsyncIterator[T]] = items.__aiter__()
+    reader: Optional[asyncio.Future] = None
+    pending: Set[asyncio.Future] = set()
+    index = 0
+
+    try:
+        while True:
+            if reader is None and iterator is not None and len(pending) < concurrency:
+                reader = asyncio.ensure_future(iterator.__anext__())
+            if reader is None and not pending:
+                break
+
+            waiting = (pending | {reader}) if reader is not None else pending
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            if reader in done:
+                done.discard(reader)
+                try:
+                    item = reader.result()
+                except StopAsyncIteration:
+                    iterator = None
+                else:
+                    pending.add(asyncio.ensure_future(fn(index, item)))
+                    index += 1
+                reader = None
+            for task in done:
+                pending.discard(task)
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        if reader is not None:
+            reader.cancel()
@@ -0,0 +1,101 @@
+"""
+Read latency of the SQLite registry cache tier.
+
+Fills a temporary database with records, then reads random keys both
+directly and through the async API (thread pool hop included), one at a
+time and with concurrent readers. Reports p50/p99 read latency as JSON.
+
+Usage:
+    python -m benchmarks.bench_disk_cache [--entries 100000] [--reads 20000] [--concurrency 32]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app.disk_cache import DiskCache
+from app.models import ExternalAPIResponse
+from tests.fake_registry import SAMPLE_RECORD
+
+
+def percentiles(samples: list) -> dict:
+    cuts = statistics.quantiles(samples, n=100)
+    return {
+        "p50_us": round(cuts[49] * 1e6, 1),
+        "p99_us": round(cuts[98] * 1e6, 1),
+        "max_us": round(max(samples) * 1e6, 1),
+    }
+
+
+def fill(cache: DiskCache, entries: int) -> list:
+    record = ExternalAPIResponse(**SAMPLE_RECORD)
+    keys = [(f"{i:012d}", "17648922116") for i in range(entries)]
+    conn = cache._connection()
+    conn.execute("BEGIN")
+    for key in keys:
+        cache.set(key, record, retain=3600)
+    conn.execute("COMMIT")
+    return keys
+
+
+def bench_sync(cache: DiskCache, keys: list, reads: int) -> dict:
+    rng = random.Random(1)
+    samples = []
+    for _ in range(reads):
+        key = rng.choice(keys)
+        started = time.perf_counter()
+        cache.get(key)
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+async def bench_async(cache: DiskCache, keys: list, reads: int, concurrency: int) -> dict:
+    rng = random.Random(2)
+    samples = []
+    remaining = iter(range(reads))
+
+    async def reader():
+        for _ in remaining:
+            key = rng.choice(keys)
+            started = time.perf_counter()
+            await cache.aget(key)
+            samples.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(reader() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {**percentiles(samples), "reads_per_second": round(reads / elapsed)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--reads", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = DiskCache(os.path.join(directory, "registry.sqlite3"), max_entries=args.entries)
+        try:
+            keys = fill(cache, args.entries)
+            results = {
+                "benchmark": "disk_cache",
+                "entries": args.entries,
+                "reads": args.reads,
+                "concurrency": args.concurrency,
+                "sync_get": bench_sync(cache, keys, args.reads),
+                # Thread pool hop alone, then under concurrent load
+                "async_get_sequential": asyncio.run(bench_async(cache, keys, args.reads, 1)),
+                "async_get": asyncio.run(bench_async(cache, keys, args.reads, args.concurrency)),
+            }
+        finally:
+            cache.close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
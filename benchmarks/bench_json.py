@@ -0,0 +1,108 @@
+"""
+Parse and serialize cost of a registry record.
+
+Compares decoding registry bytes with json.loads plus model construction
+against model_validate_json, and encoding a record the way FastAPI does for
+a returned model (re-validation, dump to dict, stdlib json) against orjson
+and pydantic-core serialization. Reports microseconds per operation as JSON.
+
+Usage:
+    python -m benchmarks.bench_json [--iterations 50000] [--batch 1000]
+"""
+import argparse
+import json
+import time
+
+from pydantic import TypeAdapter
+
+from app.models import BatchItemResult, ExternalAPIResponse, MedicalBookBatchResponse
+from tests.fake_registry import SAMPLE_RECORD
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def per_op_us(fn, iterations: int) -> float:
+    for _ in range(min(1000, iterations)):
+        fn()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return round((time.perf_counter() - started) / iterations * 1e6, 2)
+
+
+def fastapi_default(adapter: TypeAdapter, value) -> bytes:
+    """What FastAPI does for a returned model with response_model and JSONResponse."""
+    validated = adapter.validate_python(value, from_attributes=True)
+    content = adapter.dump_python(validated, mode="json")
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def bench_parse(payload: bytes, iterations: int) -> dict:
+    return {
+        "json_loads_model_init_us": per_op_us(
+            lambda: ExternalAPIResponse(**json.loads(payload)), iterations
+        ),
+        "model_validate_json_us": per_op_us(
+            lambda: ExternalAPIResponse.model_validate_json(payload), iterations
+        ),
+    }
+
+
+def bench_serialize(value, iterations: int) -> dict:
+    adapter = TypeAdapter(type(value))
+    results = {
+        "fastapi_default_us": per_op_us(lambda: fastapi_default(adapter, value), iterations),
+        "pydantic_to_json_us": per_op_us(
+            lambda: value.__pydantic_serializer__.to_json(value), iterations
+        ),
+    }
+    if orjson is not None:
+        results["orjson_model_dump_us"] = per_op_us(
+            lambda: orjson.dumps(value.model_dump(mode="json")), iterations
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=50000)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    payload = json.dumps(SAMPLE_RECORD, ensure_ascii=False).encode()
+    record = ExternalAPIResponse.model_validate_json(payload)
+    batch = MedicalBookBatchResponse(
+        total=args.batch,
+        unique=args.batch,
+        succeeded=args.batch,
+        failed=0,
+        results=[
+            BatchItemResult(
+                index=i,
+                elmk_number="860102797025",
+                snils="17648922116",
+                status_code=200,
+                result=record,
+                cache="HIT"
+            )
+            for i in range(args.batch)
+        ]
+    )
+    batch_iterations = max(1, args.iterations // args.batch)
+
+    results = {
+        "benchmark": "json",
+        "iterations": args.iterations,
+        "orjson": orjson is not None,
+        "parse_record": bench_parse(payload, args.iterations),
+        "serialize_record": bench_serialize(record, args.iterations),
+        "serialize_batch": {"items": args.batch, **bench_serialize(batch, batch_iterations)},
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
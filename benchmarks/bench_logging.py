@@ -0,0 +1,115 @@
+"""
+Event loop time spent on logging per request.
+
+Emits the log events of one validate request (request started/completed,
+validation request/success, registry request/response) through the previous
+synchronous setup, which renders and writes every line through the stdlib
+logging handler inline, and through the queued writer, with and without
+sampling of info events. Lines go to a temporary file. Reports the time the
+calling thread spends per event and per request as JSON.
+
+Usage:
+    python -m benchmarks.bench_logging [--requests 20000] [--sample-rate 0.1]
+"""
+import argparse
+import json
+import logging
+import tempfile
+import time
+
+import structlog
+
+from app.log_pipeline import QueueLogWriter, configure_logging
+
+URL = "http://testserver/api/v1/medical-book/validate"
+ELMK_NUMBER = "860102797025"
+
+
+def configure_sync(stream) -> logging.Handler:
+    """The configuration the service used before the queued writer."""
+    handler = logging.StreamHandler(stream)
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    structlog.configure(
+        processors=[
+            structlog.stdlib.filter_by_level,
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.PositionalArgumentsFormatter(),
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.processors.StackInfoRenderer(),
+            structlog.processors.format_exc_info,
+            structlog.processors.UnicodeDecoder(),
+            structlog.processors.JSONRenderer()
+        ],
+        context_class=dict,
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=structlog.stdlib.BoundLogger,
+        cache_logger_on_first_use=True,
+    )
+    return handler
+
+
+def log_request(logger) -> None:
+    logger.info("Request started", method="POST", url=URL, client_ip="127.0.0.1", user_agent="bench")
+    logger.info("Medical book validation request", elmk_number=ELMK_NUMBER, user="admin")
+    logger.info("Making request to external API", elmk_number=ELMK_NUMBER, url=URL)
+    logger.info("External API response", elmk_number=ELMK_NUMBER, status_code=200)
+    logger.info("Medical book validation successful", elmk_number=ELMK_NUMBER, user="admin")
+    logger.info("Request completed", method="POST", url=URL, status_code=200,
+                process_time=0.0123, client_ip="127.0.0.1")
+
+
+EVENTS_PER_REQUEST = 6
+
+
+def measure(requests: int) -> dict:
+    logger = structlog.get_logger()
+    log_request(logger)
+    started = time.perf_counter()
+    for _ in range(requests):
+        log_request(logger)
+    elapsed = time.perf_counter() - started
+    return {
+        "per_event_us": round(elapsed / requests / EVENTS_PER_REQUEST * 1e6, 2),
+        "per_request_us": round(elapsed / requests * 1e6, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryFile("w+") as stream:
+        handler = configure_sync(stream)
+        results["sync"] = measure(args.requests)
+        logging.getLogger().removeHandler(handler)
+
+    for name, rates in (("queued", None), ("queued_sampled", {"info": args.sample_rate})):
+        with tempfile.TemporaryFile() as stream:
+            writer = QueueLogWriter(stream, max_queue=args.requests * EVENTS_PER_REQUEST * 2)
+            writer.start()
+            configure_logging(writer, sample_rates=rates)
+            results[name] = measure(args.requests)
+            writer.stop()
+            results[name]["dropped"] = writer.dropped
+
+    for name in ("queued", "queued_sampled"):
+        results[name]["saved_per_request_us"] = round(
+            results["sync"]["per_request_us"] - results[name]["per_request_us"], 2
+        )
+
+    print(json.dumps({
+        "benchmark": "logging",
+        "requests": args.requests,
+        "sample_rate": args.sample_rate,
+        "setups": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Throughput of the middleware stack.
+
+Serves the service routes in-process through the original
+BaseHTTPMiddleware stack and through the current ASGI middleware, and
+reports requests per second for ``/healthz`` and the validate route
+(answered from the registry cache, so no network is involved) as JSON.
+
+Usage:
+    python -m benchmarks.bench_middleware [--requests 5000] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import time
+
+import httpx
+import structlog
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.api import router
+from app.cache import make_cache_key, registry_cache
+from app.config import settings
+from app.metrics import RATE_LIMIT_REJECTIONS, REQUEST_LATENCY, REQUESTS_IN_FLIGHT
+from app.middleware import ErrorHandlingMiddleware, LoggingMiddleware, RateLimitMiddleware, route_label
+from app.models import ExternalAPIResponse
+from app.rate_limit import MemoryRateLimitBackend
+from tests.fake_registry import SAMPLE_RECORD
+
+logger = structlog.get_logger()
+
+ELMK_NUMBER = "860102797025"
+SNILS = "17648922116"
+
+
+class LegacyLoggingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        client_ip = request.client.host if request.client else "unknown"
+        logger.info("Request started", method=request.method, url=str(request.url),
+                    client_ip=client_ip, user_agent=request.headers.get("user-agent", "unknown"))
+        response = await call_next(request)
+        logger.info("Request completed", method=request.method, url=str(request.url),
+                    status_code=response.status_code, process_time=time.time() - start_time,
+                    client_ip=client_ip)
+        return response
+
+
+class LegacyMetricsMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            response = await call_next(request)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+        REQUEST_LATENCY.labels(
+            method=request.method, route=route_label(request.scope), status=str(response.status_code)
+        ).observe(time.perf_counter() - start_time)
+        return response
+
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, backend):
+        super().__init__(app)
+        self.rate_limiter = backend
+
+    async def dispatch(self, request: Request, call_next):
+        client_id = request.client.host if request.client else "unknown"
+        decision = await self.rate_limiter.hit(client_id)
+        headers = decision.headers(self.rate_limiter.window_seconds)
+        if not decision.allowed:
+            RATE_LIMIT_REJECTIONS.inc()
+            return JSONResponse(status_code=429, content={"error": "Rate limit exceeded"}, headers=headers)
+        response = await call_next(request)
+        response.headers.update(headers)
+        return response
+
+
+class LegacyErrorHandlingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        try:
+            return await call_next(request)
+        except Exception:
+            return JSONResponse(status_code=500, content={"error": "Internal server error"})
+
+
+def make_app(stack: str, requests: int) -> FastAPI:
+    """Service routes behind the given middleware stack, with a limit that is never hit."""
+    bench_app = FastAPI()
+    bench_app.include_router(router)
+    backend = MemoryRateLimitBackend("sliding_window", requests * 10, 3600)
+    if stack == "base_http":
+        bench_app.add_middleware(LegacyErrorHandlingMiddleware)
+        bench_app.add_middleware(LegacyRateLimitMiddleware, backend=backend)
+        bench_app.add_middleware(LegacyLoggingMiddleware)
+        bench_app.add_middleware(LegacyMetricsMiddleware)
+    else:
+        bench_app.add_middleware(ErrorHandlingMiddleware)
+        bench_app.add_middleware(RateLimitMiddleware, backend=backend)
+        bench_app.add_middleware(LoggingMiddleware)
+    return bench_app
+
+
+async def run(bench_app: FastAPI, method: str, path: str, requests: int, concurrency: int, **kwargs) -> dict:
+    """Send requests with bounded concurrency and report throughput."""
+    transport = httpx.ASGITransport(app=bench_app)
+    remaining = iter(range(requests))
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            for _ in remaining:
+                response = await client.request(method, path, **kwargs)
+                assert response.status_code == 200, response.text
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests_per_second": round(requests / elapsed),
+        "mean_request_us": round(elapsed / requests * 1e6, 1),
+    }
+
+
+async def bench(args) -> dict:
+    # Log calls are still made, but not written out, so the terminal is not measured
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    if settings.auth_username is None or settings.auth_password is None:
+        settings.auth_username, settings.auth_password = "bench", "bench"
+    token = base64.b64encode(f"{settings.auth_username}:{settings.auth_password}".encode()).decode()
+    registry_cache.set(make_cache_key(ELMK_NUMBER, SNILS), ExternalAPIResponse(**SAMPLE_RECORD))
+
+    routes = {
+        "healthz": ("GET", "/healthz", {}),
+        "validate": ("POST", "/api/v1/medical-book/validate", {
+            "json": {"elmk_number": ELMK_NUMBER, "snils": SNILS},
+            "headers": {"Authorization": f"Basic {token}"},
+        }),
+    }
+    results = {}
+    for stack in ("base_http", "asgi"):
+        results[stack] = {}
+        for name, (method, path, kwargs) in routes.items():
+            bench_app = make_app(stack, args.requests)
+            # Warm up route resolution, auth cache and metric label children
+            await run(bench_app, method, path, args.concurrency, args.concurrency, **kwargs)
+            results[stack][name] = await run(
+                bench_app, method, path, args.requests, args.concurrency, **kwargs
+            )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    results = {
+        "benchmark": "middleware",
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "stacks": asyncio.run(bench(args)),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
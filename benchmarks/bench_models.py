@@ -0,0 +1,76 @@
+"""
+Request validation cost.
+
+Times MedicalBookRequest validation from Python values and from JSON bytes,
+for valid and invalid input, and validation of a whole batch request body.
+Reports microseconds per operation as JSON.
+
+Usage:
+    python -m benchmarks.bench_models [--iterations 100000] [--batch 1000]
+"""
+import argparse
+import json
+import time
+
+from pydantic import ValidationError
+
+from app.models import MedicalBookBatchRequest, MedicalBookRequest
+
+VALID = {"elmk_number": "860102797025", "snils": "17648922116"}
+INVALID = {"elmk_number": "86010279702x", "snils": "17648922116"}
+
+
+def per_op_us(fn, iterations: int) -> float:
+    for _ in range(min(1000, iterations)):
+        fn()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return round((time.perf_counter() - started) / iterations * 1e6, 2)
+
+
+def rejects(fn):
+    def call():
+        try:
+            fn()
+        except ValidationError:
+            pass
+    return call
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=100000)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    valid_json = json.dumps(VALID).encode()
+    invalid_json = json.dumps(INVALID).encode()
+    batch_json = json.dumps({"items": [VALID] * args.batch}).encode()
+    batch_iterations = max(1, args.iterations // args.batch)
+
+    results = {
+        "benchmark": "models",
+        "iterations": args.iterations,
+        "request_valid_us": per_op_us(lambda: MedicalBookRequest(**VALID), args.iterations),
+        "request_valid_json_us": per_op_us(
+            lambda: MedicalBookRequest.model_validate_json(valid_json), args.iterations
+        ),
+        "request_invalid_us": per_op_us(
+            rejects(lambda: MedicalBookRequest(**INVALID)), args.iterations
+        ),
+        "request_invalid_json_us": per_op_us(
+            rejects(lambda: MedicalBookRequest.model_validate_json(invalid_json)), args.iterations
+        ),
+        "batch": {
+            "items": args.batch,
+            "validate_json_us": per_op_us(
+                lambda: MedicalBookBatchRequest.model_validate_json(batch_json), batch_iterations
+            ),
+        },
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
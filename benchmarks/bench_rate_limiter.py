@@ -0,0 +1,104 @@
+"""
+Microbenchmark of rate limiting engines.
+
+Compares the list-based limiter the middleware used originally with the
+token bucket and sliding window counter engines from ``app.rate_limit``
+at 10k+ distinct clients. Reports checks per second and memory held by
+per-client state as JSON.
+
+Usage:
+    python -m benchmarks.bench_rate_limiter [--clients 10000] [--requests 200000]
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Dict
+
+from app.rate_limit import SlidingWindowCounterRateLimiter, TokenBucketRateLimiter
+
+
+class ListRateLimiter:
+    """The original implementation: one timestamp list per client."""
+
+    def __init__(self, max_requests: int, window_seconds: int):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.requests: Dict[str, list] = defaultdict(list)
+
+    def is_allowed(self, client_id: str) -> bool:
+        now = time.time()
+        client_requests = self.requests[client_id]
+        client_requests[:] = [req_time for req_time in client_requests
+                              if now - req_time < self.window_seconds]
+        if len(client_requests) >= self.max_requests:
+            return False
+        client_requests.append(now)
+        return True
+
+
+def make_sequence(client_ids, requests: int) -> list:
+    """Skewed client sequence: a few heavy clients near the limit, a long tail of light ones."""
+    rng = random.Random(42)
+    return [
+        client_ids[min(int(rng.paretovariate(1.2)) - 1, len(client_ids) - 1)]
+        if rng.random() < 0.5 else rng.choice(client_ids)
+        for _ in range(requests)
+    ]
+
+
+def run(limiter_factory, sequence: list) -> dict:
+    """Time a limiter over the sequence, then measure memory held by its state."""
+    limiter = limiter_factory()
+    started = time.perf_counter()
+    allowed = 0
+    for client_id in sequence:
+        allowed += limiter.is_allowed(client_id)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    limiter = limiter_factory()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for client_id in sequence:
+        limiter.is_allowed(client_id)
+    state_bytes = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    return {
+        "checks_per_second": round(len(sequence) / elapsed),
+        "mean_check_us": round(elapsed / len(sequence) * 1e6, 3),
+        "allowed": allowed,
+        "state_bytes": state_bytes,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--window", type=int, default=3600)
+    args = parser.parse_args()
+
+    client_ids = [f"10.{i // 65536}.{i // 256 % 256}.{i % 256}" for i in range(args.clients)]
+    sequence = make_sequence(client_ids, args.requests)
+    engines = {
+        "list": lambda: ListRateLimiter(args.limit, args.window),
+        "token_bucket": lambda: TokenBucketRateLimiter(args.limit, args.window),
+        "sliding_window": lambda: SlidingWindowCounterRateLimiter(args.limit, args.window),
+    }
+    results = {
+        "benchmark": "rate_limiter",
+        "clients": args.clients,
+        "requests": args.requests,
+        "limit": args.limit,
+        "window": args.window,
+        "engines": {name: run(factory, sequence) for name, factory in engines.items()},
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Cold start of the service: imports, lifespan startup and first request.
+
+Each sample runs in a fresh interpreter that imports ``app.main``, runs the
+lifespan startup and serves ``GET /healthz`` in process, timing each step;
+the whole interpreter is also timed from spawn to exit. The profile lists
+the modules with the largest cumulative import time from
+``python -X importtime``. Results are medians over ``--samples`` runs, in
+milliseconds, as JSON.
+
+Usage:
+    python -m benchmarks.bench_startup [--samples 5] [--profile 15]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+STEPS = ("import", "lifespan", "first_request")
+
+
+def measure_child() -> None:
+    """Time the startup steps in this interpreter and print them as JSON."""
+    started = time.perf_counter()
+    from app.main import app
+    imported = time.perf_counter()
+
+    import httpx
+
+    async def serve() -> Dict[str, float]:
+        before = time.perf_counter()
+        async with app.router.lifespan_context(app):
+            ready = time.perf_counter()
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://service") as client:
+                response = await client.get("/healthz")
+                response.raise_for_status()
+            served = time.perf_counter()
+        return {"lifespan": ready - before, "first_request": served - ready}
+
+    timings = {"import": imported - started, **asyncio.run(serve())}
+    # Last line of stdout; app logs may come before it
+    print(json.dumps(timings))
+
+
+def child_env(state_dir: str) -> Dict[str, str]:
+    return {
+        **os.environ,
+        "AUTH_USERNAME": os.environ.get("AUTH_USERNAME", "admin"),
+        "AUTH_PASSWORD": os.environ.get("AUTH_PASSWORD", "securepassword123"),
+        "JOBS_DB_PATH": os.path.join(state_dir, "jobs.sqlite3"),
+        "LOG_LEVEL": "WARNING",
+    }
+
+
+def import_profile(env: Dict[str, str], top: int) -> List[dict]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=env, capture_output=True, text=True, check=True
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue
+        modules.append({
+            "module": name.strip(),
+            "self_ms": round(int(self_us) / 1000, 1),
+            "cumulative_ms": round(int(cumulative_us) / 1000, 1),
+        })
+    modules.sort(key=lambda module: module["cumulative_ms"], reverse=True)
+    return modules[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--profile", type=int, default=15, help="Modules to list by import time, 0 to skip")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure_child()
+        return
+
+    samples: Dict[str, List[float]] = {step: [] for step in STEPS + ("process",)}
+    with tempfile.TemporaryDirectory() as state_dir:
+        env = child_env(state_dir)
+        for _ in range(args.samples):
+            started = time.perf_counter()
+            output = subprocess.check_output(
+                [sys.executable, "-m", "benchmarks.bench_startup", "--child"], env=env, text=True
+            )
+            samples["process"].append(time.perf_counter() - started)
+            timings = json.loads(output.strip().splitlines()[-1])
+            for step in STEPS:
+                samples[step].append(timings[step])
+        profile = import_profile(env, args.profile) if args.profile else []
+
+    print(json.dumps({
+        "benchmark": "startup",
+        "samples": args.samples,
+        "median_ms": {step: round(statistics.median(values) * 1000, 1) for step, values in samples.items()},
+        "import_profile": profile,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Throughput of the service by number of gunicorn workers.
+
+Starts the fake registry, then for each worker count serves the app with
+gunicorn (``gunicorn.conf.py``, shared rate limit, disk cache and metrics in
+a temporary directory) and drives validate requests at it from several
+client processes, each keeping ``--concurrency`` requests in flight, for
+``--duration`` seconds. ``--keys`` distinct medical books are requested, so
+after the first lookups most requests are cache hits and the service itself
+is the bottleneck. Reports requests per second, latency percentiles and
+speedup over one worker as JSON.
+
+The clients share the machine with the service; give them enough cores
+(``--clients``) that they are not the bottleneck.
+
+Usage:
+    python -m benchmarks.bench_workers [--workers 1,2,4] [--duration 10]
+        [--clients 2] [--concurrency 32] [--keys 100]
+"""
+import argparse
+import asyncio
+import base64
+import contextlib
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import List, Tuple
+
+import httpx
+
+from app.server import available_cpus
+from benchmarks.load_test import SNILS, VALIDATE_PATH, free_port, percentiles_ms, running, wait_for
+
+
+async def drive(url: str, auth: str, duration: float, concurrency: int, keys: int, seed: int) -> Tuple[Counter, List[float]]:
+    rng = random.Random(seed)
+    statuses: Counter = Counter()
+    latencies: List[float] = []
+    deadline = time.perf_counter() + duration
+
+    async with httpx.AsyncClient(base_url=url, timeout=30.0, headers={"Authorization": auth}) as client:
+        async def worker():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(VALIDATE_PATH, json={
+                        "elmk_number": f"8601{rng.randrange(1, keys + 1):06d}25", "snils": SNILS
+                    })
+                    statuses[str(response.status_code)] += 1
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return statuses, latencies
+
+
+def client_process(args: tuple) -> Tuple[Counter, List[float]]:
+    return asyncio.run(drive(*args))
+
+
+def measure(url: str, auth: str, args) -> dict:
+    # Warm the cache so the timed run measures the service, not the registry
+    client_process((url, auth, 1.0, args.concurrency, args.keys, 0))
+
+    jobs = [(url, auth, args.duration, args.concurrency, args.keys, seed) for seed in range(1, args.clients + 1)]
+    with multiprocessing.Pool(args.clients) as pool:
+        outputs = pool.map(client_process, jobs)
+
+    statuses: Counter = Counter()
+    latencies: List[float] = []
+    for part_statuses, part_latencies in outputs:
+        statuses.update(part_statuses)
+        latencies.extend(part_latencies)
+    return {
+        "requests_per_second": round(len(latencies) / args.duration, 1),
+        "status": dict(sorted(statuses.items())),
+        "latency_ms": percentiles_ms(latencies),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    cpus = available_cpus()
+    default_workers = ",".join(str(n) for n in sorted({1, 2, 4, cpus}) if n <= max(1, cpus))
+    parser.add_argument("--workers", default=default_workers, help="Comma-separated worker counts")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--clients", type=int, default=2, help="Client processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight per client process")
+    parser.add_argument("--keys", type=int, default=100)
+    parser.add_argument("--latency-median", type=float, default=0.02)
+    parser.add_argument("--latency-p99", type=float, default=0.1)
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="securepassword123")
+    args = parser.parse_args()
+
+    auth = "Basic " + base64.b64encode(f"{args.username}:{args.password}".encode()).decode()
+    results = {}
+    with contextlib.ExitStack() as stack:
+        registry_port = free_port()
+        stack.enter_context(running([
+            sys.executable, "-m", "tests.fake_registry",
+            "--port", str(registry_port),
+            "--latency-median", str(args.latency_median),
+            "--latency-p99", str(args.latency_p99),
+        ]))
+        registry_url = f"http://127.0.0.1:{registry_port}/api/gov-services/elmks/public_elmk"
+        wait_for(registry_url)
+
+        for workers in [int(n) for n in args.workers.split(",")]:
+            with tempfile.TemporaryDirectory() as state_dir:
+                port = free_port()
+                env = {
+                    **os.environ,
+                    "WEB_CONCURRENCY": str(workers),
+                    "PORT": str(port),
+                    "HOST": "127.0.0.1",
+                    "EXTERNAL_API_URL": registry_url,
+                    "AUTH_USERNAME": args.username,
+                    "AUTH_PASSWORD": args.password,
+                    "RATE_LIMIT_REQUESTS": str(10 ** 9),
+                    "RATE_LIMIT_BACKEND": "mmap",
+                    "RATE_LIMIT_MMAP_PATH": os.path.join(state_dir, "rate_limit.mmap"),
+                    "REGISTRY_DISK_CACHE_ENABLED": "true",
+                    "REGISTRY_DISK_CACHE_PATH": os.path.join(state_dir, "registry_cache.sqlite3"),
+                    "JOBS_DB_PATH": os.path.join(state_dir, "jobs.sqlite3"),
+                    "PROMETHEUS_MULTIPROC_DIR": os.path.join(state_dir, "metrics"),
+                    "LOG_LEVEL": "WARNING",
+                }
+                with running([sys.executable, "-m", "gunicorn", "app.main:app"], env=env):
+                    url = f"http://127.0.0.1:{port}"
+                    wait_for(f"{url}/healthz")
+                    results[str(workers)] = measure(url, auth, args)
+
+    baseline = results.get("1", {}).get("requests_per_second")
+    if baseline:
+        for result in results.values():
+            result["speedup"] = round(result["requests_per_second"] / baseline, 2)
+
+    print(json.dumps({
+        "benchmark": "workers",
+        "cpus": cpus,
+        "duration_s": args.duration,
+        "clients": args.clients,
+        "concurrency": args.concurrency,
+        "keys": args.keys,
+        "workers": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
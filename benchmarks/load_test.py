@@ -0,0 +1,197 @@
+"""
+Open-loop load test of the validate endpoint against a fake registry.
+
+Starts the fake registry and the service under uvicorn as subprocesses, then
+sends POST /api/v1/medical-book/validate at a fixed rate for a fixed time,
+spreading requests over ``--keys`` distinct medical books so that the cache
+hit ratio can be tuned. Requests are sent on schedule whether or not earlier
+ones have finished, and latency is measured from the scheduled send time, so
+a stalled server shows up in the percentiles instead of slowing the load
+down. Reports throughput, status codes and p50/p95/p99 latency as JSON.
+
+Usage:
+    python -m benchmarks.load_test [--rps 200] [--duration 20] [--keys 1000]
+        [--latency-median 0.08] [--latency-p99 0.5] [--error-rate 0.0]
+        [--handshake-delay 0.0] [--tls] [--url http://127.0.0.1:8000]
+"""
+import argparse
+import asyncio
+import base64
+import contextlib
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Iterator, List, Optional
+
+import httpx
+
+VALIDATE_PATH = "/api/v1/medical-book/validate"
+# Valid SNILS with checksum; only the ELMK number varies between keys
+SNILS = "17648922116"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url: str, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, verify=False, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up in {timeout}s")
+
+
+@contextlib.contextmanager
+def running(command: List[str], env: Optional[dict] = None) -> Iterator[subprocess.Popen]:
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        yield process
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def percentiles_ms(samples: List[float]) -> dict:
+    if len(samples) < 2:
+        return {}
+    cuts = statistics.quantiles(samples, n=100)
+    return {
+        "p50": round(cuts[49] * 1000, 2),
+        "p95": round(cuts[94] * 1000, 2),
+        "p99": round(cuts[98] * 1000, 2),
+        "max": round(max(samples) * 1000, 2),
+    }
+
+
+async def generate_load(url: str, auth: str, rps: float, duration: float, keys: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    total = int(rps * duration)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    headers = {"Authorization": auth}
+
+    async with httpx.AsyncClient(
+        base_url=url,
+        timeout=60.0,
+        limits=httpx.Limits(max_connections=None, max_keepalive_connections=1000)
+    ) as client:
+        loop = asyncio.get_running_loop()
+
+        async def send(scheduled: float, elmk_number: str) -> None:
+            try:
+                response = await client.post(
+                    VALIDATE_PATH,
+                    json={"elmk_number": elmk_number, "snils": SNILS},
+                    headers=headers
+                )
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(loop.time() - scheduled)
+
+        tasks = []
+        started = loop.time()
+        for i in range(total):
+            scheduled = started + i / rps
+            delay = scheduled - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elmk_number = f"8601{rng.randrange(1, keys + 1):06d}25"
+            tasks.append(asyncio.ensure_future(send(scheduled, elmk_number)))
+        await asyncio.gather(*tasks)
+        elapsed = loop.time() - started
+
+    return {
+        "sent": total,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(total / elapsed, 1),
+        "status": dict(sorted(statuses.items())),
+        "latency_ms": percentiles_ms(latencies),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rps", type=float, default=200)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--latency-median", type=float, default=0.08)
+    parser.add_argument("--latency-p99", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--handshake-delay", type=float, default=0.0)
+    parser.add_argument("--tls", action="store_true")
+    parser.add_argument("--url", help="Load an already running service instead of starting one")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="securepassword123")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    auth = "Basic " + base64.b64encode(f"{args.username}:{args.password}".encode()).decode()
+    config = {
+        "rps": args.rps,
+        "duration_s": args.duration,
+        "keys": args.keys,
+    }
+
+    with contextlib.ExitStack() as stack:
+        url = args.url
+        if url is None:
+            registry_port = free_port()
+            stack.enter_context(running([
+                sys.executable, "-m", "tests.fake_registry",
+                "--port", str(registry_port),
+                "--latency-median", str(args.latency_median),
+                "--latency-p99", str(args.latency_p99),
+                "--error-rate", str(args.error_rate),
+                "--handshake-delay", str(args.handshake_delay),
+            ] + (["--tls"] if args.tls else [])))
+            scheme = "https" if args.tls else "http"
+            registry_url = f"{scheme}://127.0.0.1:{registry_port}/api/gov-services/elmks/public_elmk"
+            wait_for(registry_url)
+
+            port = free_port()
+            env = {
+                **os.environ,
+                "EXTERNAL_API_URL": registry_url,
+                "AUTH_USERNAME": args.username,
+                "AUTH_PASSWORD": args.password,
+                "RATE_LIMIT_REQUESTS": str(10 ** 9),
+            }
+            stack.enter_context(running([
+                sys.executable, "-m", "uvicorn", "app.main:app",
+                "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+            ], env=env))
+            url = f"http://127.0.0.1:{port}"
+            wait_for(f"{url}/healthz")
+            config.update({
+                "registry_latency_median_s": args.latency_median,
+                "registry_latency_p99_s": args.latency_p99,
+                "registry_error_rate": args.error_rate,
+                "registry_handshake_delay_s": args.handshake_delay,
+                "registry_tls": args.tls,
+            })
+
+        results = asyncio.run(
+            generate_load(url, auth, args.rps, args.duration, args.keys, args.seed)
+        )
+
+    print(json.dumps({"benchmark": "load", **config, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Run the benchmark suite and collect the results in one JSON document.
+
+Each benchmark runs in its own interpreter with its default parameters; the
+document records the git commit so runs can be kept side by side. With
+``--compare`` the numeric results are also diffed against an earlier run.
+
+Usage:
+    python -m benchmarks.run_all [--output results.json] [--load] [--compare baseline.json]
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from typing import Dict
+
+MICROBENCHMARKS = [
+    "bench_rate_limiter",
+    "bench_models",
+    "bench_json",
+    "bench_middleware",
+    "bench_logging",
+    "bench_disk_cache",
+    "bench_startup",
+]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(module: str) -> dict:
+    output = subprocess.check_output([sys.executable, "-m", f"benchmarks.{module}"], text=True)
+    return json.loads(output)
+
+
+def flatten(value, prefix: str = "") -> Dict[str, float]:
+    if isinstance(value, dict):
+        flat = {}
+        for key, item in value.items():
+            flat.update(flatten(item, f"{prefix}.{key}" if prefix else key))
+        return flat
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix: value}
+    return {}
+
+
+def compare(baseline: dict, current: dict) -> Dict[str, dict]:
+    before = flatten(baseline["results"])
+    after = flatten(current["results"])
+    changes = {}
+    for key in sorted(before.keys() & after.keys()):
+        if before[key] != after[key]:
+            changes[key] = {
+                "before": before[key],
+                "after": after[key],
+                "change_pct": round((after[key] - before[key]) / before[key] * 100, 1) if before[key] else None,
+            }
+    return changes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", help="Also write the results to this file")
+    parser.add_argument("--load", action="store_true", help="Include the load test")
+    parser.add_argument("--compare", help="Results of an earlier run to diff against")
+    args = parser.parse_args()
+
+    modules = MICROBENCHMARKS + (["load_test"] if args.load else [])
+    document = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": {module: run(module) for module in modules},
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            document["changes"] = compare(json.load(f), document)
+
+    text = json.dumps(document, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
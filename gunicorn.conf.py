@@ -0,0 +1,58 @@
+"""
+Gunicorn settings for serving the app with several worker processes.
+
+Picked up automatically when gunicorn runs from the project root:
+
+    gunicorn app.main:app
+
+Each worker is a uvicorn event loop; by default there is one per CPU the
+container may use (``WEB_CONCURRENCY`` overrides it). The app is imported
+once in the master and forked (``PRELOAD_APP``), so workers start fast and
+share its memory pages. With more than one worker, rate limits, the
+registry cache and metrics default to their shared implementations unless
+configured otherwise.
+
+``kill -HUP <master>`` starts fresh workers and then lets the old ones
+finish their requests within ``GRACEFUL_TIMEOUT`` seconds. With a preloaded
+app new code needs a new master: ``kill -USR2 <master>`` and, once it
+serves, ``kill -QUIT <old master>``.
+"""
+import os
+
+from app.server import default_workers
+
+workers = int(os.environ.get("WEB_CONCURRENCY") or 0) or default_workers()
+# The app splits outbound registry limits by this count
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+if workers > 1:
+    os.environ.setdefault("RATE_LIMIT_BACKEND", "mmap")
+    os.environ.setdefault("REGISTRY_DISK_CACHE_ENABLED", "true")
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/elmk-metrics")
+if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    # Must exist before the preloaded app creates its metrics
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '8000')}"
+preload_app = os.environ.get("PRELOAD_APP", "true").lower() == "true"
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.environ.get("WORKER_TIMEOUT", "60"))
+keepalive = 5
+
+
+def on_starting(server):
+    """Remove metric files left by earlier runs; their workers would be aggregated too."""
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        own = f"_{os.getpid()}.db"
+        for name in os.listdir(directory):
+            if name.endswith(".db") and not name.endswith(own):
+                os.remove(os.path.join(directory, name))
+
+
+def child_exit(server, worker):
+    """Drop live gauges of a worker that exited, also when it was killed."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
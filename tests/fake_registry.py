@@ -0,0 +1,242 @@
+"""Local stand-in for the Rospotrebnadzor ELMK registry used in tests and benchmarks.
+
+Run standalone for load tests:
+    python -m tests.fake_registry [--port 8100] [--latency-median 0.08] [--latency-p99 0.5]
+        [--error-rate 0.01] [--handshake-delay 0.2] [--tls]
+"""
+import argparse
+import asyncio
+import datetime
+import ipaddress
+import math
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Set, Tuple
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+REGISTRY_PATH = "/api/gov-services/elmks/public_elmk"
+
+SAMPLE_RECORD = {
+    "elmk_status_name": "Действует",
+    "elmk_number": "86-01-027970-25",
+    "first_name": "Хуснигул",
+    "last_name": "О***",
+    "middle_name": "Абдусатторовна",
+    "snils": "176***16",
+    "work_type": [
+        "Работы, при выполнении которых осуществляется контакт с пищевыми продуктами в процессе их производства, хранения, транспортировки и реализации"
+    ],
+    "decision_dt": "2025-07-11T07:52:57Z",
+    "med_opinions_dt": "2026-07-02",
+    "certification_dt": "2025-07-11",
+    "recertification_dt": "2026-07-11",
+    "fbuz_short_name": "ФБУЗ «ЦГиЭ в ХМАО-Югре»",
+    "created_fullname": "ЕПГУ"
+}
+
+
+def lognormal_latency(median: float, p99: float, rng: random.Random) -> Callable[[], float]:
+    """Latency sampler with the given median and 99th percentile, in seconds."""
+    sigma = math.log(p99 / median) / 2.326 if p99 > median else 0.0
+    return lambda: rng.lognormvariate(math.log(median), sigma)
+
+
+class FakeRegistry:
+    """Fake registry application with knobs for latency and failures.
+
+    ``delay``/``status_code``/``raw_body`` apply to every call, ``plan`` to
+    the next few. For load tests ``latency`` draws a delay per call,
+    ``error_rate`` of calls fail with ``error_status``, ``handshake_delay``
+    is added to the first request on every new connection to stand in for a
+    slow TLS handshake, and ``match_any`` answers any key with a record.
+    """
+
+    def __init__(self, seed: int = 0):
+        self.records: Dict[Tuple[str, str], dict] = {
+            ("86-01-027970-25", "17648922116"): SAMPLE_RECORD
+        }
+        self.rng = random.Random(seed)
+        self.in_flight: int = 0
+        self.app = FastAPI()
+        self.app.add_api_route(REGISTRY_PATH, self.lookup, methods=["GET"])
+        self.reset()
+
+    def reset(self) -> None:
+        """Restore default knobs and zero the counters; requests still running keep counting in ``in_flight``."""
+        self.delay: float = 0.0
+        self.status_code: Optional[int] = None
+        self.raw_body: Optional[str] = None
+        # (delay, status_code) for the next calls, overriding the knobs above
+        self.plan: Deque[Tuple[float, Optional[int]]] = deque()
+        self.latency: Optional[Callable[[], float]] = None
+        self.error_rate: float = 0.0
+        self.error_status: int = 503
+        self.handshake_delay: float = 0.0
+        self.match_any: bool = False
+        self._connections: Set[Tuple[str, int]] = set()
+        self.calls: int = 0
+        self.connections: int = 0
+        self.max_in_flight: int = 0
+
+    async def lookup(self, request: Request):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            client = request.scope.get("client")
+            if client is not None and tuple(client) not in self._connections:
+                self._connections.add(tuple(client))
+                self.connections += 1
+                if self.handshake_delay:
+                    await asyncio.sleep(self.handshake_delay)
+            return await self._respond(request)
+        finally:
+            self.in_flight -= 1
+
+    async def _respond(self, request: Request):
+        if self.plan:
+            delay, status_code = self.plan.popleft()
+        else:
+            delay = self.latency() if self.latency is not None else self.delay
+            status_code = self.status_code
+            if status_code is None and self.error_rate and self.rng.random() < self.error_rate:
+                status_code = self.error_status
+        if delay:
+            await asyncio.sleep(delay)
+        if self.raw_body is not None:
+            return Response(content=self.raw_body, media_type="application/json")
+        if status_code is not None:
+            return JSONResponse(status_code=status_code, content={"error": "injected"})
+
+        key = (request.query_params.get("elmk_number"), request.query_params.get("snils"))
+        record = self.records.get(key)
+        if record is None and self.match_any and all(key):
+            record = {**SAMPLE_RECORD, "elmk_number": key[0]}
+        if record is None:
+            return JSONResponse(status_code=404, content={"error": "not found"})
+        return record
+
+
+def self_signed_certificate(directory: str) -> Tuple[str, str]:
+    """Write a throwaway certificate for 127.0.0.1; returns (certfile, keyfile)."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "fake-registry")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(
+            x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]),
+            critical=False
+        )
+        .sign(key, hashes.SHA256())
+    )
+    certfile = os.path.join(directory, "registry.crt")
+    keyfile = os.path.join(directory, "registry.key")
+    with open(certfile, "wb") as f:
+        f.write(certificate.public_bytes(serialization.Encoding.PEM))
+    with open(keyfile, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        ))
+    return certfile, keyfile
+
+
+class FakeRegistryServer:
+    """Runs a ``FakeRegistry`` under uvicorn in a background thread.
+
+    With ``tls`` it serves HTTPS with a self-signed certificate, so clients
+    must not verify it.
+    """
+
+    def __init__(self, registry: Optional[FakeRegistry] = None, port: int = 0, tls: bool = False):
+        self.registry = registry or FakeRegistry()
+        self.tls = tls
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(("127.0.0.1", port))
+        self.port = self._socket.getsockname()[1]
+        ssl_options = {}
+        self._cert_dir: Optional[tempfile.TemporaryDirectory] = None
+        if tls:
+            self._cert_dir = tempfile.TemporaryDirectory()
+            certfile, keyfile = self_signed_certificate(self._cert_dir.name)
+            ssl_options = {"ssl_certfile": certfile, "ssl_keyfile": keyfile}
+        self._server = uvicorn.Server(
+            uvicorn.Config(self.registry.app, log_level="error", lifespan="off", **ssl_options)
+        )
+        self._thread = threading.Thread(
+            target=self._server.run, kwargs={"sockets": [self._socket]}, daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        scheme = "https" if self.tls else "http"
+        return f"{scheme}://127.0.0.1:{self.port}{REGISTRY_PATH}"
+
+    def __enter__(self) -> "FakeRegistryServer":
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Fake registry failed to start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
+        self._socket.close()
+        if self._cert_dir is not None:
+            self._cert_dir.cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake ELMK registry for load tests")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-median", type=float, default=0.08)
+    parser.add_argument("--latency-p99", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--handshake-delay", type=float, default=0.0)
+    parser.add_argument("--tls", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    registry = FakeRegistry(seed=args.seed)
+    registry.match_any = True
+    registry.error_rate = args.error_rate
+    registry.handshake_delay = args.handshake_delay
+    if args.latency_median > 0:
+        registry.latency = lognormal_latency(args.latency_median, args.latency_p99, registry.rng)
+
+    with FakeRegistryServer(registry, port=args.port, tls=args.tls) as server:
+        print(server.url, flush=True)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -170,5 +170,6 @@ class TestMetrics:
         """Test metrics endpoint."""
         response = client.get("/metrics")
         assert response.status_code == 200
-        data = response.json()
-        assert data["status"] == "metrics endpoint"
\ No newline at end of file
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "http_request_duration_seconds" in response.text
+        assert "registry_cache_lookups_total" in response.text
\ No newline at end of file
@@ -0,0 +1,154 @@
+import base64
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from passlib.context import CryptContext
+
+from app import auth
+from app.auth import VerifiedCredentialCache, credential_cache
+from app.config import settings
+from app.main import app
+from tests.conftest import FakeClock
+
+client = TestClient(app)
+
+
+def basic(username: str, password: str) -> dict:
+    token = base64.b64encode(f"{username}:{password}".encode()).decode()
+    return {"Authorization": f"Basic {token}"}
+
+
+@pytest.fixture(scope="module")
+def hashed_clients():
+    return {
+        "hr-bcrypt": CryptContext(schemes=["bcrypt"]).hash("bcrypt-secret"),
+        "hr-argon2": CryptContext(schemes=["argon2"]).hash("argon2-secret"),
+    }
+
+
+class TestVerifiedCredentialCache:
+    """Test cases for the verified credential cache."""
+
+    def test_ttl(self):
+        clock = FakeClock()
+        cache = VerifiedCredentialCache(max_entries=10, ttl=5, clock=clock)
+        cache.set("Basic abc", "user")
+
+        assert cache.get("Basic abc") == "user"
+        assert cache.get("Basic abd") is None
+        clock.now += 5
+        assert cache.get("Basic abc") is None
+
+    def test_bounded(self):
+        cache = VerifiedCredentialCache(max_entries=2, ttl=60)
+        for i in range(3):
+            cache.set(f"Basic {i}", "user")
+
+        assert len(cache) == 2
+        assert cache.get("Basic 0") is None
+
+    def test_concurrent_expiry_and_eviction(self):
+        # The clock is read between looking an entry up and removing it;
+        # sleeping there lets other threads expire or evict it meanwhile
+        def slow_clock():
+            time.sleep(0.0005)
+            return 1000.0
+
+        cache = VerifiedCredentialCache(max_entries=4, ttl=0, clock=slow_clock)
+        errors = []
+
+        def worker(seed):
+            try:
+                for i in range(50):
+                    cache.set(f"Basic {(seed + i) % 6}", "user")
+                    cache.get(f"Basic {(seed + i + 1) % 6}")
+                    cache.get(f"Basic {(seed + i) % 6}")
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert len(cache) <= 4
+
+    def test_keys_do_not_contain_credentials(self):
+        cache = VerifiedCredentialCache(max_entries=2, ttl=60)
+        cache.set("Basic secret", "user")
+        assert all(b"secret" not in key for key in cache._entries)
+
+
+class TestHashedClients:
+    """Test authentication of API clients with hashed secrets."""
+
+    @pytest.fixture(autouse=True)
+    def configure(self, monkeypatch, hashed_clients):
+        monkeypatch.setattr(settings, "auth_clients", hashed_clients)
+
+    @pytest.mark.parametrize("username,password", [
+        ("hr-bcrypt", "bcrypt-secret"),
+        ("hr-argon2", "argon2-secret"),
+    ])
+    def test_hashed_secret_accepted(self, username, password):
+        response = client.post(
+            "/api/v1/medical-book/validate",
+            json={"elmk_number": "1", "snils": "1"},
+            headers=basic(username, password)
+        )
+        # Authenticated requests reach body validation
+        assert response.status_code == 422
+
+    def test_wrong_secret_rejected(self):
+        response = client.post(
+            "/api/v1/medical-book/validate",
+            json={"elmk_number": "1", "snils": "1"},
+            headers=basic("hr-bcrypt", "wrong")
+        )
+        assert response.status_code == 401
+
+    def test_repeated_calls_skip_verification(self, monkeypatch):
+        calls = []
+        original = auth.verify_password
+
+        def counting_verify(plain, hashed):
+            calls.append(plain)
+            return original(plain, hashed)
+
+        monkeypatch.setattr(auth, "verify_password", counting_verify)
+        for _ in range(3):
+            response = client.post(
+                "/api/v1/medical-book/validate",
+                json={"elmk_number": "1", "snils": "1"},
+                headers=basic("hr-bcrypt", "bcrypt-secret")
+            )
+            assert response.status_code == 422
+
+        assert len(calls) == 1
+        assert len(credential_cache) == 1
+
+    def test_failures_not_cached(self):
+        for _ in range(2):
+            response = client.post(
+                "/api/v1/medical-book/validate",
+                json={"elmk_number": "1", "snils": "1"},
+                headers=basic("hr-bcrypt", "wrong")
+            )
+            assert response.status_code == 401
+        assert len(credential_cache) == 0
+
+
+class TestLazyPasslib:
+    def test_context_not_built_for_plaintext_auth(self, monkeypatch):
+        monkeypatch.setattr(auth, "_pwd_context", None)
+        response = client.post(
+            "/api/v1/medical-book/validate",
+            json={"elmk_number": "1", "snils": "1"},
+            headers=basic(settings.auth_username, settings.auth_password)
+        )
+        assert response.status_code == 422
+        assert auth._pwd_context is None
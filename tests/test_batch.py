@@ -0,0 +1,112 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.external_api import external_api_client
+from app.main import app
+from tests.conftest import AUTH_HEADERS
+
+BATCH_URL = "/api/v1/medical-book/validate/batch"
+
+
+@pytest.fixture
+def app_client(fake_registry_server, fake_registry, monkeypatch):
+    monkeypatch.setattr(external_api_client, "base_url", fake_registry_server.url)
+    with TestClient(app) as client:
+        yield client
+
+
+class TestBatchValidation:
+    """Test cases for the batch validation endpoint."""
+
+    def test_mixed_results(self, app_client, fake_registry):
+        """Test per-item results, deduplication and order preservation."""
+        response = app_client.post(
+            BATCH_URL,
+            json={"items": [
+                {"elmk_number": "860102797025", "snils": "17648922116"},
+                {"elmk_number": "860102797026", "snils": "17648922116"},
+                {"elmk_number": "860102797025", "snils": "17648922116"},
+            ]},
+            headers=AUTH_HEADERS
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 3
+        assert data["unique"] == 2
+        assert data["succeeded"] == 2
+        assert data["failed"] == 1
+        assert [item["index"] for item in data["results"]] == [0, 1, 2]
+        assert data["results"][0]["status_code"] == 200
+        assert data["results"][0]["result"]["elmk_number"] == "86-01-027970-25"
+        assert data["results"][1]["status_code"] == 404
+        assert data["results"][1]["error"] == "Medical book not found in registry"
+        assert data["results"][2]["status_code"] == 200
+        assert fake_registry.calls == 2
+
+    def test_upstream_errors_mapped_per_item(self, app_client, fake_registry):
+        fake_registry.status_code = 500
+        response = app_client.post(
+            BATCH_URL,
+            json={"items": [{"elmk_number": "860102797025", "snils": "17648922116"}]},
+            headers=AUTH_HEADERS
+        )
+
+        assert response.status_code == 200
+        assert response.json()["results"][0]["status_code"] == 502
+
+    def test_concurrency_is_capped(self, app_client, fake_registry, monkeypatch):
+        monkeypatch.setattr(settings, "batch_concurrency", 3)
+        fake_registry.delay = 0.05
+        items = [
+            {"elmk_number": f"8601027970{i:02d}", "snils": "17648922116"}
+            for i in range(12)
+        ]
+        response = app_client.post(BATCH_URL, json={"items": items}, headers=AUTH_HEADERS)
+
+        assert response.status_code == 200
+        assert fake_registry.calls == 12
+        assert fake_registry.max_in_flight <= 3
+
+    def test_too_many_items(self, app_client, fake_registry):
+        items = [{"elmk_number": "860102797025", "snils": "17648922116"}] * settings.batch_max_items
+        # Invalid items past the limit are not validated at all
+        items += [{"elmk_number": "1", "snils": "2"}] * 10
+        response = app_client.post(BATCH_URL, json={"items": items}, headers=AUTH_HEADERS)
+        assert response.status_code == 422
+        assert [error["type"] for error in response.json()["detail"]] == ["too_long"]
+        assert fake_registry.calls == 0
+
+    def test_body_too_large(self, app_client, fake_registry):
+        item = {"elmk_number": "860102797025", "snils": "17648922116"}
+        body = json.dumps({"items": [item] * 20000}).encode()
+        assert len(body) > settings.batch_max_body_bytes
+
+        response = app_client.post(
+            BATCH_URL, content=body, headers={**AUTH_HEADERS, "Content-Type": "application/json"}
+        )
+        assert response.status_code == 413
+
+        def chunks():
+            for start in range(0, len(body), 65536):
+                yield body[start:start + 65536]
+
+        response = app_client.post(
+            BATCH_URL, content=chunks(), headers={**AUTH_HEADERS, "Content-Type": "application/json"}
+        )
+        assert response.status_code == 413
+        assert fake_registry.calls == 0
+
+    def test_empty_batch(self, app_client):
+        response = app_client.post(BATCH_URL, json={"items": []}, headers=AUTH_HEADERS)
+        assert response.status_code == 422
+
+    def test_requires_auth(self, app_client):
+        response = app_client.post(
+            BATCH_URL,
+            json={"items": [{"elmk_number": "860102797025", "snils": "17648922116"}]}
+        )
+        assert response.status_code == 401
@@ -0,0 +1,249 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.cache import (
+    REVALIDATION_FAILED_WARNING,
+    STALE_WARNING,
+    CachedRegistryClient,
+    RegistryCache,
+    make_cache_key,
+)
+from app.coalescing import SingleFlight
+from app.config import settings
+from app.external_api import ExternalAPIClient, external_api_client
+from app.main import app
+from app.models import ExternalAPIResponse
+from app.resilience import CircuitOpenError
+from tests.conftest import AUTH_HEADERS
+from tests.fake_registry import SAMPLE_RECORD
+
+
+@pytest.fixture
+def record():
+    return ExternalAPIResponse(**SAMPLE_RECORD)
+
+
+class TestRegistryCache:
+    """Test cases for the in-memory registry cache."""
+
+    def test_make_cache_key_normalizes_formatting(self):
+        """Test that formatted and plain inputs share a key."""
+        assert make_cache_key("86-01-027970-25", "176-489-221 16") == make_cache_key(
+            "860102797025", "17648922116"
+        )
+
+    def test_hit_and_miss_counters(self, clock, record):
+        cache = RegistryCache(max_entries=10, ttl=60, negative_ttl=10, clock=clock)
+        key = ("860102797025", "17648922116")
+
+        assert cache.get(key) is None
+        cache.set(key, record)
+        clock.now += 5
+        entry = cache.get(key)
+
+        assert entry.value == record
+        assert cache.age(entry) == 5
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_positive_ttl_expiry(self, clock, record):
+        cache = RegistryCache(max_entries=10, ttl=60, negative_ttl=10, clock=clock)
+        cache.set(("a", "b"), record)
+        clock.now += 60
+        assert cache.get(("a", "b")) is None
+        assert len(cache) == 0
+
+    def test_negative_ttl_is_shorter(self, clock, record):
+        cache = RegistryCache(max_entries=10, ttl=60, negative_ttl=10, clock=clock)
+        cache.set(("found", "x"), record)
+        cache.set(("missing", "x"), None)
+        clock.now += 11
+
+        assert cache.get(("missing", "x")) is None
+        assert cache.get(("found", "x")).found
+
+    def test_lru_eviction(self, clock, record):
+        cache = RegistryCache(max_entries=2, ttl=60, negative_ttl=10, clock=clock)
+        cache.set(("1", "1"), record)
+        cache.set(("2", "2"), record)
+        cache.get(("1", "1"))
+        cache.set(("3", "3"), record)
+
+        assert cache.get(("2", "2")) is None
+        assert cache.get(("1", "1")) is not None
+        assert cache.stats()["evictions"] == 1
+
+
+class TestCachedRegistryClient:
+    """Test cases for the caching layer over the registry client."""
+
+    @pytest.mark.asyncio
+    async def test_second_lookup_served_from_cache(self, fake_registry_server, fake_registry, clock):
+        client = ExternalAPIClient(base_url=fake_registry_server.url, timeout=2)
+        cached = CachedRegistryClient(
+            client, RegistryCache(max_entries=10, ttl=60, negative_ttl=10, clock=clock)
+        )
+        try:
+            first = await cached.lookup("860102797025", "17648922116")
+            clock.now += 3
+            second = await cached.lookup("860102797025", "17648922116")
+        finally:
+            await client.close()
+
+        assert first.cache_status == "MISS"
+        assert second.cache_status == "HIT"
+        assert second.headers == {"X-Cache": "HIT", "Age": "3"}
+        assert fake_registry.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_not_found_is_negatively_cached(self, fake_registry_server, fake_registry, clock):
+        client = ExternalAPIClient(base_url=fake_registry_server.url, timeout=2)
+        cached = CachedRegistryClient(
+            client, RegistryCache(max_entries=10, ttl=60, negative_ttl=10, clock=clock)
+        )
+        try:
+            with pytest.raises(httpx.HTTPStatusError):
+                await cached.lookup("860102797026", "17648922116")
+            with pytest.raises(HTTPException) as exc_info:
+                await cached.lookup("860102797026", "17648922116")
+        finally:
+            await client.close()
+
+        assert exc_info.value.status_code == 404
+        assert exc_info.value.headers["X-Cache"] == "HIT"
+        assert fake_registry.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_errors_are_not_cached(self, fake_registry_server, fake_registry, clock, monkeypatch):
+        monkeypatch.setattr(settings, "registry_retries", 0)
+        client = ExternalAPIClient(base_url=fake_registry_server.url, timeout=2)
+        cached = CachedRegistryClient(
+            client, RegistryCache(max_entries=10, ttl=60, negative_ttl=10, clock=clock)
+        )
+        fake_registry.status_code = 500
+        try:
+            for _ in range(2):
+                with pytest.raises(httpx.HTTPStatusError):
+                    await cached.lookup("860102797025", "17648922116")
+        finally:
+            await client.close()
+
+        assert fake_registry.calls == 2
+
+
+@pytest_asyncio.fixture
+async def stale_client(fake_registry_server, fake_registry, clock):
+    """Caching client with a 60s TTL, 30s stale-while-revalidate and 300s stale-if-error."""
+    client = ExternalAPIClient(base_url=fake_registry_server.url, timeout=2)
+    cached = CachedRegistryClient(
+        client,
+        RegistryCache(max_entries=10, ttl=60, negative_ttl=10, clock=clock, stale_ttl=300),
+        single_flight=SingleFlight(),
+        stale_while_revalidate=30,
+        stale_if_error=300
+    )
+    yield cached
+    await cached.close()
+    await client.close()
+
+
+class TestStaleServing:
+    """Test cases for stale-while-revalidate and stale-if-error."""
+
+    @pytest.mark.asyncio
+    async def test_stale_served_while_revalidating(self, stale_client, fake_registry, clock):
+        await stale_client.lookup("860102797025", "17648922116")
+        clock.now += 70
+        fake_registry.delay = 0.1
+
+        started = time.perf_counter()
+        stale = await stale_client.lookup("860102797025", "17648922116")
+        assert time.perf_counter() - started < 0.05
+        assert stale.cache_status == "STALE"
+        assert stale.headers == {"X-Cache": "STALE", "Age": "70", "Warning": STALE_WARNING}
+
+        # Concurrent stale hits share one background refresh
+        await stale_client.lookup("860102797025", "17648922116")
+        await asyncio.gather(*stale_client._refreshes.values())
+        assert fake_registry.calls == 2
+
+        fresh = await stale_client.lookup("860102797025", "17648922116")
+        assert fresh.cache_status == "HIT"
+
+    @pytest.mark.asyncio
+    async def test_too_stale_for_revalidate_fetches(self, stale_client, fake_registry, clock):
+        await stale_client.lookup("860102797025", "17648922116")
+        clock.now += 100
+
+        result = await stale_client.lookup("860102797025", "17648922116")
+
+        assert result.cache_status == "MISS"
+        assert fake_registry.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_stale_if_error(self, stale_client, fake_registry, clock, monkeypatch):
+        monkeypatch.setattr(settings, "registry_retries", 0)
+        await stale_client.lookup("860102797025", "17648922116")
+        clock.now += 100
+        fake_registry.status_code = 503
+
+        result = await stale_client.lookup("860102797025", "17648922116")
+
+        assert result.cache_status == "STALE"
+        assert result.headers["Warning"] == REVALIDATION_FAILED_WARNING
+
+    @pytest.mark.asyncio
+    async def test_stale_if_error_with_open_breaker(self, stale_client, clock, monkeypatch):
+        await stale_client.lookup("860102797025", "17648922116")
+        clock.now += 100
+
+        async def circuit_open(**kwargs):
+            raise CircuitOpenError("registry", retry_after=10)
+
+        monkeypatch.setattr(stale_client.client, "get_medical_book_info", circuit_open)
+        result = await stale_client.lookup("860102797025", "17648922116")
+
+        assert result.cache_status == "STALE"
+
+    @pytest.mark.asyncio
+    async def test_not_found_is_not_masked_by_stale(self, stale_client, fake_registry, clock):
+        await stale_client.lookup("860102797025", "17648922116")
+        clock.now += 100
+        fake_registry.records.clear()
+        try:
+            with pytest.raises(httpx.HTTPStatusError):
+                await stale_client.lookup("860102797025", "17648922116")
+        finally:
+            fake_registry.records[("86-01-027970-25", "17648922116")] = SAMPLE_RECORD
+
+    @pytest.mark.asyncio
+    async def test_error_past_stale_window_is_raised(self, stale_client, fake_registry, clock, monkeypatch):
+        monkeypatch.setattr(settings, "registry_retries", 0)
+        await stale_client.lookup("860102797025", "17648922116")
+        clock.now += 400
+        fake_registry.status_code = 503
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await stale_client.lookup("860102797025", "17648922116")
+
+
+class TestCacheHeaders:
+    """Test cache headers on the validation endpoint."""
+
+    def test_x_cache_headers(self, fake_registry_server, fake_registry, monkeypatch):
+        monkeypatch.setattr(external_api_client, "base_url", fake_registry_server.url)
+        payload = {"elmk_number": "860102797025", "snils": "17648922116"}
+        with TestClient(app) as client:
+            first = client.post("/api/v1/medical-book/validate", json=payload, headers=AUTH_HEADERS)
+            second = client.post("/api/v1/medical-book/validate", json=payload, headers=AUTH_HEADERS)
+
+        assert first.headers["X-Cache"] == "MISS"
+        assert second.headers["X-Cache"] == "HIT"
+        assert "Age" in second.headers
+        assert fake_registry.calls == 1
@@ -0,0 +1,121 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.cache import CachedRegistryClient, RegistryCache
+from app.coalescing import SingleFlight
+from app.external_api import ExternalAPIClient
+
+
+class TestSingleFlight:
+    """Test cases for in-flight call coalescing."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_execution(self):
+        single_flight = SingleFlight()
+        calls = 0
+
+        async def fn():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return "result"
+
+        results = await asyncio.gather(*[single_flight.do("key", fn) for _ in range(10)])
+
+        assert results == ["result"] * 10
+        assert calls == 1
+        assert single_flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 9}
+
+    @pytest.mark.asyncio
+    async def test_error_fans_out_to_all_waiters(self):
+        single_flight = SingleFlight()
+
+        async def fn():
+            await asyncio.sleep(0.05)
+            raise httpx.TimeoutException("timed out")
+
+        results = await asyncio.gather(
+            *[single_flight.do("key", fn) for _ in range(5)], return_exceptions=True
+        )
+
+        assert all(isinstance(r, httpx.TimeoutException) for r in results)
+        assert single_flight.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_leader_does_not_cancel_waiters(self):
+        single_flight = SingleFlight()
+
+        async def fn():
+            await asyncio.sleep(0.05)
+            return "result"
+
+        leader = asyncio.ensure_future(single_flight.do("key", fn))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(single_flight.do("key", fn))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await follower == "result"
+        assert leader.cancelled()
+
+    @pytest.mark.asyncio
+    async def test_new_call_after_completion(self):
+        single_flight = SingleFlight()
+        calls = 0
+
+        async def fn():
+            nonlocal calls
+            calls += 1
+            return calls
+
+        assert await single_flight.do("key", fn) == 1
+        assert await single_flight.do("key", fn) == 2
+
+
+class TestCoalescedRegistryLookups:
+    """Test coalescing of concurrent registry lookups."""
+
+    @pytest.mark.asyncio
+    async def test_identical_lookups_hit_registry_once(self, fake_registry_server, fake_registry):
+        fake_registry.delay = 0.2
+        client = ExternalAPIClient(base_url=fake_registry_server.url, timeout=2)
+        cached = CachedRegistryClient(
+            client,
+            RegistryCache(max_entries=10, ttl=60, negative_ttl=10),
+            enabled=False,
+            single_flight=SingleFlight()
+        )
+        try:
+            results = await asyncio.gather(*[
+                cached.lookup("860102797025", "17648922116") for _ in range(20)
+            ])
+        finally:
+            await client.close()
+
+        assert len(results) == 20
+        assert fake_registry.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_not_found_fans_out(self, fake_registry_server, fake_registry):
+        fake_registry.delay = 0.1
+        client = ExternalAPIClient(base_url=fake_registry_server.url, timeout=2)
+        cached = CachedRegistryClient(
+            client,
+            RegistryCache(max_entries=10, ttl=60, negative_ttl=10),
+            single_flight=SingleFlight()
+        )
+        try:
+            results = await asyncio.gather(
+                *[cached.lookup("860102797026", "17648922116") for _ in range(5)],
+                return_exceptions=True
+            )
+        finally:
+            await client.close()
+
+        assert all(
+            isinstance(r, httpx.HTTPStatusError) and r.response.status_code == 404
+            for r in results
+        )
+        assert fake_registry.calls == 1
@@ -0,0 +1,164 @@
+import multiprocessing
+
+import pytest
+
+from app.cache import CachedRegistryClient, RegistryCache
+from app.disk_cache import DiskCache
+from app.external_api import ExternalAPIClient
+from app.models import ExternalAPIResponse
+from tests.conftest import FakeClock
+from tests.fake_registry import SAMPLE_RECORD
+
+KEY = ("860102797025", "17648922116")
+
+
+@pytest.fixture
+def record():
+    return ExternalAPIResponse(**SAMPLE_RECORD)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock(1_700_000_000.0)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "cache" / "registry.sqlite3")
+
+
+@pytest.fixture
+def disk(db_path, clock):
+    cache = DiskCache(db_path, clock=clock)
+    yield cache
+    cache.close()
+
+
+def write_keys(path: str, worker: int, count: int) -> None:
+    cache = DiskCache(path, evict_every=10)
+    record = ExternalAPIResponse(**SAMPLE_RECORD)
+    for i in range(count):
+        cache.set((f"{worker:02d}{i:010d}", "17648922116"), record, retain=60)
+    cache.close()
+
+
+class TestDiskCache:
+    """Test cases for the SQLite cache tier."""
+
+    def test_round_trip(self, disk, record, clock):
+        disk.set(KEY, record, retain=60)
+        clock.now += 5
+        entry = disk.get(KEY)
+
+        assert entry.value == record
+        assert entry.age == 5
+
+    def test_not_found_entry(self, disk):
+        disk.set(KEY, None, retain=60)
+        entry = disk.get(KEY)
+
+        assert entry is not None
+        assert entry.value is None
+
+    def test_expiry(self, disk, record, clock):
+        disk.set(KEY, record, retain=60)
+        clock.now += 60
+        assert disk.get(KEY) is None
+
+    def test_uses_wal(self, disk):
+        mode = disk._connection().execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
+
+    def test_eviction_by_size_and_expiry(self, db_path, record, clock):
+        disk = DiskCache(db_path, max_entries=3, evict_every=1000, clock=clock)
+        try:
+            disk.set(("expired", "0"), record, retain=1)
+            for i in range(5):
+                clock.now += 1
+                disk.set((str(i), "0"), record, retain=60)
+
+            assert disk.evict() == 3
+            assert len(disk) == 3
+            assert disk.get(("0", "0")) is None
+            assert disk.get(("4", "0")) is not None
+        finally:
+            disk.close()
+
+    def test_survives_restart(self, db_path, record):
+        first = DiskCache(db_path)
+        first.set(KEY, record, retain=60)
+        first.close()
+
+        second = DiskCache(db_path)
+        try:
+            assert second.get(KEY).value == record
+        finally:
+            second.close()
+
+    def test_concurrent_writers(self, db_path):
+        DiskCache(db_path).close()
+        ctx = multiprocessing.get_context("fork")
+        workers = [ctx.Process(target=write_keys, args=(db_path, w, 100)) for w in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=30)
+
+        assert all(worker.exitcode == 0 for worker in workers)
+        disk = DiskCache(db_path)
+        try:
+            assert len(disk) == 400
+        finally:
+            disk.close()
+
+    @pytest.mark.asyncio
+    async def test_async_access(self, disk, record):
+        await disk.aset(KEY, record, retain=60)
+        entry = await disk.aget(KEY)
+        assert entry.value == record
+
+
+class TestDiskTier:
+    """Test cases for the disk tier behind the in-memory cache."""
+
+    @pytest.mark.asyncio
+    async def test_new_worker_is_served_from_disk(self, fake_registry_server, fake_registry, db_path):
+        client = ExternalAPIClient(base_url=fake_registry_server.url, timeout=2)
+        disk = DiskCache(db_path)
+        try:
+            first = CachedRegistryClient(
+                client, RegistryCache(max_entries=10, ttl=60, negative_ttl=10), disk=disk
+            )
+            await first.lookup(*KEY)
+
+            # Empty memory tier, as in another worker or after a restart
+            second = CachedRegistryClient(
+                client, RegistryCache(max_entries=10, ttl=60, negative_ttl=10), disk=disk
+            )
+            result = await second.lookup(*KEY)
+            again = await second.lookup(*KEY)
+        finally:
+            disk.close()
+            await client.close()
+
+        assert result.cache_status == "HIT"
+        assert again.cache_status == "HIT"
+        assert fake_registry.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_expired_disk_entry_is_refetched(self, fake_registry_server, fake_registry, db_path, record):
+        client = ExternalAPIClient(base_url=fake_registry_server.url, timeout=2)
+        disk = DiskCache(db_path)
+        try:
+            disk.set(KEY, record, retain=600)
+            disk._connection().execute("UPDATE registry_cache SET stored_at = stored_at - 120")
+            cached = CachedRegistryClient(
+                client, RegistryCache(max_entries=10, ttl=60, negative_ttl=10), disk=disk
+            )
+            result = await cached.lookup(*KEY)
+        finally:
+            disk.close()
+            await client.close()
+
+        assert result.cache_status == "MISS"
+        assert fake_registry.calls == 1
@@ -0,0 +1,185 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.external_api import ExternalAPIClient, external_api_client, format_elmk_number
+from app.main import app
+from tests.conftest import AUTH_HEADERS
+from tests.fake_registry import SAMPLE_RECORD, FakeRegistry, FakeRegistryServer
+
+
+@pytest_asyncio.fixture
+async def registry_client(fake_registry_server, fake_registry):
+    """ExternalAPIClient pointed at the local fake registry."""
+    client = ExternalAPIClient(base_url=fake_registry_server.url, timeout=2)
+    await client.start()
+    yield client
+    await client.close()
+
+
+class TestExternalAPIClient:
+    """Test cases for the pooled registry client."""
+
+    def test_format_elmk_number(self):
+        """Test ELMK number formatting for the registry."""
+        assert format_elmk_number("860102797025") == "86-01-027970-25"
+
+    @pytest.mark.asyncio
+    async def test_success(self, registry_client):
+        """Test successful lookup against the fake registry."""
+        result = await registry_client.get_medical_book_info("860102797025", "17648922116")
+        assert result.elmk_number == "86-01-027970-25"
+        assert result.elmk_status_name == "Действует"
+
+    @pytest.mark.asyncio
+    async def test_not_found_raises_status_error(self, registry_client):
+        """Test that registry 404 surfaces as httpx.HTTPStatusError."""
+        with pytest.raises(httpx.HTTPStatusError) as exc_info:
+            await registry_client.get_medical_book_info("860102797026", "17648922116")
+        assert exc_info.value.response.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_server_error_raises_status_error(self, registry_client, fake_registry):
+        """Test that registry 5xx surfaces as httpx.HTTPStatusError."""
+        fake_registry.status_code = 500
+        with pytest.raises(httpx.HTTPStatusError) as exc_info:
+            await registry_client.get_medical_book_info("860102797025", "17648922116")
+        assert exc_info.value.response.status_code == 500
+
+    @pytest.mark.asyncio
+    async def test_invalid_json(self, registry_client, fake_registry):
+        """Test that malformed registry payload maps to 502."""
+        fake_registry.raw_body = "<html>maintenance</html>"
+        with pytest.raises(HTTPException) as exc_info:
+            await registry_client.get_medical_book_info("860102797025", "17648922116")
+        assert exc_info.value.status_code == 502
+
+    @pytest.mark.asyncio
+    async def test_payload_of_wrong_shape(self, registry_client, fake_registry):
+        """Test that JSON not matching the record schema maps to 502."""
+        fake_registry.raw_body = '[{"elmk_number": "86-01-027970-25"}]'
+        with pytest.raises(HTTPException) as exc_info:
+            await registry_client.get_medical_book_info("860102797025", "17648922116")
+        assert exc_info.value.status_code == 502
+
+    @pytest.mark.asyncio
+    async def test_timeout(self, fake_registry_server, fake_registry):
+        """Test that slow registry raises httpx.TimeoutException."""
+        fake_registry.delay = 0.5
+        client = ExternalAPIClient(base_url=fake_registry_server.url, timeout=0.1)
+        try:
+            with pytest.raises(httpx.TimeoutException):
+                await client.get_medical_book_info("860102797025", "17648922116")
+        finally:
+            await client.close()
+
+    @pytest.mark.asyncio
+    async def test_connect_error(self):
+        """Test that unreachable registry raises httpx.ConnectError."""
+        client = ExternalAPIClient(base_url="http://127.0.0.1:1/registry", timeout=1)
+        try:
+            with pytest.raises(httpx.ConnectError):
+                await client.get_medical_book_info("860102797025", "17648922116")
+        finally:
+            await client.close()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_lookups_do_not_serialize(self, registry_client, fake_registry):
+        """Test that concurrent lookups overlap instead of running one by one."""
+        fake_registry.delay = 0.2
+        started = time.perf_counter()
+        results = await asyncio.gather(*[
+            registry_client.get_medical_book_info("860102797025", "17648922116")
+            for _ in range(50)
+        ])
+        elapsed = time.perf_counter() - started
+
+        assert len(results) == 50
+        assert fake_registry.calls == 50
+        assert elapsed < 2.0
+
+
+class TestSlowTLSRegistry:
+    """Test cases for the client against a registry with slow TLS handshakes."""
+
+    @pytest.mark.asyncio
+    async def test_handshake_is_paid_once_per_connection(self):
+        registry = FakeRegistry()
+        registry.handshake_delay = 0.2
+        with FakeRegistryServer(registry, tls=True) as server:
+            client = ExternalAPIClient(base_url=server.url, timeout=2)
+            try:
+                await client.get_medical_book_info("860102797025", "17648922116")
+                started = time.perf_counter()
+                for _ in range(5):
+                    await client.get_medical_book_info("860102797025", "17648922116")
+                elapsed = time.perf_counter() - started
+            finally:
+                await client.close()
+
+        assert registry.connections == 1
+        assert elapsed < 0.2
+
+
+class TestValidateAgainstFakeRegistry:
+    """End-to-end validation through the app and the fake registry."""
+
+    @pytest.fixture
+    def app_client(self, fake_registry_server, fake_registry, monkeypatch):
+        monkeypatch.setattr(external_api_client, "base_url", fake_registry_server.url)
+        with TestClient(app) as client:
+            yield client
+
+    def test_success(self, app_client):
+        response = app_client.post(
+            "/api/v1/medical-book/validate",
+            json={"elmk_number": "860102797025", "snils": "17648922116"},
+            headers=AUTH_HEADERS
+        )
+        assert response.status_code == 200
+        assert response.json() == SAMPLE_RECORD
+        assert response.headers["content-type"] == "application/json"
+        assert response.headers["X-Cache"] == "MISS"
+
+    def test_not_found(self, app_client):
+        response = app_client.post(
+            "/api/v1/medical-book/validate",
+            json={"elmk_number": "860102797026", "snils": "17648922116"},
+            headers=AUTH_HEADERS
+        )
+        assert response.status_code == 404
+
+    def test_upstream_error(self, app_client, fake_registry):
+        fake_registry.status_code = 503
+        response = app_client.post(
+            "/api/v1/medical-book/validate",
+            json={"elmk_number": "860102797025", "snils": "17648922116"},
+            headers=AUTH_HEADERS
+        )
+        assert response.status_code == 502
+
+    def test_formatted_input_shares_cache_entry(self, app_client, fake_registry):
+        for payload in (
+            {"elmk_number": "860102797025", "snils": "17648922116"},
+            {"elmk_number": "86-01-027970-25", "snils": "176-489-221 16"},
+        ):
+            response = app_client.post(
+                "/api/v1/medical-book/validate", json=payload, headers=AUTH_HEADERS
+            )
+            assert response.status_code == 200
+        assert response.headers["X-Cache"] == "HIT"
+        assert fake_registry.calls == 1
+
+    def test_bad_snils_checksum_is_rejected_locally(self, app_client, fake_registry):
+        response = app_client.post(
+            "/api/v1/medical-book/validate",
+            json={"elmk_number": "860102797025", "snils": "17648922117"},
+            headers=AUTH_HEADERS
+        )
+        assert response.status_code == 422
+        assert fake_registry.calls == 0
@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.external_api import ExternalAPIClient, external_api_client
+from app.governor import (
+    BATCH,
+    INTERACTIVE,
+    PREFETCH,
+    OutboundGovernor,
+    QueueWaitExceeded,
+    call_priority,
+    registry_priority,
+)
+from app.main import app
+from tests.conftest import AUTH_HEADERS
+
+
+class TestOutboundGovernor:
+    """Test cases for the outbound concurrency and rate governor."""
+
+    @pytest.mark.asyncio
+    async def test_concurrency_cap(self):
+        governor = OutboundGovernor(max_concurrency=2)
+        running = peak = 0
+
+        async def call():
+            nonlocal running, peak
+            async with governor.slot():
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(call() for _ in range(10)))
+        assert peak == 2
+        assert governor.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_rate_limit(self):
+        governor = OutboundGovernor(max_concurrency=100, rate=50, burst=1)
+        loop = asyncio.get_running_loop()
+
+        async def call():
+            async with governor.slot():
+                pass
+
+        started = loop.time()
+        await asyncio.gather(*(call() for _ in range(6)))
+        # First token is available at once, the other five come 20ms apart
+        assert loop.time() - started >= 0.09
+
+    @pytest.mark.asyncio
+    async def test_priority_order(self):
+        governor = OutboundGovernor(max_concurrency=1)
+        order = []
+
+        async def call(name, priority):
+            async with governor.slot(priority):
+                order.append(name)
+
+        await governor.acquire()
+        tasks = [
+            asyncio.ensure_future(call("prefetch", PREFETCH)),
+            asyncio.ensure_future(call("batch", BATCH)),
+            asyncio.ensure_future(call("interactive", INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        governor.release()
+        await asyncio.gather(*tasks)
+
+        assert order == ["interactive", "batch", "prefetch"]
+
+    @pytest.mark.asyncio
+    async def test_queue_wait_is_bounded(self):
+        governor = OutboundGovernor(max_concurrency=1, max_queue_wait=0.05)
+        await governor.acquire()
+
+        with pytest.raises(QueueWaitExceeded):
+            await governor.acquire()
+        assert governor.queued == 0
+
+        governor.release()
+        await governor.acquire()
+        assert governor.in_flight == 1
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_gives_up_its_place(self):
+        governor = OutboundGovernor(max_concurrency=1)
+        await governor.acquire()
+        waiter = asyncio.ensure_future(governor.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        governor.release()
+        assert governor.in_flight == 0
+        assert governor.queued == 0
+
+    @pytest.mark.asyncio
+    async def test_priority_is_inherited_by_tasks(self):
+        async def current():
+            return registry_priority.get()
+
+        with call_priority(BATCH):
+            assert await asyncio.ensure_future(current()) == BATCH
+        assert registry_priority.get() == INTERACTIVE
+
+
+class TestGovernedClient:
+    """Test cases for the governor wired into the registry client."""
+
+    @pytest.mark.asyncio
+    async def test_calls_are_capped(self, fake_registry_server, fake_registry):
+        fake_registry.delay = 0.05
+        client = ExternalAPIClient(
+            base_url=fake_registry_server.url, timeout=2, governor=OutboundGovernor(max_concurrency=2)
+        )
+        try:
+            await asyncio.gather(*(
+                client.get_medical_book_info("860102797025", "17648922116") for _ in range(6)
+            ))
+        finally:
+            await client.close()
+
+        assert fake_registry.calls == 6
+        assert fake_registry.max_in_flight == 2
+
+    def test_queue_timeout_returns_503(self, monkeypatch):
+        async def shed(*args, **kwargs):
+            raise QueueWaitExceeded(5.0, retry_after=5.0)
+
+        monkeypatch.setattr(external_api_client.governor, "acquire", shed)
+        client = TestClient(app)
+        response = client.post(
+            "/api/v1/medical-book/validate",
+            json={"elmk_number": "860102797025", "snils": "17648922116"},
+            headers=AUTH_HEADERS
+        )
+
+        assert response.status_code == 503
+        assert response.json()["detail"] == "External API request queue is full"
+        assert response.headers["Retry-After"] == "5"
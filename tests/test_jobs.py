@@ -0,0 +1,402 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import job_manager
+from app.config import settings
+from app.external_api import external_api_client
+from app.jobs import (
+    COMPLETED,
+    DELIVERED,
+    FAILED,
+    JobManager,
+    JobStore,
+    webhook_address,
+    webhook_signature,
+)
+from app.main import app
+from app.models import BatchItemResult, MedicalBookRequest
+from tests.conftest import AUTH_HEADERS, FakeClock
+
+JOBS_URL = "/api/v1/jobs"
+
+
+class FakeResolver:
+    """Answers every host with ``addresses``, which a test may change."""
+
+    def __init__(self, *addresses):
+        self.addresses = list(addresses)
+        self.hosts = []
+
+    async def __call__(self, host):
+        self.hosts.append(host)
+        return self.addresses
+
+
+class FakeValidate:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, item, owner, index):
+        self.calls.append(index)
+        return BatchItemResult(
+            index=index,
+            elmk_number=item.elmk_number,
+            snils=item.snils,
+            status_code=200 if index % 2 == 0 else 404
+        )
+
+
+def make_items(count):
+    return [
+        MedicalBookRequest.model_construct(elmk_number=f"8601{i:06d}25", snils="17648922116")
+        for i in range(count)
+    ]
+
+
+async def wait_until(manager, job_id, done):
+    for _ in range(300):
+        job = await manager.get(job_id)
+        if done(job):
+            break
+        await asyncio.sleep(0.01)
+    return job
+
+
+@pytest.fixture
+def clock():
+    return FakeClock(1_700_000_000.0)
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    store = JobStore(str(tmp_path / "jobs" / "jobs.sqlite3"), clock=clock)
+    yield store
+    store.close()
+
+
+class TestJobStore:
+    """Test cases for job persistence."""
+
+    def test_results_survive_reopen(self, store):
+        job = store.create("admin", make_items(3), None, lease=60)
+        store.save_results(job.id, [
+            BatchItemResult(index=1, status_code=200),
+        ], lease=60)
+        store.close()
+
+        assert [row[0] for row in store.pending(job.id)] == [0, 2]
+        saved = store.get(job.id)
+        assert (saved.status, saved.completed, saved.succeeded) == ("running", 1, 1)
+        assert [result.index for result in store.results(job.id, 0, 10)] == [1]
+
+    def test_results_page_by_index(self, store):
+        job = store.create("admin", make_items(5), None, lease=60)
+        store.save_results(job.id, [BatchItemResult(index=i, status_code=200) for i in range(5)], lease=60)
+        assert [result.index for result in store.results(job.id, 2, 2)] == [2, 3]
+
+    def test_expired_leases_are_claimed_once(self, store, clock):
+        job = store.create("admin", make_items(1), None, lease=60)
+        assert store.claim_expired(lease=60) == []
+        clock.now += 61
+        assert store.claim_expired(lease=60) == [job.id]
+        assert store.claim_expired(lease=60) == []
+
+    def test_released_jobs_are_claimed_at_once(self, store):
+        job = store.create("admin", make_items(1), None, lease=60)
+        store.release([job.id])
+        assert store.claim_expired(lease=60) == [job.id]
+
+    def test_finished_jobs_are_not_claimed(self, store, clock):
+        job = store.create("admin", make_items(1), None, lease=60)
+        store.finish(job.id)
+        clock.now += 61
+        assert store.claim_expired(lease=60) == []
+
+    def test_pending_webhook_is_claimed(self, store, clock):
+        job = store.create("admin", make_items(1), "http://hr.example/hook", lease=60)
+        store.finish(job.id)
+        clock.now += 61
+        assert store.claim_expired(lease=60) == [job.id]
+
+    def test_purge(self, store, clock):
+        old = store.create("admin", make_items(2), None, lease=60)
+        store.finish(old.id)
+        clock.now += 100
+        running = store.create("admin", make_items(2), None, lease=60)
+
+        assert store.purge(finished_before=clock.now - 50) == 1
+        assert store.get(old.id) is None
+        assert store.pending(old.id) == []
+        assert store.get(running.id) is not None
+
+
+class TestJobManager:
+    """Test cases for background job processing."""
+
+    @pytest.mark.asyncio
+    async def test_job_runs_to_completion(self, store):
+        validate = FakeValidate()
+        manager = JobManager(store, validate, chunk_size=2)
+        await manager.start()
+        try:
+            job = await manager.submit("admin", make_items(5))
+            job = await wait_until(manager, job.id, lambda job: job.status == COMPLETED)
+        finally:
+            await manager.stop()
+
+        assert job.status == COMPLETED
+        assert (job.completed, job.succeeded) == (5, 3)
+        assert sorted(validate.calls) == [0, 1, 2, 3, 4]
+
+    @pytest.mark.asyncio
+    async def test_webhook_client_is_built_on_first_delivery(self, store):
+        manager = JobManager(store, FakeValidate())
+        await manager.start()
+        try:
+            job = await manager.submit("admin", make_items(1))
+            await wait_until(manager, job.id, lambda job: job.status == COMPLETED)
+            assert manager._webhook_client is None
+        finally:
+            await manager.stop()
+
+    @pytest.mark.asyncio
+    async def test_resume_skips_finished_items(self, store):
+        job = store.create("admin", make_items(4), None, lease=60)
+        store.save_results(job.id, [BatchItemResult(index=i, status_code=200) for i in (0, 1)], lease=60)
+
+        validate = FakeValidate()
+        manager = JobManager(store, validate)
+        await manager.run_job(job.id)
+
+        assert validate.calls == [2, 3]
+        finished = store.get(job.id)
+        assert (finished.status, finished.completed) == (COMPLETED, 4)
+
+    @pytest.mark.asyncio
+    async def test_stopped_job_is_resumed_on_start(self, store):
+        class BlockingValidate(FakeValidate):
+            async def __call__(self, item, owner, index):
+                if index >= 2:
+                    await asyncio.sleep(60)
+                return await super().__call__(item, owner, index)
+
+        first = JobManager(store, BlockingValidate(), chunk_size=2)
+        await first.start()
+        job = await first.submit("admin", make_items(4))
+        await wait_until(first, job.id, lambda job: job.completed == 2)
+        await first.stop()
+
+        validate = FakeValidate()
+        second = JobManager(store, validate)
+        await second.start()
+        try:
+            await wait_until(second, job.id, lambda job: job.status == COMPLETED)
+        finally:
+            await second.stop()
+
+        assert validate.calls == [2, 3]
+        assert store.get(job.id).completed == 4
+
+    @pytest.mark.asyncio
+    async def test_webhook_is_signed_and_retried(self, store):
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(503 if len(requests) == 1 else 200)
+
+        manager = JobManager(
+            store, FakeValidate(), webhook_backoff_base=0.01, webhook_secret="s3cret",
+            webhook_transport=httpx.MockTransport(handler), webhook_resolve=FakeResolver("93.184.216.34")
+        )
+        await manager.start()
+        try:
+            job = await manager.submit("admin", make_items(2), "http://hr.example/hook")
+            await wait_until(manager, job.id, lambda job: job.webhook_status == DELIVERED)
+        finally:
+            await manager.stop()
+
+        assert len(requests) == 2
+        # Sent to the checked address under the original host name
+        assert requests[-1].url == "http://93.184.216.34/hook"
+        assert requests[-1].headers["Host"] == "hr.example"
+        assert requests[-1].extensions["sni_hostname"] == "hr.example"
+        body = json.loads(requests[-1].content)
+        assert body["job_id"] == job.id
+        assert body["status"] == COMPLETED
+        assert (body["total"], body["succeeded"], body["failed"]) == (2, 1, 1)
+        assert "results" not in body
+        assert requests[-1].headers["X-Signature"] == webhook_signature("s3cret", requests[-1].content)
+        assert store.get(job.id).webhook_status == DELIVERED
+
+    @pytest.mark.asyncio
+    async def test_webhook_gives_up(self, store):
+        manager = JobManager(
+            store, FakeValidate(), webhook_retries=1, webhook_backoff_base=0.01,
+            webhook_transport=httpx.MockTransport(lambda request: httpx.Response(500)),
+            webhook_resolve=FakeResolver("93.184.216.34")
+        )
+        await manager.start()
+        try:
+            job = await manager.submit("admin", make_items(1), "http://hr.example/hook")
+            await wait_until(manager, job.id, lambda job: job.webhook_status == FAILED)
+        finally:
+            await manager.stop()
+
+        assert store.get(job.id).webhook_status == FAILED
+
+
+class TestWebhookUrl:
+    """Test cases for the webhook URL check."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("url", [
+        "http://127.0.0.1:8080/hook",
+        "http://localhost/hook",
+        "http://169.254.169.254/latest/meta-data/",
+        "http://10.0.0.5/hook",
+        "http://[::1]/hook",
+        "http://[::ffff:192.168.0.1]/hook",
+    ])
+    async def test_non_public_addresses_are_rejected(self, url):
+        address, error = await webhook_address(url)
+        assert address is None
+        assert error is not None
+
+    @pytest.mark.asyncio
+    async def test_public_address_is_allowed(self):
+        assert await webhook_address("https://93.184.216.34/hook") == ("93.184.216.34", None)
+        resolve = FakeResolver("93.184.216.34")
+        assert await webhook_address("https://hooks.example.com/job", resolve=resolve) == ("93.184.216.34", None)
+
+    @pytest.mark.asyncio
+    async def test_name_with_any_private_address_is_rejected(self):
+        resolve = FakeResolver("93.184.216.34", "10.0.0.5")
+        assert (await webhook_address("https://hooks.example.com/job", resolve=resolve))[1] is not None
+
+    @pytest.mark.asyncio
+    async def test_allowed_hosts(self):
+        allowed = ["Hooks.Example.com"]
+        assert await webhook_address("https://hooks.example.com/job", allowed) == (None, None)
+        assert (await webhook_address("https://93.184.216.34/hook", allowed))[1] is not None
+
+    @pytest.mark.asyncio
+    async def test_host_rebound_after_submit_is_not_called(self, store):
+        requests = []
+        resolve = FakeResolver("93.184.216.34")
+        manager = JobManager(
+            store, FakeValidate(), webhook_retries=1, webhook_backoff_base=0.01,
+            webhook_transport=httpx.MockTransport(lambda request: requests.append(request) or httpx.Response(200)),
+            webhook_resolve=resolve
+        )
+        assert await manager.webhook_url_error("https://hooks.example.com/job") is None
+
+        resolve.addresses = ["127.0.0.1"]
+        await manager.start()
+        try:
+            job = await manager.submit("admin", make_items(1), "https://hooks.example.com/job")
+            job = await wait_until(manager, job.id, lambda job: job.webhook_status == FAILED)
+        finally:
+            await manager.stop()
+        assert requests == []
+        assert resolve.hosts == ["hooks.example.com"] * 3
+
+
+@pytest.fixture
+def app_client(fake_registry_server, fake_registry, monkeypatch):
+    monkeypatch.setattr(external_api_client, "base_url", fake_registry_server.url)
+    with TestClient(app) as client:
+        yield client
+
+
+def wait_for_job(client, location, **params):
+    deadline = time.monotonic() + 10
+    while True:
+        response = client.get(location, params=params, headers=AUTH_HEADERS)
+        if response.json()["status"] == COMPLETED or time.monotonic() > deadline:
+            return response
+        time.sleep(0.02)
+
+
+class TestJobsAPI:
+    """Test cases for the validation jobs endpoints."""
+
+    def test_submit_and_poll(self, app_client, fake_registry):
+        response = app_client.post(
+            JOBS_URL,
+            json={"items": [
+                {"elmk_number": "860102797025", "snils": "17648922116"},
+                {"elmk_number": "860102797026", "snils": "17648922116"},
+                {"elmk_number": "86-01-027970-25", "snils": "176-489-221 16"},
+            ]},
+            headers=AUTH_HEADERS
+        )
+        assert response.status_code == 202
+        submitted = response.json()
+        assert submitted["total"] == 3
+        assert response.headers["location"] == f"{JOBS_URL}/{submitted['job_id']}"
+
+        data = wait_for_job(app_client, response.headers["location"]).json()
+        assert data["status"] == COMPLETED
+        assert (data["completed"], data["succeeded"], data["failed"]) == (3, 2, 1)
+        assert [item["status_code"] for item in data["results"]] == [200, 404, 200]
+        assert data["results"][0]["result"]["elmk_number"] == "86-01-027970-25"
+        assert data["next_offset"] is None
+        assert fake_registry.calls == 2
+
+    def test_results_are_paged(self, app_client):
+        items = [{"elmk_number": "860102797025", "snils": "17648922116"}] * 5
+        response = app_client.post(JOBS_URL, json={"items": items}, headers=AUTH_HEADERS)
+        location = response.headers["location"]
+        wait_for_job(app_client, location)
+
+        page = app_client.get(location, params={"offset": 2, "limit": 2}, headers=AUTH_HEADERS).json()
+        assert [item["index"] for item in page["results"]] == [2, 3]
+        assert page["next_offset"] == 4
+        last = app_client.get(location, params={"offset": 4, "limit": 2}, headers=AUTH_HEADERS).json()
+        assert last["next_offset"] is None
+
+    def test_unknown_job(self, app_client):
+        response = app_client.get(f"{JOBS_URL}/nope", headers=AUTH_HEADERS)
+        assert response.status_code == 404
+
+    def test_requires_auth(self, app_client):
+        response = app_client.post(JOBS_URL, json={"items": []})
+        assert response.status_code == 401
+
+    def test_invalid_items_are_rejected(self, app_client):
+        response = app_client.post(
+            JOBS_URL,
+            json={"items": [{"elmk_number": "860102797025", "snils": "17648922117"}]},
+            headers=AUTH_HEADERS
+        )
+        assert response.status_code == 422
+
+    def test_job_too_large(self, app_client, monkeypatch):
+        monkeypatch.setattr(settings, "jobs_max_items", 1)
+        items = [{"elmk_number": "860102797025", "snils": "17648922116"}] * 2
+        response = app_client.post(JOBS_URL, json={"items": items}, headers=AUTH_HEADERS)
+        assert response.status_code == 422
+
+    @pytest.mark.parametrize("webhook_url", ["http://169.254.169.254/latest/meta-data/", "http://127.0.0.1:9/hook"])
+    def test_non_public_webhook_is_rejected(self, app_client, webhook_url):
+        items = [{"elmk_number": "860102797025", "snils": "17648922116"}]
+        response = app_client.post(
+            JOBS_URL, json={"items": items, "webhook_url": webhook_url}, headers=AUTH_HEADERS
+        )
+        assert response.status_code == 422
+        assert "not a public address" in response.json()["detail"]
+
+    def test_webhook_host_not_in_allowlist_is_rejected(self, app_client, monkeypatch):
+        monkeypatch.setattr(job_manager, "webhook_allowed_hosts", ["hooks.example.com"])
+        items = [{"elmk_number": "860102797025", "snils": "17648922116"}]
+        response = app_client.post(
+            JOBS_URL, json={"items": items, "webhook_url": "https://evil.example.com/hook"}, headers=AUTH_HEADERS
+        )
+        assert response.status_code == 422
+        assert "not allowed" in response.json()["detail"]
@@ -0,0 +1,135 @@
+import io
+import json
+import time
+
+import pytest
+import structlog
+
+from app.log_pipeline import LevelSampler, QueueLogWriter, configure_logging
+
+
+@pytest.fixture(autouse=True)
+def restore_structlog():
+    """Keep the logging configuration of one test from leaking into others."""
+    config = structlog.get_config()
+    yield
+    structlog.configure(**config)
+
+
+def lines(stream: io.BytesIO):
+    return stream.getvalue().decode().splitlines()
+
+
+class TestQueueLogWriter:
+    """Test cases for the background log writer."""
+
+    def test_writes_inline_until_started(self):
+        stream = io.BytesIO()
+        writer = QueueLogWriter(stream)
+        writer.enqueue(b"one")
+        writer.enqueue("two")
+        assert lines(stream) == ["one", "two"]
+
+    def test_lines_are_written_in_order_by_the_thread(self):
+        stream = io.BytesIO()
+        writer = QueueLogWriter(stream, flush_interval=0.01)
+        writer.start()
+        try:
+            for i in range(100):
+                writer.enqueue(str(i).encode())
+            deadline = time.monotonic() + 2
+            while len(lines(stream)) < 100 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            writer.stop()
+        assert lines(stream) == [str(i) for i in range(100)]
+
+    def test_stop_flushes_queued_lines(self):
+        stream = io.BytesIO()
+        writer = QueueLogWriter(stream, flush_interval=60)
+        writer.start()
+        writer.enqueue(b"last words")
+        writer.stop()
+        assert lines(stream) == ["last words"]
+
+    def test_lines_are_written_in_batches(self):
+        class CountingStream(io.BytesIO):
+            writes = 0
+
+            def write(self, data):
+                self.writes += 1
+                return super().write(data)
+
+        stream = CountingStream()
+        writer = QueueLogWriter(stream, max_batch=10, flush_interval=60)
+        writer.start()
+        for i in range(25):
+            writer.enqueue(b"x")
+        writer.stop()
+        assert len(lines(stream)) == 25
+        assert stream.writes == 3
+
+    def test_overflow_is_dropped_and_counted(self):
+        stream = io.BytesIO()
+        writer = QueueLogWriter(stream, max_queue=5, flush_interval=60)
+        writer.start()
+        for i in range(8):
+            writer.enqueue(str(i).encode())
+        writer.stop()
+        assert lines(stream) == ["0", "1", "2", "3", "4"]
+        assert writer.dropped == 3
+
+    def test_closed_stream_is_counted(self):
+        stream = io.BytesIO()
+        stream.close()
+        writer = QueueLogWriter(stream)
+        writer.enqueue(b"lost")
+        assert writer.dropped == 1
+
+
+class TestLevelSampler:
+    """Test cases for per-level log sampling."""
+
+    def test_keeps_share_of_listed_levels(self):
+        draws = iter([0.05, 0.5, 0.95])
+        sampler = LevelSampler({"INFO": 0.1}, random=lambda: next(draws))
+        assert sampler(None, "info", {"event": "a"}) == {"event": "a"}
+        for _ in range(2):
+            with pytest.raises(structlog.DropEvent):
+                sampler(None, "info", {"event": "b"})
+
+    def test_other_levels_are_kept(self):
+        sampler = LevelSampler({"info": 0.0}, random=lambda: 0.99)
+        assert sampler(None, "warning", {"event": "a"}) == {"event": "a"}
+
+
+class TestConfigureLogging:
+    """Test cases for the structlog configuration."""
+
+    def test_events_are_rendered_as_json(self):
+        stream = io.BytesIO()
+        configure_logging(QueueLogWriter(stream), level="INFO")
+        structlog.get_logger().info("Something happened", count=3)
+
+        event = json.loads(lines(stream)[0])
+        assert event["event"] == "Something happened"
+        assert event["count"] == 3
+        assert event["level"] == "info"
+        assert event["logger"] == __name__
+        assert "timestamp" in event
+
+    def test_events_below_level_are_discarded(self):
+        stream = io.BytesIO()
+        configure_logging(QueueLogWriter(stream), level="WARNING")
+        logger = structlog.get_logger()
+        logger.info("Hidden")
+        logger.warning("Shown")
+        assert [json.loads(line)["event"] for line in lines(stream)] == ["Shown"]
+
+    def test_sampling(self):
+        stream = io.BytesIO()
+        configure_logging(QueueLogWriter(stream), sample_rates={"info": 0.0})
+        logger = structlog.get_logger()
+        logger.info("Sampled out")
+        logger.error("Kept")
+        assert [json.loads(line)["event"] for line in lines(stream)] == ["Kept"]
@@ -0,0 +1,94 @@
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.cache import RegistryCache
+from app.config import settings
+from app.external_api import ExternalAPIClient
+from app.main import app
+from app.models import ExternalAPIResponse
+from tests.fake_registry import SAMPLE_RECORD
+
+
+def sample(name, **labels):
+    """Current value of a metric sample, 0 if it was never recorded."""
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest_asyncio.fixture
+async def registry_client(fake_registry_server, fake_registry):
+    client = ExternalAPIClient(base_url=fake_registry_server.url, timeout=2)
+    await client.start()
+    yield client
+    await client.close()
+
+
+class TestRegistryMetrics:
+    """Test cases for registry request metrics."""
+
+    @pytest.mark.asyncio
+    async def test_success_outcome(self, registry_client):
+        before = sample("registry_request_duration_seconds_count", outcome="ok")
+        await registry_client.get_medical_book_info("860102797025", "17648922116")
+        assert sample("registry_request_duration_seconds_count", outcome="ok") == before + 1
+        assert sample("registry_requests_in_flight") == 0
+
+    @pytest.mark.asyncio
+    async def test_not_found_outcome(self, registry_client):
+        before = sample("registry_request_duration_seconds_count", outcome="not_found")
+        with pytest.raises(httpx.HTTPStatusError):
+            await registry_client.get_medical_book_info("860102797026", "17648922116")
+        assert sample("registry_request_duration_seconds_count", outcome="not_found") == before + 1
+
+    @pytest.mark.asyncio
+    async def test_server_error_outcome(self, registry_client, fake_registry, monkeypatch):
+        monkeypatch.setattr(settings, "registry_retries", 0)
+        fake_registry.status_code = 500
+        before = sample("registry_request_duration_seconds_count", outcome="http_error")
+        with pytest.raises(httpx.HTTPStatusError):
+            await registry_client.get_medical_book_info("860102797025", "17648922116")
+        assert sample("registry_request_duration_seconds_count", outcome="http_error") == before + 1
+
+
+class TestCacheMetrics:
+    """Test cases for registry cache metrics."""
+
+    def test_lookups_and_evictions(self):
+        cache = RegistryCache(max_entries=1, ttl=60, negative_ttl=10)
+        record = ExternalAPIResponse(**SAMPLE_RECORD)
+        hits = sample("registry_cache_lookups_total", result="hit")
+        misses = sample("registry_cache_lookups_total", result="miss")
+        evictions = sample("registry_cache_evictions_total")
+
+        cache.get(("1", "1"))
+        cache.set(("1", "1"), record)
+        cache.get(("1", "1"))
+        cache.set(("2", "2"), record)
+
+        assert sample("registry_cache_lookups_total", result="hit") == hits + 1
+        assert sample("registry_cache_lookups_total", result="miss") == misses + 1
+        assert sample("registry_cache_evictions_total") == evictions + 1
+
+
+class TestRequestMetrics:
+    """Test cases for HTTP request metrics."""
+
+    def test_latency_labelled_by_route(self):
+        client = TestClient(app)
+        labels = {"method": "GET", "route": "/healthz", "status": "200"}
+        before = sample("http_request_duration_seconds_count", **labels)
+
+        client.get("/healthz")
+
+        assert sample("http_request_duration_seconds_count", **labels) == before + 1
+
+    def test_unmatched_route_label(self):
+        client = TestClient(app)
+        labels = {"method": "GET", "route": "unmatched", "status": "404"}
+        before = sample("http_request_duration_seconds_count", **labels)
+
+        client.get("/no/such/path/12345")
+
+        assert sample("http_request_duration_seconds_count", **labels) == before + 1
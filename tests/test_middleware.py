@@ -0,0 +1,174 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.loop_monitor import LoopLagMonitor
+from app.middleware import (
+    AdmissionControlMiddleware,
+    ErrorHandlingMiddleware,
+    LoggingMiddleware,
+    RateLimitMiddleware,
+)
+
+
+def make_app(max_requests: int = 100) -> FastAPI:
+    """Small app with the service middleware stack in the production order."""
+    test_app = FastAPI()
+
+    @test_app.get("/ok")
+    async def ok():
+        return {"status": "ok"}
+
+    @test_app.get("/readyz")
+    async def readyz():
+        return {"status": "ready"}
+
+    @test_app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    @test_app.get("/stream")
+    async def stream():
+        async def chunks():
+            for i in range(3):
+                yield f"{i}\n"
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    test_app.add_middleware(ErrorHandlingMiddleware)
+    test_app.add_middleware(RateLimitMiddleware, max_requests=max_requests, window_seconds=60)
+    test_app.add_middleware(LoggingMiddleware)
+    return test_app
+
+
+class TestMiddlewareStack:
+    """Test cases for the ASGI middleware stack."""
+
+    def test_rate_limit_headers_on_allowed_response(self):
+        client = TestClient(make_app())
+        response = client.get("/ok")
+
+        assert response.status_code == 200
+        assert response.json() == {"status": "ok"}
+        assert response.headers["RateLimit-Limit"] == "100"
+
+    def test_rate_limit_rejection_body(self):
+        client = TestClient(make_app(max_requests=1))
+        client.get("/ok")
+        response = client.get("/ok")
+
+        assert response.status_code == 429
+        assert response.json() == {
+            "error": "Rate limit exceeded",
+            "detail": "Too many requests. Limit: 1 per 60 seconds"
+        }
+        assert "Retry-After" in response.headers
+
+    def test_health_checks_are_not_rate_limited(self):
+        client = TestClient(make_app(max_requests=1))
+        for _ in range(3):
+            response = client.get("/readyz")
+            assert response.status_code == 200
+            assert "RateLimit-Limit" not in response.headers
+
+        # Probes did not use up the client's allowance
+        assert client.get("/ok").status_code == 200
+        assert client.get("/ok").status_code == 429
+
+    def test_unhandled_exception_body(self):
+        client = TestClient(make_app(), raise_server_exceptions=False)
+        response = client.get("/boom")
+
+        assert response.status_code == 500
+        assert response.json() == {
+            "error": "Internal server error",
+            "detail": "An unexpected error occurred"
+        }
+
+    def test_streaming_response_passes_through(self):
+        client = TestClient(make_app())
+        response = client.get("/stream")
+
+        assert response.status_code == 200
+        assert response.text == "0\n1\n2\n"
+        assert response.headers["RateLimit-Limit"] == "100"
+
+
+def make_admission_app(monitor: LoopLagMonitor, **kwargs) -> AdmissionControlMiddleware:
+    inner = FastAPI()
+
+    @inner.get("/ok")
+    async def ok():
+        return {"status": "ok"}
+
+    @inner.get("/healthz")
+    async def healthz():
+        return {"status": "healthy"}
+
+    return AdmissionControlMiddleware(inner, monitor=monitor, **kwargs)
+
+
+class TestAdmissionControl:
+    """Test cases for load shedding on event loop lag and in-flight requests."""
+
+    def test_admits_when_healthy(self):
+        client = TestClient(make_admission_app(LoopLagMonitor(), max_loop_lag=0.5))
+        assert client.get("/ok").status_code == 200
+
+    def test_rejects_on_loop_lag(self):
+        monitor = LoopLagMonitor()
+        monitor.observe(1.0)
+        client = TestClient(make_admission_app(monitor, max_loop_lag=0.5, retry_after=2))
+        response = client.get("/ok")
+
+        assert response.status_code == 503
+        assert response.json()["error"] == "Service overloaded"
+        assert response.headers["Retry-After"] == "2"
+
+    def test_rejects_when_too_many_in_flight(self):
+        app = make_admission_app(LoopLagMonitor(), max_in_flight=2)
+        app.in_flight = 2
+        response = TestClient(app).get("/ok")
+
+        assert response.status_code == 503
+        assert app.in_flight == 2
+
+    def test_health_check_is_exempt(self):
+        monitor = LoopLagMonitor()
+        monitor.observe(1.0)
+        client = TestClient(make_admission_app(monitor, max_loop_lag=0.5))
+        assert client.get("/healthz").status_code == 200
+
+    def test_in_flight_is_released(self):
+        app = make_admission_app(LoopLagMonitor(), max_in_flight=1)
+        client = TestClient(app)
+        assert client.get("/ok").status_code == 200
+        assert client.get("/ok").status_code == 200
+        assert app.in_flight == 0
+
+
+class TestLoopLagMonitor:
+    """Test cases for event loop lag measurement."""
+
+    def test_lag_decays(self):
+        monitor = LoopLagMonitor()
+        monitor.observe(0.8)
+        monitor.observe(0.0)
+        assert monitor.lag == 0.4
+        monitor.observe(0.6)
+        assert monitor.lag == 0.6
+
+    @pytest.mark.asyncio
+    async def test_detects_blocked_loop(self):
+        monitor = LoopLagMonitor(interval=0.01)
+        monitor.start()
+        try:
+            await asyncio.sleep(0.02)
+            time.sleep(0.2)
+            await asyncio.sleep(0.02)
+            assert monitor.lag >= 0.1
+        finally:
+            await monitor.stop()
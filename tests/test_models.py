@@ -1,7 +1,7 @@
 import pytest
 from pydantic import ValidationError
 
-from app.models import MedicalBookRequest
+from app.models import MedicalBookRequest, snils_check_digits
 
 
 class TestMedicalBookRequest:
@@ -11,17 +11,17 @@ class TestMedicalBookRequest:
         """Test valid ELMK and SNILS numbers."""
         request = MedicalBookRequest(
             elmk_number="123456789012",
-            snils="12345678901"
+            snils="17648922116"
         )
         assert request.elmk_number == "123456789012"
-        assert request.snils == "12345678901"
+        assert request.snils == "17648922116"
     
     def test_invalid_elmk_too_short(self):
         """Test ELMK number that is too short."""
         with pytest.raises(ValidationError) as exc_info:
             MedicalBookRequest(
                 elmk_number="12345678901",  # 11 digits
-                snils="12345678901"
+                snils="17648922116"
             )
         assert "ELMK number must be exactly 12 digits" in str(exc_info.value)
     
@@ -30,7 +30,7 @@ class TestMedicalBookRequest:
         with pytest.raises(ValidationError) as exc_info:
             MedicalBookRequest(
                 elmk_number="1234567890123",  # 13 digits
-                snils="12345678901"
+                snils="17648922116"
             )
         assert "ELMK number must be exactly 12 digits" in str(exc_info.value)
     
@@ -39,7 +39,7 @@ class TestMedicalBookRequest:
         with pytest.raises(ValidationError) as exc_info:
             MedicalBookRequest(
                 elmk_number="12345678901a",
-                snils="12345678901"
+                snils="17648922116"
             )
         assert "ELMK number must be exactly 12 digits" in str(exc_info.value)
     
@@ -71,19 +71,70 @@ class TestMedicalBookRequest:
         assert "SNILS must be exactly 11 digits" in str(exc_info.value)
     
     def test_edge_cases(self):
-        """Test edge cases with all zeros and all nines."""
-        # All zeros
+        """Test edge cases with all nines and the lowest SNILS numbers."""
+        # All nines: region 99 exists
         request1 = MedicalBookRequest(
-            elmk_number="000000000000",
-            snils="00000000000"
+            elmk_number="999999999999",
+            snils="00100199800"
         )
-        assert request1.elmk_number == "000000000000"
-        assert request1.snils == "00000000000"
+        assert request1.elmk_number == "999999999999"
+        # Numbers up to 001-001-998 have no check digits
+        assert request1.snils == "00100199800"
         
-        # All nines
         request2 = MedicalBookRequest(
-            elmk_number="999999999999",
-            snils="99999999999"
+            elmk_number="010100000125",
+            snils="00000000000"
+        )
+        assert request2.snils == "00000000000"
+    
+    def test_formatted_input_is_normalized(self):
+        """Test that dashes and spaces are accepted and removed."""
+        request = MedicalBookRequest(
+            elmk_number="86-01-027970-25",
+            snils="176-489-221 16"
         )
-        assert request2.elmk_number == "999999999999"
-        assert request2.snils == "99999999999"
\ No newline at end of file
+        assert request.elmk_number == "860102797025"
+        assert request.snils == "17648922116"
+    
+    def test_non_ascii_digits_are_rejected(self):
+        """Test that digits from other scripts do not pass as digits."""
+        with pytest.raises(ValidationError) as exc_info:
+            MedicalBookRequest(
+                elmk_number="٨٦٠١٠٢٧٩٧٠٢٥",
+                snils="17648922116"
+            )
+        assert "ELMK number must be exactly 12 digits" in str(exc_info.value)
+    
+    def test_snils_check_digits(self):
+        """Test the SNILS check digit calculation."""
+        assert snils_check_digits("176489221") == 16
+        # Weighted sums of 100 and 101 give 00
+        assert snils_check_digits("001326679") == 0
+        assert snils_check_digits("001508816") == 0
+    
+    def test_invalid_snils_checksum(self):
+        """Test SNILS with wrong check digits."""
+        with pytest.raises(ValidationError) as exc_info:
+            MedicalBookRequest(
+                elmk_number="860102797025",
+                snils="17648922117"
+            )
+        assert "SNILS check digits do not match" in str(exc_info.value)
+    
+    def test_invalid_elmk_region(self):
+        """Test ELMK number with zero region code."""
+        with pytest.raises(ValidationError) as exc_info:
+            MedicalBookRequest(
+                elmk_number="000102797025",
+                snils="17648922116"
+            )
+        assert "invalid region code" in str(exc_info.value)
+    
+    def test_invalid_elmk_serial(self):
+        """Test ELMK number with zero serial number."""
+        with pytest.raises(ValidationError) as exc_info:
+            MedicalBookRequest(
+                elmk_number="860100000025",
+                snils="17648922116"
+            )
+        assert "invalid serial number" in str(exc_info.value)
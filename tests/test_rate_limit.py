@@ -0,0 +1,260 @@
+import asyncio
+import multiprocessing
+import time
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.rate_limit import (
+    MmapRateLimitBackend,
+    RedisRateLimitBackend,
+    SlidingWindowCounterRateLimiter,
+    TokenBucketRateLimiter,
+    create_rate_limit_backend,
+    create_rate_limiter,
+)
+
+
+def _hit_from_worker(path, hits, results):
+    """Worker process body: hit a shared mmap limiter and report allowed count."""
+    backend = MmapRateLimitBackend("sliding_window", 100, 3600, path, slots=64)
+    results.put(sum(asyncio.run(backend.hit("shared")).allowed for _ in range(hits)))
+
+
+def _hold_group_lock(path, client_id, locked, seconds):
+    """Worker process body: hold the group lock of client_id for a while."""
+    import fcntl
+    import time
+
+    backend = MmapRateLimitBackend("token_bucket", 10, 3600, path, slots=64)
+    group_offset = backend.HEADER.size + (backend.key_hash(client_id) % backend.groups) * backend._group_size
+    fcntl.lockf(backend._fd, fcntl.LOCK_EX, backend._group_size, group_offset)
+    locked.set()
+    time.sleep(seconds)
+
+
+class TestTokenBucketRateLimiter:
+    """Test cases for the token bucket engine."""
+
+    def test_burst_then_refill(self, clock):
+        limiter = TokenBucketRateLimiter(5, 10, clock=clock)
+
+        decisions = [limiter.hit("client") for _ in range(6)]
+        assert [d.allowed for d in decisions] == [True] * 5 + [False]
+        assert decisions[4].remaining == 0
+        assert decisions[5].retry_after == pytest.approx(2.0)
+
+        clock.now += 2
+        assert limiter.hit("client").allowed
+        assert not limiter.hit("client").allowed
+
+    def test_clients_are_independent(self, clock):
+        limiter = TokenBucketRateLimiter(1, 10, clock=clock)
+        assert limiter.is_allowed("a")
+        assert limiter.is_allowed("b")
+        assert not limiter.is_allowed("a")
+
+    def test_idle_clients_evicted(self, clock):
+        limiter = TokenBucketRateLimiter(5, 10, cleanup_interval=1, clock=clock)
+        limiter.hit("idle")
+        clock.now += 5
+        limiter.hit("active")
+        clock.now += 6
+        limiter.hit("active")
+
+        assert "idle" not in limiter.state
+        assert len(limiter) == 1
+
+
+class TestSlidingWindowCounterRateLimiter:
+    """Test cases for the sliding window counter engine."""
+
+    def test_limit_within_window(self, clock):
+        clock.now = 1000.0  # start of a 10s window
+        limiter = SlidingWindowCounterRateLimiter(3, 10, clock=clock)
+
+        assert [limiter.is_allowed("client") for _ in range(4)] == [True, True, True, False]
+
+    def test_previous_window_is_weighted(self, clock):
+        clock.now = 1000.0
+        limiter = SlidingWindowCounterRateLimiter(4, 10, clock=clock)
+        for _ in range(4):
+            limiter.hit("client")
+
+        # Halfway into the next window, half of the previous count remains.
+        clock.now = 1015.0
+        assert limiter.hit("client").allowed
+        assert limiter.hit("client").allowed
+        decision = limiter.hit("client")
+        assert not decision.allowed
+        assert decision.retry_after == pytest.approx(2.5)
+
+        clock.now += decision.retry_after
+        assert limiter.hit("client").allowed
+
+    def test_denied_in_full_window_retry_after(self, clock):
+        clock.now = 1002.0
+        limiter = SlidingWindowCounterRateLimiter(2, 10, clock=clock)
+        limiter.hit("client")
+        limiter.hit("client")
+        decision = limiter.hit("client")
+
+        assert not decision.allowed
+        # 8s to the window end, then half of the next window until 2 * w <= 1.
+        assert decision.retry_after == pytest.approx(13.0)
+        assert decision.headers(10)["Retry-After"] == "13"
+
+    def test_idle_clients_evicted(self, clock):
+        limiter = SlidingWindowCounterRateLimiter(5, 10, cleanup_interval=1, clock=clock)
+        limiter.hit("idle")
+        clock.now += 25
+        limiter.hit("active")
+
+        assert "idle" not in limiter.state
+
+
+class TestCreateRateLimiter:
+    def test_unknown_algorithm(self):
+        with pytest.raises(ValueError):
+            create_rate_limiter("leaky", 1, 1)
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            create_rate_limit_backend("memcached", "token_bucket", 1, 1)
+
+
+class TestMmapRateLimitBackend:
+    """Test cases for the shared-memory backend."""
+
+    @pytest.mark.parametrize("algorithm", ["token_bucket", "sliding_window"])
+    def test_state_shared_between_instances(self, tmp_path, algorithm):
+        path = str(tmp_path / "rl")
+        first = MmapRateLimitBackend(algorithm, 3, 3600, path, slots=64)
+        second = MmapRateLimitBackend(algorithm, 3, 3600, path, slots=64)
+        now = 36000.0
+
+        decisions = [
+            backend.hit_at("client", now)
+            for backend in (first, second, first, second)
+        ]
+
+        assert [d.allowed for d in decisions] == [True, True, True, False]
+        assert first.hit_at("other", now).allowed
+
+    def test_layout_change_resets_table(self, tmp_path):
+        path = str(tmp_path / "rl")
+        MmapRateLimitBackend("token_bucket", 1, 3600, path, slots=64).hit_at("client", 0.0)
+        backend = MmapRateLimitBackend("token_bucket", 1, 3600, path, slots=128)
+        assert backend.hit_at("client", 0.0).allowed
+
+    def test_full_group_reuses_stalest_slot(self, tmp_path):
+        backend = MmapRateLimitBackend("token_bucket", 1, 3600, str(tmp_path / "rl"), slots=8)
+        for i in range(8):
+            backend.hit_at(f"client-{i}", 100.0 + i)
+        assert backend.hit_at("newcomer", 200.0).allowed
+        assert not backend.hit_at("client-7", 200.0).allowed
+
+    def test_limit_enforced_across_processes(self, tmp_path):
+        path = str(tmp_path / "rl")
+        MmapRateLimitBackend("sliding_window", 100, 3600, path, slots=64)
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        workers = [
+            context.Process(target=_hit_from_worker, args=(path, 50, results))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=30)
+
+        assert sum(results.get(timeout=5) for _ in workers) == 100
+
+    @pytest.mark.asyncio
+    async def test_held_lock_does_not_block_event_loop(self, tmp_path):
+        path = str(tmp_path / "rl")
+        backend = MmapRateLimitBackend("token_bucket", 10, 3600, path, slots=64)
+        context = multiprocessing.get_context("fork")
+        locked = context.Event()
+        holder = context.Process(target=_hold_group_lock, args=(path, "client", locked, 0.3))
+        holder.start()
+        try:
+            assert locked.wait(timeout=10)
+            assert backend.hit_at("client", time.time(), blocking=False) is None
+
+            ticks = 0
+
+            async def tick():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.01)
+
+            ticker = asyncio.ensure_future(tick())
+            decision = await backend.hit("client")
+            ticker.cancel()
+        finally:
+            holder.join(timeout=10)
+            await backend.close()
+
+        assert decision.allowed
+        assert ticks >= 5
+
+
+class TestRedisRateLimitBackend:
+    """Test cases for the Redis backend against an in-process fake server."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("algorithm", ["token_bucket", "sliding_window"])
+    async def test_state_shared_between_replicas(self, algorithm):
+        server = fakeredis.FakeServer()
+        first = RedisRateLimitBackend(
+            algorithm, 3, 3600, client=fakeredis.FakeAsyncRedis(server=server)
+        )
+        second = RedisRateLimitBackend(
+            algorithm, 3, 3600, client=fakeredis.FakeAsyncRedis(server=server)
+        )
+
+        decisions = [await backend.hit("client") for backend in (first, second, first, second)]
+
+        assert [d.allowed for d in decisions] == [True, True, True, False]
+        assert decisions[0].remaining == 2
+        assert decisions[3].retry_after > 0
+        assert (await first.hit("other")).allowed
+
+    @pytest.mark.asyncio
+    async def test_keys_expire(self):
+        client = fakeredis.FakeAsyncRedis()
+        backend = RedisRateLimitBackend("token_bucket", 3, 60, client=client, prefix="rl:")
+        await backend.hit("client")
+        assert 0 < await client.pttl("rl:client") <= 60000
+
+    @pytest.mark.asyncio
+    async def test_fails_open_when_unavailable(self):
+        import redis.asyncio
+
+        backend = RedisRateLimitBackend(
+            "token_bucket", 1, 60,
+            client=redis.asyncio.Redis(host="127.0.0.1", port=1, socket_connect_timeout=0.5)
+        )
+        try:
+            assert (await backend.hit("client")).allowed
+            assert (await backend.hit("client")).allowed
+        finally:
+            await backend.close()
+
+
+class TestRateLimitHeaders:
+    """Test rate limit headers on responses."""
+
+    def test_headers_on_allowed_response(self):
+        client = TestClient(app)
+        response = client.get("/openapi.json")
+
+        assert response.status_code == 200
+        assert "RateLimit-Limit" in response.headers
+        assert "RateLimit-Remaining" in response.headers
+        assert "RateLimit-Reset" in response.headers
+        assert "Retry-After" not in response.headers
@@ -0,0 +1,206 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.external_api import ExternalAPIClient, external_api_client
+from app.governor import OutboundGovernor
+from app.main import app
+from app.readiness import (
+    CIRCUIT_OPEN,
+    POOL_SATURATED,
+    REGISTRY_UNREACHABLE,
+    WARMING_UP,
+    ReadinessMonitor,
+)
+from app.resilience import CircuitBreaker
+
+REGISTRY_URL = "https://registry.example/api/gov-services/elmks/public_elmk"
+
+
+class Registry:
+    """Mock transport handler answering probes with a configurable status or error."""
+
+    def __init__(self):
+        self.status_code = 405
+        self.error = None
+        self.requests = []
+
+    def __call__(self, request):
+        self.requests.append(request)
+        if self.error is not None:
+            raise self.error
+        return httpx.Response(self.status_code)
+
+
+@pytest.fixture
+def registry():
+    return Registry()
+
+
+def make_monitor(registry, clock, breaker=None, governor=None, **kwargs):
+    client = ExternalAPIClient(
+        base_url=REGISTRY_URL,
+        transport=httpx.MockTransport(registry),
+        breaker=breaker,
+        governor=governor
+    )
+    return ReadinessMonitor(client, interval=10.0, clock=clock, **kwargs)
+
+
+class TestReadinessMonitor:
+    """Test cases for readiness decisions."""
+
+    @pytest.mark.asyncio
+    async def test_warmup_marks_registry_reachable(self, registry, clock):
+        monitor = make_monitor(registry, clock, warmup_connections=3)
+        await monitor.warmup()
+
+        assert len(registry.requests) == 3
+        assert all(request.method == "HEAD" for request in registry.requests)
+        report = monitor.report()
+        assert (report.status, report.reasons, report.registry_reachable) == ("ready", [], True)
+
+    @pytest.mark.asyncio
+    async def test_unreachable_registry(self, registry, clock):
+        registry.error = httpx.ConnectError("connection refused")
+        monitor = make_monitor(registry, clock)
+        monitor._task = object()  # as if started
+        await monitor.warmup()
+
+        report = monitor.report()
+        assert report.status == "not_ready"
+        assert report.reasons == [REGISTRY_UNREACHABLE]
+        assert report.registry_error == "connection refused"
+
+    @pytest.mark.asyncio
+    async def test_server_errors_count_as_unreachable(self, registry, clock):
+        monitor = make_monitor(registry, clock)
+        await monitor.warmup()
+        registry.status_code = 503
+        await monitor.probe()
+        assert monitor.reachable is False
+        assert monitor.error == "HTTP 503"
+
+        registry.status_code = 200
+        await monitor.probe()
+        assert monitor.reachable is True
+
+    @pytest.mark.asyncio
+    async def test_probe_skipped_after_recent_registry_call(self, registry, clock):
+        monitor = make_monitor(registry, clock)
+        monitor.client.last_success = clock.now - 1
+        await monitor.probe()
+        assert registry.requests == []
+        assert monitor.reachable is True
+
+        clock.now += 20
+        await monitor.probe()
+        assert len(registry.requests) == 1
+
+    @pytest.mark.asyncio
+    async def test_unexpected_errors_do_not_stop_checks(self, registry):
+        registry.error = RuntimeError("probe broke")
+        monitor = make_monitor(registry, time.monotonic)
+        monitor.interval = 0.01
+        monitor.start()
+        try:
+            for _ in range(200):
+                if monitor.reachable is not None:
+                    break
+                await asyncio.sleep(0.01)
+            assert monitor.report().reasons == [REGISTRY_UNREACHABLE]
+            assert monitor.error == "probe broke"
+
+            registry.error = None
+            for _ in range(200):
+                if monitor.reachable:
+                    break
+                await asyncio.sleep(0.01)
+            assert monitor.report().status == "ready"
+        finally:
+            await monitor.stop()
+
+    def test_not_started_skips_registry_check(self, registry, clock):
+        monitor = make_monitor(registry, clock)
+        assert monitor.report().status == "ready"
+        monitor._task = object()  # as if started
+        assert monitor.report().reasons == [WARMING_UP]
+
+    def test_open_circuit(self, registry, clock):
+        breaker = CircuitBreaker("registry", min_requests=1, failure_ratio=0.5)
+        monitor = make_monitor(registry, clock, breaker=breaker)
+        breaker.record(breaker.before_call(), True)
+
+        report = monitor.report()
+        assert report.reasons == [CIRCUIT_OPEN]
+        assert report.circuit_state == "open"
+
+    def test_saturated_pool(self, registry, clock):
+        governor = OutboundGovernor(max_concurrency=1)
+        monitor = make_monitor(registry, clock, governor=governor, max_queued=2)
+        governor.in_flight, governor.queued = 1, 2
+        assert monitor.report().reasons == [POOL_SATURATED]
+
+        monitor.max_queued = 0
+        assert monitor.report().reasons == []
+
+    @pytest.mark.asyncio
+    async def test_warmup_opens_pooled_connections(self, fake_registry_server, clock):
+        client = ExternalAPIClient(base_url=fake_registry_server.url)
+        client.http2 = False
+        monitor = ReadinessMonitor(client, warmup_connections=3, clock=clock)
+        try:
+            await monitor.warmup()
+            assert monitor.reachable is True
+            assert len(client.client._transport._pool.connections) == 3
+        finally:
+            await client.close()
+
+
+class TestReadinessAPI:
+    """Test cases for the /readyz endpoint."""
+
+    def test_ready_after_warmup(self, fake_registry_server, fake_registry, monkeypatch):
+        monkeypatch.setattr(settings, "readiness_probe_enabled", True)
+        monkeypatch.setattr(external_api_client, "base_url", fake_registry_server.url)
+        with TestClient(app) as client:
+            deadline = time.monotonic() + 5
+            response = client.get("/readyz")
+            while response.status_code != 200 and time.monotonic() < deadline:
+                time.sleep(0.01)
+                response = client.get("/readyz")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "ready"
+        assert data["registry_reachable"] is True
+        assert fake_registry.calls == 0
+
+    def test_unreachable_registry(self, monkeypatch):
+        monkeypatch.setattr(settings, "readiness_probe_enabled", True)
+        monkeypatch.setattr(external_api_client, "base_url", "http://127.0.0.1:9/registry")
+        with TestClient(app) as client:
+            deadline = time.monotonic() + 5
+            response = client.get("/readyz")
+            while WARMING_UP in response.json()["reasons"] and time.monotonic() < deadline:
+                time.sleep(0.01)
+                response = client.get("/readyz")
+
+        assert response.status_code == 503
+        assert response.json()["reasons"] == [REGISTRY_UNREACHABLE]
+
+    def test_no_probe_when_disabled(self):
+        with TestClient(app) as client:
+            response = client.get("/readyz")
+        assert response.status_code == 200
+        assert response.json()["registry_reachable"] is None
+
+    def test_liveness_is_separate(self, monkeypatch):
+        monkeypatch.setattr(settings, "readiness_probe_enabled", True)
+        monkeypatch.setattr(external_api_client, "base_url", "http://127.0.0.1:9/registry")
+        with TestClient(app) as client:
+            assert client.get("/healthz").status_code == 200
@@ -0,0 +1,327 @@
+import time
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.external_api import ExternalAPIClient, external_api_client
+from app.main import app
+from app.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceeded,
+    LatencyTracker,
+    adaptive_timeout,
+    backoff_delay,
+)
+from tests.conftest import AUTH_HEADERS
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker(
+        "test",
+        failure_ratio=0.5,
+        min_requests=4,
+        window=10,
+        open_seconds=5,
+        half_open_probes=2,
+        clock=clock
+    )
+
+
+def call(breaker, failed):
+    breaker.record(breaker.before_call(), failed)
+
+
+class TestCircuitBreaker:
+    """Test cases for the circuit breaker state machine."""
+
+    def test_stays_closed_below_min_requests(self, breaker):
+        for _ in range(3):
+            call(breaker, failed=True)
+        assert breaker.state == CLOSED
+
+    def test_opens_on_failure_ratio(self, breaker):
+        call(breaker, failed=False)
+        call(breaker, failed=False)
+        call(breaker, failed=True)
+        assert breaker.state == CLOSED
+
+        call(breaker, failed=True)
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpenError) as exc_info:
+            breaker.before_call()
+        assert exc_info.value.retry_after == 5
+
+    def test_old_outcomes_leave_the_window(self, breaker, clock):
+        for _ in range(3):
+            call(breaker, failed=True)
+        clock.now += 11
+        call(breaker, failed=True)
+        assert breaker.state == CLOSED
+        assert breaker.stats()["calls"] == 1
+
+    def test_half_open_limits_probes_and_closes(self, breaker, clock):
+        for _ in range(4):
+            call(breaker, failed=True)
+        clock.now += 5
+
+        first = breaker.before_call()
+        second = breaker.before_call()
+        assert breaker.state == HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+        breaker.record(first, False)
+        assert breaker.state == HALF_OPEN
+        breaker.record(second, False)
+        assert breaker.state == CLOSED
+
+    def test_failed_probe_reopens(self, breaker, clock):
+        for _ in range(4):
+            call(breaker, failed=True)
+        clock.now += 5
+
+        call(breaker, failed=True)
+        assert breaker.state == OPEN
+        assert breaker.retry_after() == 5
+
+    def test_released_probe_frees_slot(self, breaker, clock):
+        for _ in range(4):
+            call(breaker, failed=True)
+        clock.now += 5
+
+        generation = breaker.before_call()
+        breaker.before_call()
+        breaker.release(generation)
+        breaker.before_call()
+        assert breaker.state == HALF_OPEN
+
+    def test_late_results_do_not_count_as_probes(self, breaker, clock):
+        slow_success = breaker.before_call()
+        slow_failure = breaker.before_call()
+        for _ in range(4):
+            call(breaker, failed=True)
+        clock.now += 5
+
+        probe = breaker.before_call()
+        assert breaker.state == HALF_OPEN
+        breaker.record(slow_failure, True)
+        assert breaker.state == HALF_OPEN
+        breaker.record(slow_success, False)
+        breaker.record(slow_success, False)
+        breaker.record(probe, False)
+        assert breaker.state == HALF_OPEN
+
+    def test_late_probe_does_not_count_when_closed(self, breaker, clock):
+        for _ in range(4):
+            call(breaker, failed=True)
+        clock.now += 5
+        late_probe = breaker.before_call()
+        breaker.reset()
+
+        breaker.record(late_probe, True)
+        assert breaker.stats()["calls"] == 0
+
+
+class TestAdaptiveTimeout:
+    """Test cases for latency-derived timeouts."""
+
+    def test_percentile(self):
+        tracker = LatencyTracker(recompute_every=1)
+        for i in range(1, 101):
+            tracker.observe(i / 100)
+        assert tracker.percentile(50) == 0.5
+        assert tracker.percentile(99) == 0.99
+        assert tracker.percentile(100) == 1.0
+
+    def test_ceiling_until_enough_samples(self):
+        tracker = LatencyTracker()
+        tracker.observe(0.1)
+        assert adaptive_timeout(tracker, 30, 99, 3, 1, min_samples=10) == 30
+
+    def test_bounded_by_floor_and_ceiling(self):
+        tracker = LatencyTracker(recompute_every=1)
+        for _ in range(10):
+            tracker.observe(0.1)
+        assert adaptive_timeout(tracker, 30, 99, 3, 1, min_samples=10) == 1
+        assert adaptive_timeout(tracker, 30, 99, 3, 0.1, min_samples=10) == pytest.approx(0.3)
+        assert adaptive_timeout(tracker, 0.2, 99, 3, 0.1, min_samples=10) == 0.2
+
+    @pytest.mark.asyncio
+    async def test_client_times_out_on_outlier(self, fake_registry_server, fake_registry, monkeypatch):
+        """Test that the client stops waiting well before the configured timeout."""
+        monkeypatch.setattr(settings, "registry_adaptive_timeout_min", 0.1)
+        monkeypatch.setattr(settings, "registry_adaptive_timeout_min_samples", 10)
+        client = ExternalAPIClient(base_url=fake_registry_server.url, timeout=5)
+        try:
+            for _ in range(10):
+                await client.get_medical_book_info("860102797025", "17648922116")
+            assert client.read_timeout() < 1
+
+            fake_registry.delay = 2
+            started = time.perf_counter()
+            with pytest.raises(httpx.TimeoutException):
+                await client.get_medical_book_info("860102797025", "17648922116")
+            assert time.perf_counter() - started < 1.5
+        finally:
+            await client.close()
+
+
+class TestRegistryClientBreaker:
+    """Test cases for the breaker wired into the registry client."""
+
+    @pytest.mark.asyncio
+    async def test_server_errors_trip_breaker(self, fake_registry_server, fake_registry, monkeypatch):
+        monkeypatch.setattr(settings, "registry_retries", 0)
+        fake_registry.status_code = 500
+        breaker = CircuitBreaker("registry", min_requests=3, open_seconds=60)
+        client = ExternalAPIClient(base_url=fake_registry_server.url, timeout=2, breaker=breaker)
+        try:
+            for _ in range(3):
+                with pytest.raises(httpx.HTTPStatusError):
+                    await client.get_medical_book_info("860102797025", "17648922116")
+            calls = fake_registry.calls
+
+            with pytest.raises(CircuitOpenError):
+                await client.get_medical_book_info("860102797025", "17648922116")
+            assert fake_registry.calls == calls
+        finally:
+            await client.close()
+
+    @pytest.mark.asyncio
+    async def test_not_found_is_not_a_failure(self, fake_registry_server, fake_registry):
+        breaker = CircuitBreaker("registry", min_requests=3)
+        client = ExternalAPIClient(base_url=fake_registry_server.url, timeout=2, breaker=breaker)
+        try:
+            for _ in range(5):
+                with pytest.raises(httpx.HTTPStatusError):
+                    await client.get_medical_book_info("860102797026", "17648922116")
+            assert breaker.state == CLOSED
+        finally:
+            await client.close()
+
+    def test_open_circuit_returns_503(self, monkeypatch):
+        def fail_fast(*args, **kwargs):
+            raise CircuitOpenError("registry", retry_after=12.5)
+
+        monkeypatch.setattr(external_api_client.breaker, "before_call", fail_fast)
+        client = TestClient(app)
+        response = client.post(
+            "/api/v1/medical-book/validate",
+            json={"elmk_number": "860102797025", "snils": "17648922116"},
+            headers=AUTH_HEADERS
+        )
+
+        assert response.status_code == 503
+        assert response.json()["detail"] == "External API temporarily unavailable"
+        assert response.headers["Retry-After"] == "13"
+
+
+@pytest_asyncio.fixture
+async def registry_client(fake_registry_server, fake_registry):
+    client = ExternalAPIClient(base_url=fake_registry_server.url, timeout=2)
+    yield client
+    await client.close()
+
+
+class TestRetries:
+    """Test cases for retries with backoff and the request deadline."""
+
+    def test_backoff_delay_is_jittered_and_capped(self):
+        assert backoff_delay(0, base=0.1, cap=2, rng=lambda: 1.0) == pytest.approx(0.1)
+        assert backoff_delay(3, base=0.1, cap=2, rng=lambda: 1.0) == pytest.approx(0.8)
+        assert backoff_delay(10, base=0.1, cap=2, rng=lambda: 1.0) == 2
+        assert backoff_delay(10, base=0.1, cap=2, rng=lambda: 0.25) == 0.5
+
+    @pytest.mark.asyncio
+    async def test_server_errors_are_retried(self, registry_client, fake_registry, monkeypatch):
+        monkeypatch.setattr(settings, "registry_retry_backoff_base", 0.01)
+        fake_registry.plan.extend([(0, 503), (0, 502)])
+
+        result = await registry_client.get_medical_book_info("860102797025", "17648922116")
+
+        assert result.elmk_number == "86-01-027970-25"
+        assert fake_registry.calls == 3
+
+    @pytest.mark.asyncio
+    async def test_retries_are_bounded(self, registry_client, fake_registry, monkeypatch):
+        monkeypatch.setattr(settings, "registry_retry_backoff_base", 0.01)
+        fake_registry.status_code = 503
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await registry_client.get_medical_book_info("860102797025", "17648922116")
+        assert fake_registry.calls == settings.registry_retries + 1
+
+    @pytest.mark.asyncio
+    async def test_not_found_is_not_retried(self, registry_client, fake_registry):
+        with pytest.raises(httpx.HTTPStatusError):
+            await registry_client.get_medical_book_info("860102797026", "17648922116")
+        assert fake_registry.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_deadline_bounds_all_attempts(self, registry_client, fake_registry, monkeypatch):
+        monkeypatch.setattr(settings, "registry_request_deadline", 0.3)
+        fake_registry.delay = 1
+
+        started = time.perf_counter()
+        with pytest.raises(DeadlineExceeded):
+            await registry_client.get_medical_book_info("860102797025", "17648922116")
+        assert time.perf_counter() - started < 0.6
+
+
+class TestHedging:
+    """Test cases for hedged registry requests."""
+
+    @pytest.fixture(autouse=True)
+    def enable_hedging(self, monkeypatch):
+        monkeypatch.setattr(settings, "registry_hedge_enabled", True)
+        monkeypatch.setattr(settings, "registry_hedge_min_samples", 5)
+        monkeypatch.setattr(settings, "registry_hedge_min_delay", 0.05)
+
+    async def warm_up(self, client):
+        for _ in range(5):
+            await client.get_medical_book_info("860102797025", "17648922116")
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_before_enough_samples(self, registry_client):
+        assert registry_client.hedge_delay() is None
+
+    @pytest.mark.asyncio
+    async def test_slow_attempt_is_hedged(self, registry_client, fake_registry):
+        await self.warm_up(registry_client)
+        fake_registry.plan.append((1.0, None))
+        calls = fake_registry.calls
+
+        started = time.perf_counter()
+        result = await registry_client.get_medical_book_info("860102797025", "17648922116")
+
+        assert result.elmk_number == "86-01-027970-25"
+        assert time.perf_counter() - started < 0.5
+        assert fake_registry.calls == calls + 2
+
+    @pytest.mark.asyncio
+    async def test_fast_attempt_is_not_hedged(self, registry_client, fake_registry):
+        await self.warm_up(registry_client)
+        calls = fake_registry.calls
+
+        await registry_client.get_medical_book_info("860102797025", "17648922116")
+
+        assert fake_registry.calls == calls + 1
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_while_breaker_recovers(self, fake_registry_server, fake_registry):
+        breaker = CircuitBreaker("registry")
+        client = ExternalAPIClient(base_url=fake_registry_server.url, timeout=2, breaker=breaker)
+        try:
+            await self.warm_up(client)
+            breaker.state = HALF_OPEN
+            assert client.hedge_delay() is None
+        finally:
+            await client.close()
@@ -0,0 +1,280 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.cache import CachedRegistryClient, RegistryCache
+from app.external_api import ExternalAPIClient
+from app.models import ExternalAPIResponse
+from app.scheduler import DATE, EXPIRY, RefreshScheduler, in_hours, record_change_dates
+from tests.conftest import FakeClock
+from tests.fake_registry import SAMPLE_RECORD
+
+KEY = ("860102797025", "17648922116")
+
+
+class FakeRefresh:
+    def __init__(self, record=None, error=None):
+        self.record = record
+        self.error = error
+        self.calls = []
+
+    async def __call__(self, elmk_number, snils):
+        self.calls.append((elmk_number, snils))
+        if self.error is not None:
+            raise self.error
+        return self.record
+
+
+@pytest.fixture
+def record():
+    return ExternalAPIResponse(**SAMPLE_RECORD)
+
+
+@pytest.fixture
+def clock():
+    # Working hours, more than a day before recertification (2026-07-11)
+    return FakeClock(datetime(2026, 7, 1, 12, 0).timestamp())
+
+
+def make_scheduler(refresh, clock, **kwargs):
+    options = dict(ttl=3600, lead=300, date_lead=3600, rate=1000, offpeak_rate=1000, clock=clock)
+    options.update(kwargs)
+    return RefreshScheduler(refresh, **options)
+
+
+class TestRefreshScheduler:
+    """Test cases for the proactive refresh scheduler."""
+
+    def test_change_dates(self, record):
+        assert record_change_dates(record) == [
+            datetime(2026, 7, 11).timestamp(),
+            datetime(2026, 7, 2).timestamp(),
+        ]
+
+    def test_offpeak_hours_wrap_midnight(self):
+        assert in_hours(datetime(2026, 7, 1, 2).timestamp(), 1, 6)
+        assert not in_hours(datetime(2026, 7, 1, 6).timestamp(), 1, 6)
+        assert in_hours(datetime(2026, 7, 1, 23).timestamp(), 22, 5)
+        assert in_hours(datetime(2026, 7, 1, 4).timestamp(), 22, 5)
+        assert not in_hours(datetime(2026, 7, 1, 12).timestamp(), 22, 5)
+
+    def test_due_before_expiry(self, record, clock):
+        scheduler = make_scheduler(FakeRefresh(record), clock)
+        scheduler.track(KEY, *KEY, record, expires_in=3600)
+
+        clock.now += 3299
+        assert scheduler.pop_due() is None
+        clock.now += 1
+        key, tracked = scheduler.pop_due()
+        assert key == KEY
+        assert tracked.reason == EXPIRY
+
+    def test_due_before_change_date(self, record, clock):
+        scheduler = make_scheduler(FakeRefresh(record), clock)
+        scheduler.track(KEY, *KEY, record, expires_in=86400)
+
+        # Medical opinion date is 2026-07-02, date_lead is an hour
+        clock.now = datetime(2026, 7, 1, 22, 59).timestamp()
+        assert scheduler.pop_due() is None
+        clock.now = datetime(2026, 7, 1, 23, 0).timestamp()
+        _, tracked = scheduler.pop_due()
+        assert tracked.reason == DATE
+
+    def test_offpeak_pulls_date_refresh_forward(self, record, clock):
+        clock.now = datetime(2026, 7, 10, 12, 0).timestamp()
+        scheduler = make_scheduler(
+            FakeRefresh(record), clock, date_lead=0, offpeak_start_hour=22, offpeak_end_hour=23,
+            offpeak_lookahead=43200
+        )
+        scheduler.track(KEY, *KEY, record, expires_in=86400)
+
+        # Recertification is at midnight; 21:00 is still peak time
+        clock.now = datetime(2026, 7, 10, 21, 0).timestamp()
+        assert scheduler.pop_due() is None
+        clock.now = datetime(2026, 7, 10, 22, 30).timestamp()
+        _, tracked = scheduler.pop_due()
+        assert tracked.reason == DATE
+
+    def test_offpeak_does_not_pull_expiry_forward(self, record, clock):
+        clock.now = datetime(2026, 7, 3, 1, 0).timestamp()
+        scheduler = make_scheduler(FakeRefresh(record), clock, offpeak_lookahead=43200)
+        scheduler.track(KEY, *KEY, record, expires_in=3600)
+        assert scheduler.pop_due() is None
+
+    def test_idle_key_is_dropped(self, record, clock):
+        scheduler = make_scheduler(FakeRefresh(record), clock, track_window=1000)
+        scheduler.track(KEY, *KEY, record, expires_in=3600)
+
+        clock.now += 3300
+        assert scheduler.pop_due() is None
+        assert len(scheduler) == 0
+
+    def test_repeat_lookup_keeps_key_alive(self, record, clock):
+        scheduler = make_scheduler(FakeRefresh(record), clock, track_window=1000)
+        scheduler.track(KEY, *KEY, record, expires_in=3600)
+        clock.now += 3000
+        scheduler.track(KEY, *KEY, record, expires_in=600)
+
+        clock.now += 300
+        assert scheduler.pop_due() is not None
+
+    def test_max_keys(self, record, clock):
+        scheduler = make_scheduler(FakeRefresh(record), clock, max_keys=2)
+        for i in range(3):
+            scheduler.track((str(i), "0"), str(i), "0", record, expires_in=3600)
+        assert len(scheduler) == 2
+
+    @pytest.mark.asyncio
+    async def test_refresh_reschedules(self, record, clock):
+        refresh = FakeRefresh(record)
+        scheduler = make_scheduler(refresh, clock)
+        scheduler.track(KEY, *KEY, record, expires_in=0)
+
+        clock.now += 1
+        scheduler.track(KEY, *KEY, record, expires_in=3599)
+
+        assert await scheduler.run_once()
+        assert refresh.calls == [KEY]
+        assert not await scheduler.run_once()
+        assert len(scheduler) == 1
+
+    @pytest.mark.asyncio
+    async def test_key_requested_once_is_refreshed_once(self, record, clock):
+        refresh = FakeRefresh(record)
+        scheduler = make_scheduler(refresh, clock)
+        scheduler.track(KEY, *KEY, record, expires_in=3600)
+
+        for _ in range(30):
+            clock.now += 3600
+            await scheduler.run_once()
+        assert refresh.calls == [KEY]
+        assert len(scheduler) == 0
+
+    @pytest.mark.asyncio
+    async def test_repeat_lookups_keep_refreshing(self, record, clock):
+        refresh = FakeRefresh(record)
+        scheduler = make_scheduler(refresh, clock)
+        scheduler.track(KEY, *KEY, record, expires_in=3600)
+
+        for _ in range(3):
+            clock.now += 3300
+            scheduler.track(KEY, *KEY, record, expires_in=300)
+            assert await scheduler.run_once()
+        assert len(refresh.calls) == 3
+        assert len(scheduler) == 1
+
+    @pytest.mark.asyncio
+    async def test_fresh_entry_is_not_fetched(self, record, clock):
+        refresh = FakeRefresh(record)
+        scheduler = make_scheduler(refresh, clock, fresh_for=lambda elmk_number, snils: 3600)
+        scheduler.track(KEY, *KEY, record, expires_in=0)
+
+        assert await scheduler.run_once()
+        assert refresh.calls == []
+        assert scheduler.pop_due() is None
+        clock.now += 3300
+        assert scheduler.pop_due() is not None
+
+    def test_required_rate(self, record, clock):
+        scheduler = make_scheduler(FakeRefresh(record), clock, ttl=3600, lead=300, max_keys=3300)
+        assert scheduler.required_rate == 1.0
+
+    @pytest.mark.asyncio
+    async def test_not_found_is_dropped(self, record, clock):
+        scheduler = make_scheduler(FakeRefresh(None), clock)
+        scheduler.track(KEY, *KEY, record, expires_in=0)
+
+        assert await scheduler.run_once()
+        assert len(scheduler) == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_refresh_is_retried_later(self, record, clock):
+        refresh = FakeRefresh(error=RuntimeError("boom"))
+        scheduler = make_scheduler(refresh, clock)
+        scheduler.track(KEY, *KEY, record, expires_in=0)
+
+        assert await scheduler.run_once()
+        assert not await scheduler.run_once()
+        clock.now += 300
+        assert await scheduler.run_once()
+        assert len(refresh.calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_refreshes_are_rate_limited(self, record, clock):
+        refresh = FakeRefresh(record)
+        scheduler = make_scheduler(refresh, clock, rate=20)
+        for i in range(3):
+            scheduler.track((str(i), "0"), str(i), "0", record, expires_in=0)
+
+        started = asyncio.get_running_loop().time()
+        for _ in range(3):
+            await scheduler.run_once()
+        assert asyncio.get_running_loop().time() - started >= 0.09
+
+    @pytest.mark.asyncio
+    async def test_zero_offpeak_rate_keeps_peak_rate(self, record, clock):
+        clock.now = datetime(2026, 7, 3, 2, 0).timestamp()
+        refresh = FakeRefresh(record)
+        scheduler = make_scheduler(refresh, clock, rate=20, offpeak_rate=0)
+        assert scheduler.offpeak(clock())
+        for i in range(3):
+            scheduler.track((str(i), "0"), str(i), "0", record, expires_in=0)
+
+        started = asyncio.get_running_loop().time()
+        for _ in range(3):
+            await scheduler.run_once()
+        assert asyncio.get_running_loop().time() - started >= 0.09
+
+    def test_zero_rate_is_rejected(self, record, clock):
+        with pytest.raises(ValueError):
+            make_scheduler(FakeRefresh(record), clock, rate=0)
+
+    @pytest.mark.asyncio
+    async def test_background_loop(self, record, clock):
+        refresh = FakeRefresh(record)
+        scheduler = make_scheduler(refresh, clock, poll_interval=0.01)
+        scheduler.start()
+        try:
+            scheduler.track(KEY, *KEY, record, expires_in=0)
+            for _ in range(100):
+                if refresh.calls:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await scheduler.stop()
+        assert refresh.calls == [KEY]
+
+
+class TestCachedClientTracking:
+    """Test cases for the scheduler wired into the cached registry client."""
+
+    @pytest.mark.asyncio
+    async def test_lookups_are_tracked_and_refreshed(self, fake_registry_server, fake_registry):
+        client = ExternalAPIClient(base_url=fake_registry_server.url, timeout=2)
+        cache = RegistryCache(max_entries=10, ttl=60, negative_ttl=10)
+        cached = CachedRegistryClient(client, cache)
+        cached.scheduler = RefreshScheduler(cached.refresh, ttl=60, lead=60, rate=1000)
+        try:
+            await cached.lookup(*KEY)
+            assert len(cached.scheduler) == 1
+            assert 0 < cached.fresh_for(*KEY) <= 60
+
+            assert await cached.scheduler.run_once()
+            assert fake_registry.calls == 2
+            assert (await cached.lookup(*KEY)).cache_status == "HIT"
+        finally:
+            await client.close()
+
+    @pytest.mark.asyncio
+    async def test_missing_records_are_not_tracked(self, fake_registry_server, fake_registry):
+        client = ExternalAPIClient(base_url=fake_registry_server.url, timeout=2)
+        cached = CachedRegistryClient(client, RegistryCache(max_entries=10, ttl=60, negative_ttl=10))
+        cached.scheduler = RefreshScheduler(cached.refresh, ttl=60)
+        try:
+            with pytest.raises(Exception):
+                await cached.lookup("860102797026", "17648922116")
+            assert len(cached.scheduler) == 0
+            assert await cached.refresh("860102797026", "17648922116") is None
+        finally:
+            await client.close()
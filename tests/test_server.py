@@ -0,0 +1,89 @@
+import pytest
+
+from app.config import settings
+from app.disk_cache import DiskCache
+from app.external_api import create_registry_governor
+from app.server import available_cpus, cgroup_cpu_limit, fragmented_state
+
+
+@pytest.fixture
+def cgroup(tmp_path):
+    def write(cpu_max=None, quota=None, period=None):
+        paths = {
+            "cpu_max": tmp_path / "cpu.max",
+            "v1_quota": tmp_path / "cpu.cfs_quota_us",
+            "v1_period": tmp_path / "cpu.cfs_period_us",
+        }
+        for name, value in (("cpu_max", cpu_max), ("v1_quota", quota), ("v1_period", period)):
+            if value is not None:
+                paths[name].write_text(value + "\n")
+        return {name: str(path) for name, path in paths.items()}
+    return write
+
+
+class TestCpuLimit:
+    """Test cases for detecting the CPUs a container may use."""
+
+    def test_v2_quota(self, cgroup):
+        assert cgroup_cpu_limit(**cgroup(cpu_max="150000 100000")) == 1.5
+
+    def test_v2_unlimited(self, cgroup):
+        assert cgroup_cpu_limit(**cgroup(cpu_max="max 100000")) is None
+
+    def test_v1_quota(self, cgroup):
+        assert cgroup_cpu_limit(**cgroup(quota="200000", period="100000")) == 2.0
+
+    def test_v1_unlimited(self, cgroup):
+        assert cgroup_cpu_limit(**cgroup(quota="-1", period="100000")) is None
+
+    def test_no_cgroup(self, cgroup):
+        assert cgroup_cpu_limit(**cgroup()) is None
+
+    def test_quota_caps_cpus(self, cgroup):
+        assert available_cpus(**cgroup(cpu_max="50000 100000")) == 1
+        assert available_cpus(**cgroup()) >= 1
+
+
+class TestWorkerSettings:
+    """Test cases for settings that depend on the number of workers."""
+
+    def test_single_worker_has_no_warnings(self, monkeypatch):
+        monkeypatch.setattr(settings, "web_concurrency", 1)
+        monkeypatch.setattr(settings, "rate_limit_backend", "memory")
+        assert fragmented_state(settings) == []
+
+    def test_process_local_state_is_reported(self, monkeypatch):
+        monkeypatch.setattr(settings, "web_concurrency", 2)
+        monkeypatch.setattr(settings, "rate_limit_backend", "memory")
+        monkeypatch.setattr(settings, "registry_cache_enabled", True)
+        monkeypatch.setattr(settings, "registry_disk_cache_enabled", False)
+        monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+        problems = fragmented_state(settings)
+        assert len(problems) == 3
+        assert "RATE_LIMIT_BACKEND" in problems[0]
+
+    def test_shared_state_has_no_warnings(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(settings, "web_concurrency", 2)
+        monkeypatch.setattr(settings, "rate_limit_backend", "mmap")
+        monkeypatch.setattr(settings, "registry_disk_cache_enabled", True)
+        monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+        assert fragmented_state(settings) == []
+
+    def test_registry_limits_are_split_between_workers(self, monkeypatch):
+        monkeypatch.setattr(settings, "registry_governor_enabled", True)
+        monkeypatch.setattr(settings, "registry_max_concurrency", 50)
+        monkeypatch.setattr(settings, "registry_rate_limit", 50.0)
+        monkeypatch.setattr(settings, "registry_rate_burst", 50)
+        monkeypatch.setattr(settings, "web_concurrency", 4)
+        governor = create_registry_governor()
+        assert governor.max_concurrency == 12
+        assert governor._bucket.max_requests == 12
+        assert governor._bucket.rate == pytest.approx(12.5)
+
+    def test_disk_cache_holds_no_connection_after_init(self, tmp_path):
+        # Connections opened before gunicorn forks would be shared by workers
+        disk = DiskCache(str(tmp_path / "cache.sqlite3"))
+        try:
+            assert disk._connections == []
+        finally:
+            disk.close()
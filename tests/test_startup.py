@@ -0,0 +1,39 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Needed only on specific paths (hashed client secrets, the Redis rate
+# limit backend) or not at all; loading them would slow down every start
+LAZY_MODULES = ("passlib", "argon2", "bcrypt", "redis", "jose", "requests", "uvicorn")
+
+
+def run_python(code: str, tmp_path, **overrides: str) -> dict:
+    env = {**os.environ, "JOBS_DB_PATH": str(tmp_path / "jobs.sqlite3"), "LOG_LEVEL": "WARNING", **overrides}
+    output = subprocess.check_output([sys.executable, "-c", code], env=env, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+class TestColdStart:
+    """Test cases for the work done when the app is imported and started."""
+
+    def test_import_skips_optional_dependencies(self, tmp_path):
+        modules = run_python("import json, sys, app.main; print(json.dumps(sorted(sys.modules)))", tmp_path)
+        loaded = {name.split(".")[0] for name in modules}
+        assert loaded.isdisjoint(LAZY_MODULES), sorted(loaded & set(LAZY_MODULES))
+
+    def test_import_loads_http_transport(self, tmp_path):
+        # Loaded by a preloaded gunicorn master once instead of by each worker
+        modules = run_python("import json, sys, app.main; print(json.dumps(sorted(sys.modules)))", tmp_path)
+        assert "httpcore" in modules
+
+    @pytest.mark.parametrize("attribute", ["external_api_client._client", "job_manager._webhook_client"])
+    def test_clients_are_not_built_on_import(self, tmp_path, attribute):
+        code = f"import json, app.main as m; print(json.dumps(m.{attribute} is None))"
+        assert run_python(code, tmp_path) is True
+
+    def test_zero_refresh_rate_disables_scheduler(self, tmp_path):
+        code = "import json, app.main as m; print(json.dumps(m.cached_registry_client.scheduler is None))"
+        assert run_python(code, tmp_path, REFRESH_RATE="0") is True
@@ -0,0 +1,131 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.external_api import external_api_client
+from app.main import app
+from app.streaming import iter_ndjson_lines, map_bounded
+from tests.conftest import AUTH_HEADERS
+
+STREAM_URL = "/api/v1/medical-book/validate/stream"
+
+
+async def _chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def _collect(iterator):
+    return [item async for item in iterator]
+
+
+class TestNDJSONLines:
+    """Test cases for NDJSON line splitting."""
+
+    @pytest.mark.asyncio
+    async def test_lines_split_across_chunks(self):
+        lines = await _collect(iter_ndjson_lines(_chunks(b'{"a"', b': 1}\n\n{"b": 2}\n{"c"', b": 3}"), 100))
+        assert lines == [b'{"a": 1}', b"", b'{"b": 2}', b'{"c": 3}']
+
+    @pytest.mark.asyncio
+    async def test_overlong_line_is_truncated(self):
+        lines = await _collect(iter_ndjson_lines(_chunks(b"x" * 30, b"x" * 30, b"\n{}\n"), 20))
+        assert lines == [b"x" * 20, b"{}"]
+
+
+class TestMapBounded:
+    """Test cases for bounded concurrent mapping."""
+
+    @pytest.mark.asyncio
+    async def test_respects_concurrency(self):
+        in_flight = 0
+        max_in_flight = 0
+
+        async def fn(index, item):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01 * (item % 3))
+            in_flight -= 1
+            return index
+
+        results = await _collect(map_bounded(_chunks(*range(20)), fn, 4))
+
+        assert sorted(results) == list(range(20))
+        assert max_in_flight <= 4
+
+    @pytest.mark.asyncio
+    async def test_results_are_not_held_back_by_slow_input(self):
+        input_done = asyncio.Event()
+
+        async def slow_items():
+            yield 0
+            await asyncio.sleep(0.2)
+            yield 1
+            input_done.set()
+
+        async def fn(index, item):
+            return index
+
+        results = map_bounded(slow_items(), fn, 4)
+        try:
+            assert await asyncio.wait_for(results.__anext__(), 0.1) == 0
+            assert not input_done.is_set()
+            assert await _collect(results) == [1]
+        finally:
+            await results.aclose()
+
+
+class TestStreamValidation:
+    """Test cases for the NDJSON streaming validation endpoint."""
+
+    @pytest.fixture
+    def app_client(self, fake_registry_server, fake_registry, monkeypatch):
+        monkeypatch.setattr(external_api_client, "base_url", fake_registry_server.url)
+        with TestClient(app) as client:
+            yield client
+
+    def test_stream_results(self, app_client, fake_registry, monkeypatch):
+        monkeypatch.setattr(settings, "stream_concurrency", 4)
+        fake_registry.delay = 0.02
+        lines = [
+            json.dumps({"elmk_number": f"8601027970{i:02d}", "snils": "17648922116"})
+            for i in range(20)
+        ]
+        lines[5] = json.dumps({"elmk_number": "860102797025", "snils": "17648922116"})
+        lines[7] = "not json"
+        lines[9] = json.dumps({"elmk_number": "1", "snils": "17648922116"})
+        body = ("\n".join(lines) + "\n").encode()
+
+        def chunks():
+            for start in range(0, len(body), 37):
+                yield body[start:start + 37]
+
+        response = app_client.post(STREAM_URL, content=chunks(), headers=AUTH_HEADERS)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        results = {item["index"]: item for item in map(json.loads, response.text.splitlines())}
+        assert sorted(results) == list(range(20))
+        assert results[5]["status_code"] == 200
+        assert results[5]["result"]["elmk_number"] == "86-01-027970-25"
+        assert results[7]["status_code"] == 422
+        assert results[9]["status_code"] == 422
+        assert results[0]["status_code"] == 404
+        assert fake_registry.max_in_flight <= 4
+
+    def test_blank_lines_keep_line_numbers(self, app_client):
+        line = json.dumps({"elmk_number": "860102797025", "snils": "17648922116"})
+        body = f"{line}\n\n  \n{line}\n".encode()
+        response = app_client.post(STREAM_URL, content=body, headers=AUTH_HEADERS)
+
+        assert response.status_code == 200
+        indexes = sorted(item["index"] for item in map(json.loads, response.text.splitlines()))
+        assert indexes == [0, 3]
+
+    def test_requires_auth(self, app_client):
+        response = app_client.post(STREAM_URL, content=b"{}\n")
+        assert response.status_code == 401